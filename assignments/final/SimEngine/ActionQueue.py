@@ -0,0 +1,172 @@
+import heapq
+
+from .RandomSource import RandomSource
+from .StringConstants import *
+
+
+class ActionQueue:
+    """Player action queue - indexed by action id, by (action, key) and by action type
+
+    Actions are plain dictionaries (Params.ACTION_ID, ACTION, KEY, DATA, TIMER) kept in insertion order.  Each
+    action type has its own bucket so choose_action can pick the next action of a type without scanning the whole
+    queue.  FEED_ANIMAL actions are also kept in a heap ordered by the player's behavior_feed_order."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all queue instances)
+
+    # Sort key per behavior_feed_order (matches the old sorted(..., reverse=...) calls - ties keep queue order)
+    feed_sort_keys = {
+        1: lambda d, i: (-d[Params.ANIMAL_LEVEL], -d[Params.ANIMAL_RARITY], i),
+        2: lambda d, i: (-d[Params.ANIMAL_RARITY], -d[Params.ANIMAL_LEVEL], i),
+        3: lambda d, i: (d[Params.ANIMAL_LEVEL], d[Params.ANIMAL_RARITY], i),
+        4: lambda d, i: (d[Params.ANIMAL_RARITY], d[Params.ANIMAL_LEVEL], i),
+    }
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, feed_order=None, rng=None):
+        """
+        ActionQueue Constructor
+
+        feed_order (Integer)       - player behavior_feed_order (0 = random, 1-4 = sorted, other = queue order)
+        rng (RandomSource)         - random numbers for feed_order 0
+        """
+        self.rng = rng or RandomSource()
+        self.actions = {}  # action_id -> action (insertion order)
+        self.keys = {}  # (action, key) -> action_id
+        self.buckets = {}  # action type -> {action_id: action} (insertion order)
+        self.feed_heap = []  # (sort key..., action_id) for FEED_ANIMAL actions
+        self.feed_order = feed_order
+        self.last_id = 0  # action ids are never reused
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.actions)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __iter__(self):
+        return iter(self.actions.values())
+
+    # ------------------------------------------------------------------------------------------------------------
+    def set_feed_order(self, feed_order):
+        """Set how FEED_ANIMAL actions are prioritized (player behavior_feed_order)
+
+        Parameters:
+            feed_order (Int) - 0 = random, 1-4 = sort by animal level/rarity"""
+        self.feed_order = feed_order
+        self.feed_heap = []
+
+        for action in self.buckets.get(Actions.FEED_ANIMAL, {}).values():
+            self.push_feed(action)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def push_feed(self, action):
+        """Add a FEED_ANIMAL action to the priority heap"""
+        sort_key = self.feed_sort_keys.get(self.feed_order)
+
+        if sort_key:
+            heapq.heappush(self.feed_heap, sort_key(action[Params.DATA], action[Params.ACTION_ID]))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def has(self, action, key):
+        """Is there already an action of this type and key in queue?
+
+        Returns Boolean"""
+        return (action, key) in self.keys
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, action, key, data, timer):
+        """Add an action to the queue unless an action with the same (action, key) is already there
+
+        Parameters:
+            action (String) - ActionType (from enums)
+            key (Object) - Unique identifier to differential similar actions
+            data (Dict) - payload of parameters necessary to do action
+            timer (Float) - reaction time (global cool down) once action is done
+
+        Returns Dict - the new action or False if it was a duplicate"""
+        if (action, key) in self.keys:
+            return False
+
+        self.last_id += 1
+
+        new_action = {
+            Params.ACTION_ID: self.last_id,
+            Params.ACTION   : action,
+            Params.KEY      : key,
+            Params.DATA     : data,
+            Params.TIMER    : timer
+        }
+
+        self.actions[self.last_id] = new_action
+        self.keys[(action, key)] = self.last_id
+        self.buckets.setdefault(action, {})[self.last_id] = new_action
+
+        if action == Actions.FEED_ANIMAL:
+            self.push_feed(new_action)
+
+        return new_action
+
+    # ------------------------------------------------------------------------------------------------------------
+    def remove(self, action_id):
+        """Remove an action from the queue by id
+
+        Returns Boolean"""
+        action = self.actions.pop(action_id, None)
+
+        if action is None:
+            return False
+
+        del self.keys[(action[Params.ACTION], action[Params.KEY])]
+        del self.buckets[action[Params.ACTION]][action_id]
+
+        # FEED_ANIMAL heap entries are dropped lazily in get_next()
+        return True
+
+    # ------------------------------------------------------------------------------------------------------------
+    def remove_by_type(self, *action_types):
+        """Remove every action of the given types from the queue
+
+        Returns Int - number of actions removed"""
+        removed = 0
+
+        for action_type in action_types:
+            for action_id in list(self.buckets.get(action_type, {})):
+                removed += self.remove(action_id)
+
+            if action_type == Actions.FEED_ANIMAL:
+                self.feed_heap = []
+
+        return removed
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_next(self, action_type):
+        """Return the action of given type player would do next (without removing it)
+
+        Parameters:
+            action_type (String) - ActionType (from enums)
+
+        Returns Dict - action or False if none of that type are queued"""
+        bucket = self.buckets.get(action_type)
+
+        if not bucket:
+            return False
+
+        if action_type == Actions.FEED_ANIMAL:
+            # Random order - pick one of the candidates
+            if self.feed_order == 0:
+                actions = list(bucket.values())
+                return actions[self.rng.choice_index(len(actions))]
+
+            if self.feed_order in self.feed_sort_keys:
+                # Drop heap entries for actions that have since been removed
+                while self.feed_heap[0][-1] not in bucket:
+                    heapq.heappop(self.feed_heap)
+
+                return bucket[self.feed_heap[0][-1]]
+
+        return next(iter(bucket.values()))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_action_types(self):
+        """List the action type of every queued action (queue order)"""
+        return [a[Params.ACTION] for a in self.actions.values()]
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+class AnimalCollection:
+    """Running statistics on the animal types (and animal sets) a player has collected
+
+    Updated once per earned animal so the snapshot and egg/spin wheel checks can read the stats in O(1) instead of
+    rescanning the inventory.  Like the old inventory scans, donated animals still count as collected."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all collection instances)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, set_sizes):
+        """
+        AnimalCollection Constructor
+
+        set_sizes (Dict)           - Animal_Set_ID -> number of animals needed to complete the set
+        """
+        self.set_sizes = set_sizes
+
+        self.types = set()  # unique Animal_IDs collected
+        self.sets = set()  # Set_IDs with at least one animal collected
+        self.sets_count = np.zeros(max(set_sizes, default=0) + 1)  # unique animals collected per Set_ID
+        self.completed = []  # completed Set_IDs (sorted)
+        self.max_set = 0
+        self.max_completed = 0
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, animal_type_id, set_id):
+        """Record a newly earned animal
+
+        Parameters:
+            animal_type_id (Int) - Animal_ID (type, not the unique id)
+            set_id (Int) - Set_ID of the animal
+
+        Returns Boolean - was this a new animal type for the player"""
+        self.sets.add(set_id)
+        self.max_set = max(self.max_set, set_id)
+
+        if animal_type_id in self.types:
+            return False
+
+        self.types.add(animal_type_id)
+        self.sets_count[set_id] += 1
+
+        if self.sets_count[set_id] == self.set_sizes.get(set_id):
+            self.completed.append(set_id)
+            self.completed.sort()
+            self.max_completed = self.completed[-1]
+
+        return True
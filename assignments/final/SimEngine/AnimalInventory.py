@@ -0,0 +1,183 @@
+import heapq
+
+from .StringConstants import *
+
+
+class AnimalInventory:
+    """Player's animals indexed by unique id and by status (active, inventoried, donated)
+
+    Behaves like the old animal_inventory dictionary for reads (inventory[animal_id], in, len, items(), values())
+    but all status/level changes must go through set_status()/set_level() so the indexes stay in sync:
+        - by_status        : {AnimalState: {animal_id: animal}}
+        - revenue          : running total of Revenue for ACTIVE animals (soft currency per second)
+        - heaps            : best candidate to socket/swap/donate/feed (same sort tuples the Player used to sort by)
+
+    Heap entries are invalidated lazily - every change bumps the animal's version and pushes a fresh entry.  Every
+    change is also recorded as an Event.ANIMAL_STATE in the player's EventLog (events) once one is attached."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all inventory instances)
+
+    # heap name -> (status the heap covers, sort key)
+    orders = {
+        'socket': (AnimalState.INVENTORIED, lambda a: (a[Animal.LEVEL], -a[Animal.RARITY], a[Animal.ID])),
+        'donate': (AnimalState.INVENTORIED, lambda a: (-a[Animal.LEVEL], a[Animal.RARITY], a[Animal.ID])),
+        'swap'  : (AnimalState.ACTIVE, lambda a: (-a[Animal.LEVEL], a[Animal.RARITY], a[Animal.ID])),
+        'feed'  : (AnimalState.ACTIVE, lambda a: (a[Animal.LEVEL], -a[Animal.RARITY], a[Animal.ID])),
+    }
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self):
+        """
+        AnimalInventory Constructor
+        """
+        self.animals = {}  # animal_id -> animal (every animal ever earned, including donated)
+        self.by_status = {
+            AnimalState.ACTIVE     : {},
+            AnimalState.INVENTORIED: {},
+            AnimalState.DONATED    : {},
+        }
+        self.revenue = 0  # soft currency per second earned by ACTIVE animals
+        self.versions = {}  # animal_id -> change counter (stale heap entries have an older version)
+        self.heaps = {name: [] for name in self.orders}
+        self.events = None  # EventLog (set by Player.init_player)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.animals)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __contains__(self, animal_id):
+        return animal_id in self.animals
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __getitem__(self, animal_id):
+        return self.animals[animal_id]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __iter__(self):
+        return iter(self.animals)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def items(self):
+        return self.animals.items()
+
+    # ------------------------------------------------------------------------------------------------------------
+    def keys(self):
+        return self.animals.keys()
+
+    # ------------------------------------------------------------------------------------------------------------
+    def values(self):
+        return self.animals.values()
+
+    # ------------------------------------------------------------------------------------------------------------
+    def index(self, animal):
+        """Push fresh heap entries for the animal (for the heaps that cover its current status) and log the change"""
+        animal_id = animal[Animal.ID]
+
+        if self.events is not None:
+            self.events.add(Event.ANIMAL_STATE, animal_id, animal[Animal.TYPE_ID], animal[Animal.LEVEL],
+                            animal[Animal.STATUS])
+        version = self.versions.get(animal_id, 0) + 1
+        self.versions[animal_id] = version
+
+        for name, (status, sort_key) in self.orders.items():
+            if animal[Animal.STATUS] == status:
+                heap = self.heaps[name]
+                heapq.heappush(heap, (sort_key(animal), version, animal_id))
+
+                # Drop stale entries once they make up most of the heap
+                if len(heap) > 2 * len(self.by_status[status]) + 32:
+                    self.heaps[name] = [e for e in heap if self.versions[e[-1]] == e[-2]]
+                    heapq.heapify(self.heaps[name])
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, animal):
+        """Add a new animal (animal[Animal.STATUS] must already be set)
+
+        Parameters:
+            animal (Dict) - animal object with a unique Animal.ID"""
+        animal_id = animal[Animal.ID]
+
+        self.animals[animal_id] = animal
+        self.by_status[animal[Animal.STATUS]][animal_id] = animal
+
+        if animal[Animal.STATUS] == AnimalState.ACTIVE:
+            self.revenue += animal[Animal.REVENUE]
+
+        self.index(animal)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def set_status(self, animal_id, status):
+        """Change an animal's status (AnimalState.ACTIVE, .INVENTORIED, .DONATED)
+
+        Returns Boolean"""
+        animal = self.animals.get(animal_id)
+
+        if animal is None:
+            return False
+
+        old_status = animal[Animal.STATUS]
+        del self.by_status[old_status][animal_id]
+
+        if old_status == AnimalState.ACTIVE:
+            self.revenue -= animal[Animal.REVENUE]
+        if status == AnimalState.ACTIVE:
+            self.revenue += animal[Animal.REVENUE]
+
+        animal[Animal.STATUS] = status
+        self.by_status[status][animal_id] = animal
+        self.index(animal)
+
+        return True
+
+    # ------------------------------------------------------------------------------------------------------------
+    def set_level(self, animal_id, level):
+        """Change an animal's level
+
+        Returns Boolean"""
+        animal = self.animals.get(animal_id)
+
+        if animal is None:
+            return False
+
+        animal[Animal.LEVEL] = level
+        self.index(animal)
+
+        return True
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_by_status(self, status):
+        """List animals with the given status (AnimalState.ALL for every animal)
+
+        Returns List<Animal Dict Objects>"""
+        if status == AnimalState.ALL:
+            return list(self.animals.values())
+
+        return list(self.by_status.get(status, {}).values())
+
+    # ------------------------------------------------------------------------------------------------------------
+    def count(self, status):
+        """How many animals have the given status?
+
+        Returns Int"""
+        if status == AnimalState.ALL:
+            return len(self.animals)
+
+        return len(self.by_status.get(status, {}))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_best(self, name):
+        """Return the first animal for one of the orders ('socket', 'donate', 'swap', 'feed')
+
+        Returns Dict - Animal Object or False"""
+        heap = self.heaps[name]
+
+        # Drop entries for animals that changed since they were pushed
+        while heap and self.versions[heap[0][-1]] != heap[0][-2]:
+            heapq.heappop(heap)
+
+        if not heap:
+            return False
+
+        return self.animals[heap[0][-1]]
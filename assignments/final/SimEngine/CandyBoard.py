@@ -0,0 +1,133 @@
+import bisect
+
+
+class CandyBoard:
+    """Candy board (candy slots) stored as a count per candy level
+
+    The board never holds more than a handful of distinct levels, so keeping the single (count == 1) and pair
+    (count >= 2) levels in small sorted lists (updated on every add/remove/merge) makes every count/merge/unique
+    query O(1) and the lowest single / mergeable pairs in a level range a bisect instead of a scan of the board."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all board instances)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self):
+        """
+        CandyBoard Constructor
+        """
+        self.counts = {}  # candy level -> number of candies of that level on board
+        self.total = 0  # candy slots in use
+        self.singles = []  # levels with exactly 1 candy (sorted)
+        self.pairs = []  # levels with 2+ candies - can merge (sorted)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return self.total
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __contains__(self, candy_level):
+        return candy_level in self.counts
+
+    # ------------------------------------------------------------------------------------------------------------
+    def set_count(self, candy_level, count):
+        """Update count for a candy level and keep the single/pair indexes in sync"""
+        old = self.counts.get(candy_level, 0)
+
+        if old == 1:
+            self.singles.remove(candy_level)
+        elif old >= 2 and count < 2:
+            self.pairs.remove(candy_level)
+
+        if count <= 0:
+            self.counts.pop(candy_level, None)
+            return
+
+        self.counts[candy_level] = count
+
+        if count == 1:
+            bisect.insort(self.singles, candy_level)
+        elif old < 2:
+            bisect.insort(self.pairs, candy_level)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, candy_level):
+        """Put a candy on the board
+
+        Parameters:
+            candy_level (Int): Candy level"""
+        self.set_count(candy_level, self.counts.get(candy_level, 0) + 1)
+        self.total += 1
+
+    # ------------------------------------------------------------------------------------------------------------
+    def remove(self, candy_level):
+        """Take a candy off the board
+
+        Parameters:
+            candy_level (Int): Candy level
+
+        Returns Boolean - was there a candy of that level to remove"""
+        if candy_level not in self.counts:
+            return False
+
+        self.set_count(candy_level, self.counts[candy_level] - 1)
+        self.total -= 1
+
+        return True
+
+    # ------------------------------------------------------------------------------------------------------------
+    def merge(self, candy_level):
+        """Merge 2 candies of candy_level into 1 candy of candy_level + 1
+
+        Returns Boolean - were there 2+ candies to merge"""
+        if self.counts.get(candy_level, 0) < 2:
+            return False
+
+        self.set_count(candy_level, self.counts[candy_level] - 2)
+        self.set_count(candy_level + 1, self.counts.get(candy_level + 1, 0) + 1)
+        self.total -= 1
+
+        return True
+
+    # ------------------------------------------------------------------------------------------------------------
+    def count(self, candy_level):
+        """Return the number of candies of candy_level on board
+
+        Returns Int"""
+        return self.counts.get(candy_level, 0)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_levels(self):
+        """Sorted list of unique candy levels on board
+
+        Returns List<Int>"""
+        return sorted(self.counts)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_candies(self):
+        """Every candy on board (one entry per candy, lowest first)
+
+        Returns List<Int>"""
+        return [level for level in sorted(self.counts) for _ in range(self.counts[level])]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_lowest_single(self, level_min=None, level_max=None):
+        """Lowest candy level with exactly 1 candy on board (optionally within level_min...level_max)
+
+        Returns Int or False"""
+        i = 0 if level_min is None else bisect.bisect_left(self.singles, level_min)
+
+        if i == len(self.singles) or (level_max is not None and self.singles[i] > level_max):
+            return False
+
+        return self.singles[i]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_pair_levels(self, level_max=None):
+        """Sorted list of candy levels that have 2+ candies (can merge), optionally capped at level_max
+
+        Returns List<Int>"""
+        if level_max is None:
+            return list(self.pairs)
+
+        return self.pairs[:bisect.bisect_right(self.pairs, level_max)]
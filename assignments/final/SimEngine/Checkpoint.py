@@ -0,0 +1,251 @@
+import glob
+import json
+import os
+import pickle
+import shutil
+import struct
+
+import pyarrow as pa
+
+
+class Checkpoint:
+    """Save a player mid-simulation and pick it up again later (see Game.set_checkpoint)
+
+    A checkpoint is the whole Game - Player, SimOutput (snapshot rows so far), EventLog, action queue and the random
+    streams with their buffered draws - pickled and lz4 compressed behind a small header (magic, format version,
+    pickled size).  The economy (EconomyBundle) is left out and only its hash is stored: load() links the game back to
+    the bundle it is given and refuses a different economy.
+    The simpy environment can't be pickled - Game keeps just its clock and a new environment starts at the same
+    simulated time on load.
+
+    The game saves itself at the top of its frame loop (no frame half done) every interval simulated seconds, so a
+    resumed player runs exactly the same frames, draws and snapshots as one that never stopped.  The file is written
+    to {path}.tmp and then renamed, so a crash while saving keeps the previous checkpoint."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all checkpoints)
+    MAGIC = b'SIMCKPT'
+    VERSION = 1
+    HEADER = struct.Struct('<7sBQ')  # magic, version, pickled size
+    CODEC = 'lz4'  # fast enough to write often - the snapshot buffers still shrink ~8x
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, path, interval, fps):
+        """
+        Checkpoint Constructor
+
+        path (String)              - checkpoint file of the player
+        interval (Int)             - simulated seconds between checkpoints
+        fps (Int)                  - frames per simulated second
+        """
+        self.path = path
+        self.interval = int(interval) * int(fps)  # frames
+        self.next_frame = self.interval  # first frame (env.now) of the next checkpoint
+        self.saved = 0  # checkpoints written
+
+    # ------------------------------------------------------------------------------------------------------------
+    def check(self, game, now):
+        """Save the game if a checkpoint is due (called at the top of the frame loop)
+
+        Parameters:
+            game (Game) - the game to save
+            now (Int) - env.now"""
+        if now < self.next_frame:
+            return
+
+        self.next_frame = (now // self.interval + 1) * self.interval
+        self.saved += 1
+        self.save(game, self.path)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def to_bytes(cls, game, compress=True):
+        """Pickle a game (without its economy - see Game.__getstate__)
+
+        Parameters:
+            game (Game) - game to save
+            compress (Boolean) - compressed checkpoint format (header + lz4), off = plain pickle
+
+        Returns Bytes"""
+        # Profiler wrappers are closures - take them off while pickling (the counts are kept)
+        profiler = game.profiler
+        if profiler is not None:
+            profiler.detach(game)
+
+        try:
+            data = pickle.dumps((game.bundle.hash, game), protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            if profiler is not None:
+                profiler.attach(game)
+
+        if not compress:
+            return data
+
+        return cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(data)) + pa.compress(data, codec=cls.CODEC, asbytes=True)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def from_bytes(cls, data, bundle):
+        """Rebuild a game from to_bytes() (compressed or not)
+
+        Parameters:
+            data (Bytes) - saved game
+            bundle (EconomyBundle) - the economy the game was saved with
+
+        Returns Game"""
+        if data[:len(cls.MAGIC)] == cls.MAGIC:
+            _, version, size = cls.HEADER.unpack_from(data)
+
+            if version != cls.VERSION:
+                raise ValueError(f'Checkpoint version {version} is not supported (expected {cls.VERSION})')
+
+            data = pa.decompress(data[cls.HEADER.size:], size, codec=cls.CODEC, asbytes=True)
+
+        bundle_hash, game = pickle.loads(data)
+
+        if bundle_hash != bundle.hash:
+            raise ValueError(f'Checkpoint was saved with economy {bundle_hash[:12]}, not {bundle.hash[:12]}')
+
+        game.link_bundle(bundle)
+
+        if game.profiler is not None:
+            game.profiler.attach(game)
+
+        return game
+
+    # ------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def save(cls, game, path):
+        """Write a game's checkpoint (atomic - written next to path and renamed)
+
+        Parameters:
+            game (Game) - game to save
+            path (String) - checkpoint file"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path + '.tmp', 'wb') as f:
+            f.write(cls.to_bytes(game))
+
+        os.replace(path + '.tmp', path)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def load(cls, path, bundle):
+        """Read a game's checkpoint - continue it with game.start_sim(frames) as if it never stopped
+
+        Parameters:
+            path (String) - checkpoint file
+            bundle (EconomyBundle) - the economy the game was saved with
+
+        Returns Game"""
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read(), bundle)
+
+
+# ------------------------------------------------------------------------------------------------------------
+class RunCheckpoints:
+    """Checkpoint folder of one simulation run - what main.py needs to resume a run that was interrupted
+
+    Layout:
+        {folder}/run.json                   - master seed, CRN and the economy hash of every variant
+        {folder}/done.jsonl                 - one line per worker that exited cleanly: its id and the players it ran
+        {folder}/player-{run_number}.ckpt   - latest checkpoint of each player that isn't safely written yet
+
+    A player's checkpoint is removed once the worker that ran it has exited cleanly (its part files are complete).
+    The whole folder is removed when the run finishes."""
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, folder):
+        """
+        RunCheckpoints Constructor
+
+        folder (String)            - checkpoint folder of the run
+        """
+        self.folder = folder
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_path(self, run_number):
+        """Checkpoint file of a player
+
+        Returns String"""
+        return os.path.join(self.folder, f'player-{run_number}.ckpt')
+
+    # ------------------------------------------------------------------------------------------------------------
+    def save_run(self, master_seed, crn, bundles):
+        """Write run.json for a new run
+
+        Parameters:
+            master_seed (Int) - the run's master seed
+            crn (Boolean) - common random numbers
+            bundles (Dict) - {v_id: EconomyBundle}"""
+        os.makedirs(self.folder, exist_ok=True)
+
+        with open(os.path.join(self.folder, 'run.json'), 'w') as f:
+            json.dump({'master_seed': master_seed,
+                       'crn'        : crn,
+                       'bundles'    : {str(v_id): bundle.hash for v_id, bundle in bundles.items()}}, f, indent=1)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def load_run(self, crn, bundles):
+        """Read run.json of an interrupted run and check it is resumed with the same settings and economies
+
+        Parameters:
+            crn (Boolean) - common random numbers
+            bundles (Dict) - {v_id: EconomyBundle}
+
+        Returns Int - the run's master seed"""
+        with open(os.path.join(self.folder, 'run.json')) as f:
+            run = json.load(f)
+
+        hashes = {str(v_id): bundle.hash for v_id, bundle in bundles.items()}
+
+        if run['crn'] != crn or run['bundles'] != hashes:
+            raise ValueError(f'Run in {self.folder} was started with other variants, economies or CRN setting - '
+                             f'it can only be resumed with the same ones')
+
+        return run['master_seed']
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add_done(self, worker_id, run_numbers):
+        """Record a worker that exited cleanly and remove its players' checkpoints
+
+        Parameters:
+            worker_id (Int) - worker number
+            run_numbers (List<Int>) - players the worker ran"""
+        with open(os.path.join(self.folder, 'done.jsonl'), 'a') as f:
+            f.write(json.dumps({'worker': worker_id, 'players': sorted(run_numbers)}) + '\n')
+
+        for run_number in run_numbers:
+            if os.path.exists(self.get_path(run_number)):
+                os.remove(self.get_path(run_number))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_done(self):
+        """Workers that exited cleanly and the players they ran
+
+        Returns Tuple - (Set<Int> worker ids, Set<Int> run numbers)"""
+        workers, players = set(), set()
+        path = os.path.join(self.folder, 'done.jsonl')
+
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        done = json.loads(line)
+                        workers.add(done['worker'])
+                        players.update(done['players'])
+
+        return workers, players
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_saved(self):
+        """Players with a checkpoint
+
+        Returns Set<Int> - run numbers"""
+        return {int(os.path.basename(path)[7:-5]) for path in glob.glob(os.path.join(self.folder, 'player-*.ckpt'))}
+
+    # ------------------------------------------------------------------------------------------------------------
+    def remove(self):
+        """Remove the run's checkpoint folder"""
+        shutil.rmtree(self.folder, ignore_errors=True)
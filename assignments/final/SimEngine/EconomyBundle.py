@@ -0,0 +1,179 @@
+import hashlib
+from bisect import bisect_right
+
+import pandas as pd
+
+from .StringConstants import *
+
+
+class EconomyBundle:
+    """A variant's economy compiled once (in the parent process) and shared read-only by every Game
+
+    Holds the variant settings (Variants tab, minus the DataFrames), every data_* sheet converted to the dictionaries
+    the Game reads, and the level indexed lookup tables.  Nothing in here is modified during a simulation, so forked
+    workers can share the parent's copy and a task only needs to carry the variant id."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all bundle instances)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, variant, v_data):
+        """
+        EconomyBundle Constructor
+
+        variant (Integer)          - variant id
+        v_data (Dict)              - variant config from GoogleSheet (Variants Tab) with data_* sheets as DataFrames
+        """
+        self.variant = variant
+
+        # Variant settings (everything except the economy sheets)
+        self.v_data = {k: v for k, v in v_data.items() if not isinstance(v, pd.DataFrame)}
+
+        # --- animals config
+        self.data_animals = self.records(v_data[Variants.DATA_ANIMALS], Column.ANIMAL_ID)
+
+        # --- animal sets (rarity of each animal in the set)
+        self.data_animal_sets = self.records(v_data[Variants.DATA_ANIMAL_SETS], Column.ANIMAL_SET_ID)
+
+        # --- habitat slots for active animals in zoo
+        self.data_animal_sockets = self.records(v_data[Variants.DATA_ANIMAL_SOCKETS], Column.SOCKET_ID)
+
+        # --- candy config
+        self.data_candies = self.records(v_data[Variants.DATA_CANDIES], Column.CANDY_LEVEL)
+
+        # --- candy board for merging candies
+        self.data_candy_slots = self.records(v_data[Variants.DATA_CANDY_SLOTS], Column.CANDY_SLOT_ID)
+
+        # --- names/labels for really big values
+        self.data_currency_labels = self.records(v_data[Variants.DATA_CURRENCY_LABELS], Column.CURR_NUMBER)
+
+        # --- Egg Progress config
+        # The data_eggs tab in Google is not laid out correct - need to reformat it (one row per egg)
+        self.data_eggs = {}
+
+        egg_id = 1
+        for _, row in v_data[Variants.DATA_EGGS].iterrows():
+            for c in range(0, int(row[Column.EGG_COUNT])):
+                self.data_eggs[egg_id] = {
+                    Column.EGG_ID      : egg_id,
+                    Column.PLAYER_LEVEL: row[Column.PLAYER_LEVEL],
+                    Column.EGG_COUNT   : row[Column.EGG_COUNT],
+                    Column.GOAL        : row[Column.GOAL],
+                    Column.REWARD_ID   : row[Column.REWARD_ID],
+                    Column.CUMULATIVE  : egg_id
+                }
+
+                egg_id += 1
+
+        # --- Egg config - map egg_id to rules about what they contain
+        self.data_gacha_eggs = self.records(v_data[Variants.DATA_GACHA_EGGS], Column.EGG_ID)
+
+        # --- Player config per player_level
+        self.data_player_levels = self.records(v_data[Variants.DATA_PLAYER_LEVELS], Column.PLAYER_LEVEL)
+
+        # --- RTP (Return to Player) config for free crates
+        self.data_rtp = self.records(v_data[Variants.DATA_RTP], Column.PLAYER_LEVEL)
+
+        # --- Shop Config
+        self.data_shop = self.records(v_data[Variants.DATA_SHOP], Column.SHOP_ID, Column.CURRENCY, Column.CURRENCY_SOFT)
+
+        # Level indexed lookup tables for the hot accessors
+        self.lookup = self.compile_lookups()
+
+        # Fingerprint of settings + economy (same content -> same hash, in any process)
+        self.hash = self.get_content_hash()
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def records(df, *key_cols):
+        """Convert a sheet to a dictionary of row dictionaries keyed by key_cols
+
+        Parameters:
+            df (DataFrame) - sheet
+            key_cols (String) - column(s) making up the key (tuple key if more than one)
+
+        Returns Dict"""
+        rows = df.to_dict(orient="records")
+
+        if len(key_cols) == 1:
+            return {b[key_cols[0]]: b for b in rows}
+
+        return {tuple(b[col] for col in key_cols): b for b in rows}
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def compile_prefix(unlock_levels, max_level):
+        """For every level 0...max_level, how many leading rows are unlocked?  (Rows are read in order and the
+        first locked row stops the scan - same as the old loop/break lookups)
+
+        Parameters:
+            unlock_levels (List<Int>) - unlock level of each row, in sheet order
+            max_level (Int) - highest level to build the table for
+
+        Returns List<Int> - indexed by level"""
+        running_max = []
+        for unlock_level in unlock_levels:
+            running_max.append(max(running_max[-1], unlock_level) if running_max else unlock_level)
+
+        return [bisect_right(running_max, level) for level in range(max_level + 1)]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def compile_lookups(self):
+        """Build the level indexed tables behind Game.animal_socket_cap, candy_slot_cap, get_unlocked_animals,
+        get_egg_id, get_player_xp_level, etc.
+
+        Returns Dict"""
+        animals = list(self.data_animals.values())
+        sockets = list(self.data_animal_sockets.values())
+        slots = list(self.data_candy_slots.values())
+        levels = list(self.data_player_levels.values())
+
+        # Any level above every unlock level sees the whole table, so lookups clamp to max_level
+        max_level = int(max([a[Column.LEVEL_UNLOCKED] for a in animals] +
+                            [a[Column.UNLOCK_LEVEL] for a in sockets] +
+                            [c[Column.UNLOCK_LEVEL] for c in slots] +
+                            [lvl[Column.PLAYER_LEVEL] for lvl in levels] + [0])) + 1
+
+        # --- Unlocked animals (prefix of data_animals) - share one list per distinct prefix
+        animal_prefix = self.compile_prefix([a[Column.LEVEL_UNLOCKED] for a in animals], max_level)
+        animal_lists = {n: animals[:n] for n in set(animal_prefix)}
+
+        # --- Socket / candy slot caps
+        socket_prefix = self.compile_prefix([a[Column.UNLOCK_LEVEL] for a in sockets], max_level)
+        slot_prefix = self.compile_prefix([c[Column.UNLOCK_LEVEL] for c in slots], max_level)
+
+        # --- XP needed for each level (running max so bisect matches the old loop/break scan)
+        xp_totals = []
+        for lvl in levels:
+            xp_totals.append(max(xp_totals[-1], lvl[Column.XP_REQ_TOTAL]) if xp_totals else lvl[Column.XP_REQ_TOTAL])
+
+        # --- First egg for each player level (levels without eggs are missing)
+        first_egg_id = {}
+        for egg_id, egg in self.data_eggs.items():
+            first_egg_id.setdefault(egg[Column.PLAYER_LEVEL], egg_id)
+
+        return {
+            'max_level'       : max_level,
+            'unlocked_animals': [animal_lists[n] for n in animal_prefix],
+            'socket_cap'      : [sockets[n - 1][Column.SOCKET_ID] if n else 0 for n in socket_prefix],
+            'slot_cap'        : [slots[n - 1][Column.CANDY_SLOTS] if n else 0 for n in slot_prefix],
+            'xp_totals'       : xp_totals,
+            'xp_levels'       : [lvl[Column.PLAYER_LEVEL] for lvl in levels],
+            'candy_range'     : {lvl[Column.PLAYER_LEVEL]: (lvl[Column.CANDY_LEVEL_MIN], lvl[Column.CANDY_LEVEL_MAX])
+                                 for lvl in levels},
+            'level_reward'    : {lvl[Column.PLAYER_LEVEL]: (lvl[Column.LUR_SOFT], lvl[Column.LUR_EGG_ID])
+                                 for lvl in levels},
+            'first_egg_id'    : first_egg_id,
+        }
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_content_hash(self):
+        """SHA1 of the variant settings and economy sheets
+
+        Returns String"""
+        content = repr((sorted(self.v_data.items(), key=lambda kv: str(kv[0])),
+                        self.data_animals, self.data_animal_sets, self.data_animal_sockets, self.data_candies,
+                        self.data_candy_slots, self.data_currency_labels, self.data_eggs, self.data_gacha_eggs,
+                        self.data_player_levels, self.data_rtp, self.data_shop))
+
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
@@ -0,0 +1,174 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from .StringConstants import *
+
+
+class EventLog:
+    """Typed, columnar log of everything a player did (long format - one row per event)
+
+    Every event is 7 int64 values appended to one flat array: the snapshot interval it happened in, the frame, the
+    event type (Event.*) and up to two ids, a level and an amount:
+        Event.ANIMAL_EARNED   : id_1 animal unique id, id_2 animal type id
+        Event.ANIMAL_STATE    : id_1 animal unique id, id_2 animal type id, level, amount AnimalState (every add,
+                                level or status change - see AnimalInventory)
+        Event.BUY_CANDY       : level candy level bought
+        Event.DONATE_ANIMAL   : id_1 animal unique id
+        Event.EGG_COMPLETE    : id_1 egg id (SPIN_EGG for spin wheel eggs), id_2 egg type
+        Event.FEED_ANIMAL     : id_1 animal unique id, level candy level fed
+        Event.FREE_CRATE      : -
+        Event.MERGE_CANDY     : level new candy level
+        Event.PLAYER_LEVEL_UP : level new player level, amount levels gained
+        Event.SPIN_WHEEL_1/2  : id_1 animal unique id won
+        Event.SWAP_ANIMAL     : id_1 animal taken out of its socket, id_2 animal put in
+
+    Events logged before snapshot row k is saved (and after row k - 1) belong to snapshot k.  The old comma-joined
+    snapshot columns (anim_ids, actions_*) and the a_<Animal_ID> inventory columns are views rebuilt from the log
+    (get_strings, get_animal_columns)."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all event logs)
+    columns = ['snapshot', 'frame', 'event', 'id_1', 'id_2', 'level', 'amount']
+
+    names = {
+        Event.ANIMAL_EARNED  : 'animal_earned',
+        Event.ANIMAL_STATE   : 'animal_state',
+        Event.BUY_CANDY      : 'buy_candy',
+        Event.DONATE_ANIMAL  : 'donate_animal',
+        Event.EGG_COMPLETE   : 'egg_complete',
+        Event.FEED_ANIMAL    : 'feed_animal',
+        Event.FREE_CRATE     : 'free_crate',
+        Event.MERGE_CANDY    : 'merge_candy',
+        Event.PLAYER_LEVEL_UP: 'player_level_up',
+        Event.SPIN_WHEEL_1   : 'spin_wheel_1',
+        Event.SPIN_WHEEL_2   : 'spin_wheel_2',
+        Event.SWAP_ANIMAL    : 'swap_animal',
+    }
+
+    SPIN_EGG = -1  # egg id logged for spin wheel eggs (egg id 'S')
+
+    # How each event is printed in the comma-joined snapshot columns (id_1, id_2, level) -> String
+    formats = {
+        Event.ANIMAL_EARNED: lambda id_1, id_2, level: f'{id_2},',
+        Event.BUY_CANDY    : lambda id_1, id_2, level: f'{level},',
+        Event.EGG_COMPLETE : lambda id_1, id_2, level: f'({"S" if id_1 == EventLog.SPIN_EGG else id_1},{id_2}),',
+        Event.FEED_ANIMAL  : lambda id_1, id_2, level: f'({id_1}, {level}),',
+        Event.MERGE_CANDY  : lambda id_1, id_2, level: f'{level},',
+        Event.SPIN_WHEEL_1 : lambda id_1, id_2, level: f'{id_1},',
+        Event.SPIN_WHEEL_2 : lambda id_1, id_2, level: f'{id_1},',
+        Event.SWAP_ANIMAL  : lambda id_1, id_2, level: f'(-{id_1},+{id_2}),',
+    }
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, game):
+        """
+        EventLog Constructor
+
+        game (Game)                - game the events happen in (supplies the frame)
+        """
+        self.game = game
+        self.data = array('q')  # flat: len(columns) values per event
+        self.snapshot = 0  # snapshot interval new events belong to
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.data) // len(self.columns)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, event, id_1=0, id_2=0, level=0, amount=0):
+        """Record one event (see the class docstring for what each field holds)
+
+        Parameters:
+            event (Int) - Event type
+            id_1 (Int) - first id
+            id_2 (Int) - second id
+            level (Int) - level
+            amount (Int) - amount"""
+        self.data.extend((self.snapshot, self.game.frame, event, id_1, id_2, level, amount))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def next_snapshot(self):
+        """A snapshot row was saved - following events belong to the next one"""
+        self.snapshot += 1
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_array(self):
+        """Every event as a (events x columns) int64 array
+
+        Returns ndarray"""
+        return np.array(self.data, dtype=np.int64).reshape(-1, len(self.columns))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_df(self):
+        """Build a DataFrame from the log (event column holds the event name)
+
+        Returns DataFrame"""
+        df = pd.DataFrame(self.to_array(), columns=self.columns)
+        df['event'] = df['event'].map(self.names)
+
+        return df
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_strings(self, event, rows):
+        """Comma-joined view of one event type per snapshot row (the old anim_ids / actions_* columns)
+
+        Parameters:
+            event (Int) - Event type (must have an entry in formats)
+            rows (Int) - number of snapshot rows
+
+        Returns ndarray<String>"""
+        events = self.to_array()
+        events = events[(events[:, 2] == event) & (events[:, 0] < rows)]
+
+        fmt = self.formats[event]
+        pieces = [[] for _ in range(rows)]
+        for snapshot, _, _, id_1, id_2, level, _ in events.tolist():
+            pieces[snapshot].append(fmt(id_1, id_2, level))
+
+        return np.array([''.join(row) for row in pieces], dtype=object)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_animal_columns(self, rows):
+        """Replay the animal state events into the a_<Animal_ID> inventory columns - "(id,level,S|I)," for every
+        socketed (S) or inventoried (I) animal of the type, NaN when the player has none
+
+        Parameters:
+            rows (Int) - number of snapshot rows
+
+        Returns Dict - column name -> ndarray"""
+        events = self.to_array()
+        events = events[(events[:, 2] == Event.ANIMAL_STATE) & (events[:, 0] < rows)]
+
+        types = {}  # animal type id -> {animal unique id: (level, status)} in the order the animals were earned
+        runs = {}  # animal type id -> [(first row, value), ...]
+        events = events.tolist()
+        i = 0
+
+        while i < len(events):
+            # apply every change made before this snapshot, then only rebuild the types that changed
+            row = events[i][0]
+            dirty = set()
+
+            while i < len(events) and events[i][0] == row:
+                _, _, _, key, type_id, level, status = events[i]
+                types.setdefault(type_id, {})[key] = (level, status)
+                dirty.add(type_id)
+                i += 1
+
+            for type_id in sorted(dirty):
+                value = ''.join(f'({key},{level},{"S" if status == AnimalState.ACTIVE else "I"}),'
+                                for key, (level, status) in types[type_id].items()
+                                if status in (AnimalState.ACTIVE, AnimalState.INVENTORIED))
+
+                runs.setdefault(type_id, []).append((row, value or np.nan))
+
+        columns = {}
+        for type_id, type_runs in runs.items():
+            column = columns[f'a_{type_id}'] = np.full(rows, np.nan, dtype=object)
+
+            for (first, value), (end, _) in zip(type_runs, type_runs[1:] + [(rows, None)]):
+                column[first:end] = value
+
+        return columns
@@ -1,9 +1,15 @@
 import simpy
-import random
 import math
 
-from functools import lru_cache
+from bisect import bisect_right
 
+from SimEngine.ActionQueue import ActionQueue
+from SimEngine.CandyBoard import CandyBoard
+from SimEngine.Checkpoint import Checkpoint
+from SimEngine.EconomyBundle import EconomyBundle
+from SimEngine.RandomSource import RandomSource
+from SimEngine.EventLog import EventLog
+from SimEngine.Profiler import PhaseProfiler
 from SimEngine.SimOutput import *
 from SimEngine.StringConstants import *
 from SimEngine.UtilityFunctions import *
@@ -14,19 +20,35 @@ class Game:
     
     # -----------------------------------------------------------
     # STATIC PROPERTIES GO HERE (Shared by all player instances)
-    is_logging_enabled = False
+    
+    # Economy tables set by link_bundle - shared by every player of the variant, left out of the pickled state
+    bundle_attributes = ['bundle', 'data_animals', 'data_animal_sets', 'data_animal_sockets', 'data_candies',
+                         'data_candy_slots', 'data_currency_labels', 'data_eggs', 'data_gacha_eggs',
+                         'data_player_levels', 'data_rtp', 'data_shop', 'lookup']
+    
+    # sim_log_level values (a message is written when its level is at or above the level of its category)
+    log_level_names = {
+        'debug'  : LogLevel.DEBUG,
+        'info'   : LogLevel.INFO,
+        'warning': LogLevel.WARNING,
+        'error'  : LogLevel.ERROR,
+        'off'    : LogLevel.OFF,
+    }
     
     # =============================================================================================================
     # SETUP and INITIALIZE Game
     # =============================================================================================================
-    def __init__(self):
+    def __init__(self, seed=None):
         """
         Game Constructor
+
+        seed (Int/SeedSequence)    - seed for this player's random numbers (see RandomSource.spawn)
         """
-        random.seed(42)
-        
         self.env = simpy.Environment()
         
+        # ----- Random numbers (buffered, one source per player) -----
+        self.rng = RandomSource(seed)
+        
         # ----- Time track -----
         self.day = 1
         self.session = 1  # track the current session number
@@ -37,25 +59,39 @@ class Game:
         self.time_session = 0
         self.time_video_reset = 0
         
-        # ----- Economy Config Data loaded from Google Sheets -----
+        # ----- Economy Config Data loaded from Google Sheets (shared, read-only - see EconomyBundle) -----
+        self.bundle = None
         self.data_animals = None
+        self.data_animal_sets = None
         self.data_animal_sockets = None
         self.data_candy_slots = None
         self.data_candies = None
         self.data_currency_labels = None
         self.data_eggs = None
-        self.data_eggs_raw = None
         self.data_gacha_eggs = None
         self.data_player_levels = None
         self.data_rtp = None
         self.data_shop = None
         
+        # ----- Lookup tables compiled from the economy config (see EconomyBundle.compile_lookups) -----
+        self.lookup = {}
+        
         # ----- Simulation Output - will get dumped to CSV -----
         self.snapshot = None
+        self.events = EventLog(self)  # everything the player did (see EventLog)
         
         # ----- Player reference -----
         self.player = None
         
+        # ----- Logging - lowest level written for each category (see set_logging) -----
+        self.log_levels = dict.fromkeys(Log.CATEGORIES, LogLevel.OFF)
+        
+        # ----- Phase timers (PhaseProfiler - only when the variant sets sim_profile) -----
+        self.profiler = None
+        
+        # ----- Saves the game every so many simulated seconds (Checkpoint - only when set_checkpoint is called) -----
+        self.checkpoint = None
+        
         # ----- Player settings (may differ based on variant) -----
         self.settings = {
             Setting.CANDY_LEVEL_MAX       : 0,
@@ -79,9 +115,9 @@ class Game:
         
         # ----- Track Game State Data -----
         self.state = {
-            State.ACTIONS             : [],  # Player Action queue
+            State.ACTIONS             : ActionQueue(rng=self.rng.stream(Stream.FEED)),  # Player Action queue
             State.ANIMAL_SOCKETS      : [],  # Animals in habitats earning $
-            State.CANDY_SLOTS         : [],  # Candy's on board available for merging or feeding
+            State.CANDY_SLOTS         : CandyBoard(),  # Candy's on board available for merging or feeding
             State.CURRENT_EGG_ID      : 0,  # Which egg is player working on completing
             State.CURRENT_EGG_PROGRESS: 0,  # Player progress on completing current egg
             State.FREE_CRATE_NUMBER   : 0,  # counter - increments with each free crate
@@ -91,74 +127,18 @@ class Game:
     
     # -------------------------------------------------------------------------------------------------------------
     def init_game(self, v_data):
-        """Set the economy this player will use"""
-        
-        # Each player makes a copy of the original untouched master DataFrames (loaded from GoogleSheets)
-        # Note: we convert each dataframe to a dictionary for performance
-        
-        # --- animals config
-        self.data_animals = v_data[Variants.DATA_ANIMALS]
-        self.data_animals = self.data_animals.to_dict(orient="records")
-        self.data_animals = {(b[Column.ANIMAL_ID]): b for b in self.data_animals}
-        
-        # --- habitat slots for active animals in zoo
-        self.data_animal_sockets = v_data[Variants.DATA_ANIMAL_SOCKETS]
-        self.data_animal_sockets = self.data_animal_sockets.to_dict(orient="records")
-        self.data_animal_sockets = {(b[Column.SOCKET_ID]): b for b in self.data_animal_sockets}
-        
-        # --- candy config
-        self.data_candies = v_data[Variants.DATA_CANDIES]
-        self.data_candies = self.data_candies.to_dict(orient="records")
-        self.data_candies = {(b[Column.CANDY_LEVEL]): b for b in self.data_candies}
-        
-        # --- candy board for merging candies
-        self.data_candy_slots = v_data[Variants.DATA_CANDY_SLOTS]
-        self.data_candy_slots = self.data_candy_slots.to_dict(orient="records")
-        self.data_candy_slots = {(b[Column.CANDY_SLOT_ID]): b for b in self.data_candy_slots}
-        
-        # --- names/labels for really big values
-        self.data_currency_labels = v_data[Variants.DATA_CURRENCY_LABELS]
-        self.data_currency_labels = self.data_currency_labels.to_dict(orient="records")
-        self.data_currency_labels = {(b[Column.CURR_NUMBER]): b for b in self.data_currency_labels}
-        
-        # --- Egg Progress config
-        # The data_eggs tab in Google is not laid out correct - need to reformat it
-        self.data_eggs_raw = v_data[Variants.DATA_EGGS]
-        self.data_eggs = {}
-        
-        egg_id = 1
-        for _, row in self.data_eggs_raw.iterrows():
-            for c in range(0, int(row[Column.EGG_COUNT])):
-                self.data_eggs[egg_id] = {
-                    Column.EGG_ID      : egg_id,
-                    Column.PLAYER_LEVEL: row[Column.PLAYER_LEVEL],
-                    Column.EGG_COUNT   : row[Column.EGG_COUNT],
-                    Column.GOAL        : row[Column.GOAL],
-                    Column.REWARD_ID   : row[Column.REWARD_ID],
-                    Column.CUMULATIVE  : egg_id
-                }
-                
-                egg_id += 1
-        
-        # --- Egg config - map egg_id to rules about what they contain
-        self.data_gacha_eggs = v_data[Variants.DATA_GACHA_EGGS]
-        self.data_gacha_eggs = self.data_gacha_eggs.to_dict(orient="records")
-        self.data_gacha_eggs = {(b[Column.EGG_ID]): b for b in self.data_gacha_eggs}
-        
-        # --- Player config per player_level
-        self.data_player_levels = v_data[Variants.DATA_PLAYER_LEVELS]
-        self.data_player_levels = self.data_player_levels.to_dict(orient="records")
-        self.data_player_levels = {(b[Column.PLAYER_LEVEL]): b for b in self.data_player_levels}
+        """Set the economy this player will use
+
+        Parameters:
+            v_data (EconomyBundle or Dict) - compiled economy shared by every player of the variant, or the raw
+                                              variant config (Variants Tab + data_* DataFrames) to compile here"""
         
-        # --- RTP (Return to Player) config for free crates
-        self.data_rtp = v_data[Variants.DATA_RTP]
-        self.data_rtp = self.data_rtp.to_dict(orient="records")
-        self.data_rtp = {(b[Column.PLAYER_LEVEL]): b for b in self.data_rtp}
+        # The bundle is compiled once per variant (in the parent process) and only ever read, so every player
+        # keeps a reference to the same dictionaries instead of converting its own copy of the DataFrames
+        bundle = v_data if isinstance(v_data, EconomyBundle) else EconomyBundle(None, v_data)
+        v_data = bundle.v_data
         
-        # --- Shop Config
-        self.data_shop = v_data[Variants.DATA_SHOP]
-        self.data_shop = self.data_shop.to_dict(orient="records")
-        self.data_shop = {(b[Column.SHOP_ID], b[Column.CURRENCY], b[Column.CURRENCY_SOFT]): b for b in self.data_shop}
+        self.link_bundle(bundle)
         
         # Class to manage simulation output CSV
         self.snapshot = SimOutput(self)
@@ -180,20 +160,63 @@ class Game:
         self.settings[Setting.VIDEO_LIMIT] = v_data[Variants.VIDEO_LIMIT]
         self.settings[Setting.VIDEO_LIMIT_RESET] = v_data[Variants.VIDEO_LIMIT_RESET]
         
+        self.set_logging(v_data.get(Variants.SIM_LOG_LEVEL, 'off'), v_data.get(Variants.SIM_LOG_CATEGORIES, Log.ALL))
+        
         # Initial Free Crate timer in game status
         self.state[State.FREE_CRATE_TIMER] = self.get_rtp_timer()
     
+    # -------------------------------------------------------------------------------------------------------------
+    def link_bundle(self, bundle):
+        """Point the economy tables at a compiled bundle (init_game, and again when a checkpoint is loaded)
+        
+        Parameters:
+            bundle (EconomyBundle) - compiled economy of the player's variant"""
+        self.bundle = bundle
+        self.data_animals = bundle.data_animals
+        self.data_animal_sets = bundle.data_animal_sets
+        self.data_animal_sockets = bundle.data_animal_sockets
+        self.data_candies = bundle.data_candies
+        self.data_candy_slots = bundle.data_candy_slots
+        self.data_currency_labels = bundle.data_currency_labels
+        self.data_eggs = bundle.data_eggs
+        self.data_gacha_eggs = bundle.data_gacha_eggs
+        self.data_player_levels = bundle.data_player_levels
+        self.data_rtp = bundle.data_rtp
+        self.data_shop = bundle.data_shop
+        
+        # Level indexed lookup tables for the hot accessors
+        self.lookup = bundle.lookup
+    
+    # -------------------------------------------------------------------------------------------------------------
+    def set_logging(self, level, categories=Log.ALL):
+        """Pick what Game.log writes
+        
+        Parameters:
+            level (String) - lowest level written ('debug', 'info', 'warning', 'error' or 'off')
+            categories (String) - comma separated Log categories to write ('all' = every category)"""
+        level = self.log_level_names[str(level).strip().lower()]
+        categories = {c.strip().lower() for c in str(categories).split(',')}
+        
+        for category in Log.CATEGORIES:
+            enabled = Log.ALL in categories or category in categories
+            self.log_levels[category] = level if enabled else LogLevel.OFF
+    
     # -------------------------------------------------------------------------------------------------------------
     def set_player(self, player):
         """Create reference to the player instance"""
         self.player = player
         
         self.snapshot.init(player)
+        
+        # Time every sim_profile-th frame's phases (0 = off)
+        sample_every = int(self.bundle.v_data.get(Variants.SIM_PROFILE, 0) or 0)
+        if sample_every > 0:
+            self.profiler = PhaseProfiler(sample_every)
+            self.profiler.attach(self)
     
     # =============================================================================================================
     # ANIMAL Methods
     # =============================================================================================================
-    @lru_cache()
     def get_animal_by_animal_id(self, animal_id):
         """Get animal details from config data
         
@@ -206,7 +229,6 @@ class Game:
         return False
     
     # -------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_animal_set(self, animal_id):
         """Get animal set for the provided animal_id
 
@@ -219,7 +241,16 @@ class Game:
         return False
     
     # -------------------------------------------------------------------------------------------------------------
-    @lru_cache()
+    def get_animal_set_sizes(self):
+        """How many animals are in each animal set (one Rarity_n column per animal in the set)?
+
+        Returns Dict - Animal_Set_ID: Int"""
+        rarity_cols = [Column.RARITY_1, Column.RARITY_2, Column.RARITY_3, Column.RARITY_4, Column.RARITY_5]
+        
+        return {set_id: sum(1 for col in rarity_cols if animal_set.get(col, 0) >= 1)
+                for set_id, animal_set in self.data_animal_sets.items()}
+    
+    # -------------------------------------------------------------------------------------------------------------
     def get_unlocked_animals(self, player_level):
         """Get all unlocked animals based on player player_level
         
@@ -227,15 +258,10 @@ class Game:
             player_level (Int): Current player player_level
             
         Returns List of animal Dictionaries"""
-        animals = []
-        
-        for animal_id, animal in self.data_animals.items():
-            if animal[Column.LEVEL_UNLOCKED] <= player_level:
-                animals.append(animal)
-            else:
-                break
+        if player_level < 0:
+            return []
         
-        return animals
+        return self.lookup['unlocked_animals'][min(player_level, self.lookup['max_level'])]
     
     # -------------------------------------------------------------------------------------------------------------
     def get_animals_not_found(self, player_level):
@@ -248,7 +274,7 @@ class Game:
         animals = []
         
         unlocked_animals = self.get_unlocked_animals(player_level)
-        acquired_animals = self.player.get_acquired_animals()
+        acquired_animals = self.player.collection.types
         
         for animal in unlocked_animals:
             if animal[Animal.TYPE_ID] not in acquired_animals:
@@ -293,7 +319,6 @@ class Game:
     # =============================================================================================================
     # ANIMAL SOCKET Methods
     # =============================================================================================================
-    @lru_cache()
     def animal_socket_cap(self, player_level):
         """Return number of active animals player can have at their player_level
 
@@ -301,15 +326,10 @@ class Game:
             player_level (Int): Current player player_level
 
         Returns Int"""
-        socket_cap = 0
-        
-        for idx, a in self.data_animal_sockets.items():
-            if a[Column.UNLOCK_LEVEL] <= player_level:
-                socket_cap = a[Column.SOCKET_ID]
-            else:
-                break
+        if player_level < 0:
+            return 0
         
-        return socket_cap
+        return self.lookup['socket_cap'][min(player_level, self.lookup['max_level'])]
     
     # ------------------------------------------------------------------------------------------------------------
     def animal_socket_available(self):
@@ -343,7 +363,7 @@ class Game:
             
             if animal_id not in self.state[State.ANIMAL_SOCKETS]:
                 self.state[State.ANIMAL_SOCKETS].append(animal_id)
-                self.player.animal_inventory[animal_id][Animal.STATUS] = AnimalState.ACTIVE
+                self.player.animal_inventory.set_status(animal_id, AnimalState.ACTIVE)
                 return True
         else:
             return False
@@ -358,7 +378,7 @@ class Game:
         Returns Boolean"""
         if animal_id in self.state[State.ANIMAL_SOCKETS]:
             self.state[State.ANIMAL_SOCKETS].remove(animal_id)
-            self.player.animal_inventory[animal_id][Animal.STATUS] = AnimalState.INVENTORIED
+            self.player.animal_inventory.set_status(animal_id, AnimalState.INVENTORIED)
             
             return True
         else:
@@ -379,7 +399,6 @@ class Game:
     # ============================================================================================================
     # CANDY Methods
     # ============================================================================================================
-    @lru_cache()
     def candy_data(self, candy_level):
         """Return candy details for given candy player_level
 
@@ -390,7 +409,6 @@ class Game:
         return self.data_candies[candy_level]
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_candy_cost(self, candy_level):
         """Return candy cost for the given candy player_level
 
@@ -403,7 +421,6 @@ class Game:
     # ============================================================================================================
     # CANDY SLOT Methods
     # ============================================================================================================
-    @lru_cache()
     def candy_slot_cap(self, player_level):
         """Return board size (candy slots) for merging candies
 
@@ -411,15 +428,10 @@ class Game:
             player_level (Int): Player player_level
 
         Returns Int"""
-        slot_cap = 0
-        
-        for idx, c in self.data_candy_slots.items():
-            if c[Column.UNLOCK_LEVEL] <= player_level:
-                slot_cap = c[Column.CANDY_SLOTS]
-            else:
-                break
+        if player_level < 0:
+            return 0
         
-        return slot_cap
+        return self.lookup['slot_cap'][min(player_level, self.lookup['max_level'])]
     
     # ------------------------------------------------------------------------------------------------------------
     def candy_slot_available(self):
@@ -440,7 +452,7 @@ class Game:
 
         Returns Boolean"""
         if self.candy_slot_available():
-            self.state[State.CANDY_SLOTS].append(candy_level)
+            self.state[State.CANDY_SLOTS].add(candy_level)
             return True
         else:
             return False
@@ -453,25 +465,21 @@ class Game:
             candy_level (Int): Candy player_level
 
         Returns Boolean"""
-        if candy_level in self.state[State.CANDY_SLOTS]:
-            self.state[State.CANDY_SLOTS].remove(candy_level)
-            return True
-        else:
-            return False
+        return self.state[State.CANDY_SLOTS].remove(candy_level)
     
     # ------------------------------------------------------------------------------------------------------------
     def get_candy_slot_candies(self):
         """Get list of all candy levels on board
 
         Returns List"""
-        return self.state[State.CANDY_SLOTS]
+        return self.state[State.CANDY_SLOTS].get_candies()
     
     # ------------------------------------------------------------------------------------------------------------
     def get_candy_slot_unique(self):
-        """Get a list of all unique candy levels (no duplicates) on board
+        """Get a sorted list of all unique candy levels (no duplicates) on board
 
         Returns List"""
-        return list(set(self.state[State.CANDY_SLOTS]))
+        return self.state[State.CANDY_SLOTS].get_levels()
     
     # ------------------------------------------------------------------------------------------------------------
     def get_candy_count(self, candy_level):
@@ -481,12 +489,11 @@ class Game:
             candy_level (Int) - candy player_level to find
             
         Returns Int"""
-        return len([1 for c in self.state[State.CANDY_SLOTS] if c == candy_level])
+        return self.state[State.CANDY_SLOTS].count(candy_level)
     
     # ============================================================================================================
     # EGGS
     # ============================================================================================================
-    @lru_cache()
     def get_egg_data(self, egg_id):
         """Return Dictionary of Egg Config details for given egg_id
 
@@ -500,7 +507,6 @@ class Game:
         return False
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def are_eggs_unlocked(self, player_level):
         """Are the Eggs feature available for player (at their player_level)?
 
@@ -508,14 +514,10 @@ class Game:
             player_level (Int) - player player_level
 
         Returns Boolean"""
-        for egg_id, e in self.data_eggs.items():
-            if e[Column.PLAYER_LEVEL] == player_level:
-                return e[Column.EGG_COUNT] > 0
-        
-        return False
+        # data_eggs only has rows for levels with 1+ eggs
+        return player_level in self.lookup['first_egg_id']
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_egg_id(self, player_level):
         """Get the first egg_id for the player's player_level (there may be multiple eggs per player_level
 
@@ -523,14 +525,9 @@ class Game:
             player_level (Int) - player player_level
 
         Returns Int or False"""
-        for egg_id, e in self.data_eggs.items():
-            if e[Column.PLAYER_LEVEL] == player_level:
-                return egg_id
-        
-        return False
+        return self.lookup['first_egg_id'].get(player_level, False)
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_egg_goal(self, egg_id):
         """Get the progression goal for the egg_id
 
@@ -568,7 +565,6 @@ class Game:
         return False
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_egg_reward(self, egg_id):
         """Get the reward for completing a specific egg
 
@@ -576,7 +572,6 @@ class Game:
         return self.get_egg_data(egg_id)[Column.REWARD_ID]
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_gacha_egg_data(self, egg_id):
         """Get details on what rarity animals an egg might contain
 
@@ -624,10 +619,10 @@ class Game:
                     pool.append(animal)
         
         # Randomly draw an animal from possible animals
-        draw = get_random_uniform(0, len(pool), RANDOM.INTEGER)
+        draw = get_random_uniform(0, len(pool), RANDOM.INTEGER, rng=self.rng.stream(Stream.EGG))
         animal = pool[draw]
         
-        self.log(f"open_egg() {egg_id} {len(pool)} {animal[Animal.TYPE_ID]}")
+        self.log(Log.EGGS, LogLevel.INFO, "open_egg() %s %s %s", egg_id, len(pool), animal[Animal.TYPE_ID])
         
         return animal[Animal.TYPE_ID]
     
@@ -640,12 +635,12 @@ class Game:
         Returns Int - seconds"""
         return get_random_uniform(self.settings[Setting.RTP_TIME_MIN],
                                   self.settings[Setting.RTP_TIME_MAX],
-                                  RANDOM.INTEGER)
+                                  RANDOM.INTEGER,
+                                  rng=self.rng.stream(Stream.FREE_CRATE))
     
     # ============================================================================================================
     # PLAYER LEVEL Methods
     # ============================================================================================================
-    @lru_cache()
     def get_player_level_data(self, player_level):
         """Return config for the current player player_level
 
@@ -656,7 +651,6 @@ class Game:
         return self.data_player_levels[player_level]
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_player_candy_range(self, player_level):
         """What candy levels can player buy?
 
@@ -664,12 +658,9 @@ class Game:
             player_level (Int) - player player_level
 
         Returns Tuple (min candy player_level, max candy player_level)"""
-        candy_level_min = self.get_player_level_data(player_level)[Column.CANDY_LEVEL_MIN]
-        candy_level_max = self.get_player_level_data(player_level)[Column.CANDY_LEVEL_MAX]
-        return candy_level_min, candy_level_max
+        return self.lookup['candy_range'][player_level]
 
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_player_xp_level(self, xp):
         """Given XP, what player_level is player?
 
@@ -677,33 +668,23 @@ class Game:
             xp (Int) - experience points (earned by buying candies)
 
         Returns Int - Player player_level"""
-        player_level = 1
+        # Number of levels whose total XP requirement has been reached
+        passed = bisect_right(self.lookup['xp_totals'], xp)
         
-        # Loop thru levels and match the XP value to pick row
-        for level_data in self.data_player_levels.values():
-            if xp >= level_data[Column.XP_REQ_TOTAL]:
-                player_level = level_data[Column.PLAYER_LEVEL] + 1
-            else:
-                break
+        if passed == 0:
+            return 1
         
-        return player_level
+        return self.lookup['xp_levels'][passed - 1] + 1
     
     # ------------------------------------------------------------------------------------------------------------
-    @lru_cache()
     def get_player_level_reward(self, player_level):
         """When a player levels up, what Egg do they get and how much soft currency?
 
         Parameters:
             player_level (Int) - experience points (earned by buying candies)
 
-        Returns Int - Player level"""
-        # Get data for player_level
-        level_data = self.get_player_level_data(player_level)
-        
-        curr_soft = level_data[Column.LUR_SOFT]  # soft currency earned on levelup
-        egg_id = level_data[Column.LUR_EGG_ID]  # egg_id (optional) earned
-        
-        return curr_soft, egg_id
+        Returns Tuple (soft currency earned on levelup, egg_id (optional) earned)"""
+        return self.lookup['level_reward'][player_level]
     
     # =============================================================================================================
     # QUEUE ACTION
@@ -719,18 +700,11 @@ class Game:
         Returns Boolean - was action added"""
         
         # Check for a duplicate action already in queue - if found, bail out
-        for a in self.state[State.ACTIONS]:
-            if a[Params.ACTION] == action and a[Params.KEY] == key:
-                return False
+        if self.state[State.ACTIONS].has(action, key):
+            return False
         
         # Action not yet in queue, go ahead and add the action
-        self.state[State.ACTIONS].append({
-            Params.ACTION_ID: len(self.state[State.ACTIONS]) + 1,
-            Params.ACTION   : action,
-            Params.KEY      : key,
-            Params.DATA     : data,
-            Params.TIMER    : self.player.get_general_time()
-        })
+        self.state[State.ACTIONS].add(action, key, data, self.player.get_general_time())
         
         return True
     
@@ -741,18 +715,14 @@ class Game:
         """Can player buy any candies?
         
         Returns Boolean"""
-        self.log(f"check_buy_candy()")
+        self.log(Log.BUY, LogLevel.DEBUG, "check_buy_candy()")
         
         # If no slots available, player cannot purchase
         if not self.candy_slot_available():
             return False
         
         # Remove any previous BUY_CANDY actions from queue
-        actions = []
-        for action in self.state[State.ACTIONS]:
-            if action[Params.ACTION] != Actions.BUY_CANDY:
-                actions.append(action)
-        self.state[State.ACTIONS] = actions
+        self.state[State.ACTIONS].remove_by_type(Actions.BUY_CANDY)
         
         # get allow range of possible candy levels can be purchased
         candy_level_min, candy_level_max = self.get_player_candy_range(self.player.level)
@@ -763,10 +733,9 @@ class Game:
         
         # Does the player have any low player_level single data_candies?
         single_candy = False
-        for candy_level in range(candy_level_min, candy_level_max + 1):
-            if self.get_candy_count(candy_level) == 1:
-                single_candy = self.candy_data(candy_level)
-                break
+        candy_level = self.state[State.CANDY_SLOTS].get_lowest_single(candy_level_min, candy_level_max)
+        if candy_level:
+            single_candy = self.candy_data(candy_level)
         
         # Buy singles to fill in and merge low so they aren't blocking a candy slot
         if single_candy:
@@ -802,7 +771,8 @@ class Game:
             candy (Dict) - Action data payload
             
         Returns Boolean"""
-        self.log(f"click_buy_candy(), {candy[Column.CANDY_LEVEL]}, {candy[Column.CANDY_COST]}")
+        self.log(Log.BUY, LogLevel.INFO, "click_buy_candy(), %s, %s", candy[Column.CANDY_LEVEL],
+                 candy[Column.CANDY_COST])
         
         # Verify player still has sufficient soft currency
         if self.player.get_soft_currency() < candy[Column.CANDY_COST]:
@@ -815,7 +785,7 @@ class Game:
         self.player.spend_soft_currency(candy[Column.CANDY_COST])
         self.player.earn_xp(candy[Column.XP_EARNED])
         self.candy_slot_add(candy[Column.CANDY_LEVEL])
-        self.player.track[Track.BUY_CANDY] += f'{candy[Column.CANDY_LEVEL]},'
+        self.events.add(Event.BUY_CANDY, level=candy[Column.CANDY_LEVEL])
         
         return True
     
@@ -827,7 +797,7 @@ class Game:
         
         Returns Boolean"""
         
-        self.log(f"check_free_crate()")
+        self.log(Log.CRATE, LogLevel.DEBUG, "check_free_crate()")
         
         # ----- Check if a free chest is available -----
         if self.time_free_crate_reset > self.state[State.FREE_CRATE_TIMER]:
@@ -854,13 +824,14 @@ class Game:
             
         Returns Boolean"""
         
-        self.log(f"click_free_crate()")
+        self.log(Log.CRATE, LogLevel.INFO, "click_free_crate()")
         
         # TODO - Award Free Crate
         
         self.time_free_crate_reset = 0
         self.state[State.FREE_CRATE_NUMBER] += 1
         self.player.track[Track.FREE_CRATE] += 1
+        self.events.add(Event.FREE_CRATE)
         self.state[State.FREE_CRATE_TIMER] = self.get_rtp_timer()
         
         return True
@@ -876,7 +847,7 @@ class Game:
             
         Returns Boolean"""
         
-        self.log(f"click_donate_animal()")
+        self.log(Log.DONATE, LogLevel.INFO, "click_donate_animal()")
         
         animal_id = data[Animal.ID]
         self.player.donate_animal(animal_id)
@@ -890,7 +861,7 @@ class Game:
         """Has player completed any Eggs?
         
         Returns Boolean"""
-        self.log(f"check_egg_progress()")
+        self.log(Log.EGGS, LogLevel.DEBUG, "check_egg_progress()")
         
         # See if data_eggs are unlocked or can be
         if self.state[State.CURRENT_EGG_ID] == 0 and self.are_eggs_unlocked(self.player.level):
@@ -924,23 +895,18 @@ class Game:
         """Can player feed any data_animals?
         
         Returns Boolean"""
-        self.log(f"check_feed_animal()")
+        self.log(Log.FEED, LogLevel.DEBUG, "check_feed_animal()")
         
-        # Get list of currently active data_animals
-        animals = self.player.get_animal_inventory(status=AnimalState.ACTIVE)
-        if len(animals) == 0:
+        # Get lowest player_level active animal (assume player always feeds lowest possible)
+        animal = self.player.get_animal_to_feed()
+        if not animal:
             return False
         
         # Get list of available data_candies to feed
-        candy_levels = sorted(list(set(self.get_candy_slot_candies())))
+        candy_levels = self.get_candy_slot_unique()
         if len(candy_levels) == 0:
             return False
         
-        # Get lowest player_level animal (assume player always feeds lowest possible)
-        animals_ordered = sorted(animals,
-                                 key=lambda a: (a[Animal.LEVEL], -a[Animal.RARITY], a[Animal.ID]))
-        animal = animals_ordered[0]
-        
         candy_options = []
         for candy_level in candy_levels:
             if candy_level >= animal[Animal.LEVEL]:
@@ -960,7 +926,7 @@ class Game:
         
         # Player selects random allowed candy
         else:
-            roll = get_random_normal(0, len(candy_options), RANDOM.INTEGER)
+            roll = get_random_normal(0, len(candy_options), RANDOM.INTEGER, rng=self.rng.stream(Stream.CANDY))
             candy = candy_options[roll]
         
         # Build payload with action details
@@ -986,7 +952,7 @@ class Game:
             data (Dict) - Action data payload
             
         Returns Boolean"""
-        self.log(f"click_feed_animal()")
+        self.log(Log.FEED, LogLevel.INFO, "click_feed_animal()")
         
         animal_id = data[Params.ANIMAL_ID]
         candy_level = data[Params.CANDY_LEVEL]
@@ -1009,32 +975,22 @@ class Game:
         """Can player merge and data_candies on board?
         
         Returns Boolean"""
-        self.log(f"check_merge_candy()")
+        self.log(Log.MERGE, LogLevel.DEBUG, "check_merge_candy()")
         
         # Player has to have 2+ data_candies to even do a merge
         if len(self.state[State.CANDY_SLOTS]) < 2:
             return False
         
-        # Get list of unique candy levels in candy slots
-        unique_candies = sorted(self.get_candy_slot_unique())
-        
-        # Loop thru each candy player_level and see if we have 2+ that could be merged
+        # Loop thru each candy player_level where we have 2+ that could be merged
         # Note: There is a cap on allowed candy_level
-        for candy_level in unique_candies:
-            if candy_level > self.settings[Setting.CANDY_LEVEL_MAX]:
-                continue
-            
-            candy_count = self.get_candy_count(candy_level)
+        for candy_level in self.state[State.CANDY_SLOTS].get_pair_levels(self.settings[Setting.CANDY_LEVEL_MAX]):
+            # Build payload with action details
+            data = {Params.CANDY_LEVEL: candy_level}
             
-            # Players has at least 2, so can merge
-            if candy_count >= 2:
-                # Build payload with action details
-                data = {Params.CANDY_LEVEL: candy_level}
-                
-                # Add action to action queue
-                self.add_action(action=Actions.MERGE_CANDY,
-                                key=candy_level,
-                                data=data)
+            # Add action to action queue
+            self.add_action(action=Actions.MERGE_CANDY,
+                            key=candy_level,
+                            data=data)
         
         return True
     
@@ -1046,23 +1002,15 @@ class Game:
             data (Dict) - Action data payload
             
         Returns Boolean"""
-        self.log(f"click_merge_candy()")
+        self.log(Log.MERGE, LogLevel.INFO, "click_merge_candy()")
         
-        # Make sure we still have 2+ of these data_candies on the board
         candy_level = data[Params.CANDY_LEVEL]
-        candy_count = self.get_candy_count(candy_level)
         
-        # Make sure player still has 2+ of these data_candies to merge
-        if candy_count >= 2:
-            # Remove both data_candies
-            self.candy_slot_remove(candy_level)
-            self.candy_slot_remove(candy_level)
-            
-            # Add new candy of +1 player_level to board
+        # Make sure player still has 2+ of these data_candies to merge - if so, swap them for 1 candy of +1 level
+        if self.state[State.CANDY_SLOTS].merge(candy_level):
             new_candy = candy_level + 1
-            self.candy_slot_add(new_candy)
             
-            self.player.track[Track.MERGE_CANDY] += f'{new_candy},'
+            self.events.add(Event.MERGE_CANDY, level=new_candy)
             
             return True
         
@@ -1075,7 +1023,7 @@ class Game:
         """Is a Spin Wheel available to click?
         
         Returns Boolean"""
-        self.log(f"check_spin_wheel()")
+        self.log(Log.SPIN, LogLevel.DEBUG, "check_spin_wheel()")
         
         max_set = self.player.get_max_set()
         
@@ -1123,7 +1071,7 @@ class Game:
             data (Dict) - Action data payload
             
         Returns Boolean"""
-        self.log(f"click_spin_wheel()")
+        self.log(Log.SPIN, LogLevel.INFO, "click_spin_wheel()")
         
         if self.player.get_secondary_currency() < data[Params.SPIN_COST]:
             return False
@@ -1132,9 +1080,9 @@ class Game:
         animal_id = self.player.earn_egg('S', data[Params.EGG_ID])
         
         if data[Params.SPIN_WHEEL] == 1:
-            self.player.track[Track.SPIN_WHEEL_1] += f'{animal_id},'
+            self.events.add(Event.SPIN_WHEEL_1, animal_id)
         else:
-            self.player.track[Track.SPIN_WHEEL_2] += f'{animal_id},'
+            self.events.add(Event.SPIN_WHEEL_2, animal_id)
         
         return True
     
@@ -1145,7 +1093,7 @@ class Game:
         """Should or can the player swap any data_animals?
         
         Returns True"""
-        self.log(f"check_swap_animals()")
+        self.log(Log.SWAP, LogLevel.DEBUG, "check_swap_animals()")
         
         # Find active animal that would be best to swap into inventory
         animal_active = self.player.get_animal_to_swap()
@@ -1191,18 +1139,47 @@ class Game:
         swap_id_1 = data[Params.SWAP_ID_1]
         swap_id_2 = data[Params.SWAP_ID_2]
         
-        self.log(f"click_swap_animals(), {swap_id_1}, {swap_id_2}")
+        self.log(Log.SWAP, LogLevel.INFO, "click_swap_animals(), %s, %s", swap_id_1, swap_id_2)
         
         if self.animal_socket_has(swap_id_1) and self.player.animal_inventory_has(swap_id_2):
             self.animal_socket_remove(swap_id_1)
             self.animal_socket_add(swap_id_2)
             
-            self.player.track[Track.SWAP_ANIMAL] += f'(-{swap_id_1},+{swap_id_2}),'
+            self.events.add(Event.SWAP_ANIMAL, swap_id_1, swap_id_2)
             
             return True
         
         return False
     
+    # =============================================================================================================
+    # Checkpoint (save and resume)
+    # =============================================================================================================
+    def set_checkpoint(self, path, interval):
+        """Save the game to path every interval simulated seconds while it runs (see Checkpoint)
+        
+        Parameters:
+            path (String) - checkpoint file
+            interval (Int) - simulated seconds between checkpoints"""
+        self.checkpoint = Checkpoint(path, interval, self.settings[Setting.SIM_FPS])
+    
+    # -------------------------------------------------------------------------------------------------------------
+    def __getstate__(self):
+        """Pickled state (see Checkpoint) - the simpy environment is kept as its clock and the economy is left out
+        (call link_bundle after unpickling)"""
+        state = self.__dict__.copy()
+        state['env'] = self.env.now
+        
+        for name in self.bundle_attributes:
+            state[name] = None
+        
+        return state
+    
+    # -------------------------------------------------------------------------------------------------------------
+    def __setstate__(self, state):
+        """Restore a pickled game - a new simpy environment starts at the saved simulated time"""
+        self.__dict__.update(state)
+        self.env = simpy.Environment(initial_time=state['env'])
+    
     # =============================================================================================================
     # Handle Offline Regen
     # =============================================================================================================
@@ -1221,14 +1198,9 @@ class Game:
         # Check if Session is over
         if self.time_session >= self.state[State.CURRENT_SESS_ONLINE]:
             # Remove certain queued actions that may no longer be relevant
-            for i, a in enumerate(self.state[State.ACTIONS]):
-                remove_these = [Actions.BUY_CANDY, Actions.SPIN_WHEEL, Actions.MERGE_CANDY,
-                                Actions.FEED_ANIMAL, Actions.DONATE_ANIMAL,
-                                Actions.SWAP_ANIMALS]
-                
-                if a[Params.ACTION] in remove_these:
-                    self.state[State.ACTIONS] = self.player.remove_action_by_id(self.state[State.ACTIONS],
-                                                                                a[Params.ACTION_ID])
+            self.state[State.ACTIONS].remove_by_type(Actions.BUY_CANDY, Actions.SPIN_WHEEL, Actions.MERGE_CANDY,
+                                                     Actions.FEED_ANIMAL, Actions.DONATE_ANIMAL,
+                                                     Actions.SWAP_ANIMALS)
             
             # Calculate offline time until next session
             offline_time = self.player.get_offline_duration() - self.state[State.CURRENT_SESS_ONLINE]
@@ -1248,7 +1220,11 @@ class Game:
             
             self.session += 1
             
-            self.snapshot.save_snapshot()
+            self.log(Log.SESSION, LogLevel.INFO, "session_end(), %s, %s, %s", self.session - 1,
+                     self.state[State.CURRENT_SESS_ONLINE], offline_time)
+            
+            if self.snapshot.policy.on_session_end(self):
+                self.snapshot.save_snapshot()
             
             # Calculate next online session duration
             self.state[State.CURRENT_SESS_ONLINE] = self.player.get_session_duration(self.session)
@@ -1272,10 +1248,51 @@ class Game:
     # =============================================================================================================
     # MAIN SIMULATION CORE LOOP
     # =============================================================================================================
+    def process_frame(self):
+        """Everything the player does in a frame once we know they are online"""
+        # Check if video limit should be reset
+        self.player.check_reset_video_count()
+        
+        # ----- Check if player has earned soft currency -----
+        if self.frame % self.settings[Setting.SIM_FPS] == 0:
+            self.player.earn_soft_currency(self.player.get_soft_per_sec())
+        
+        # ----- Check available actions player can do -----
+        # If player is in middle of another action, don't check for new ones yet
+        if self.player.gcd <= 0:
+            # self.check_free_crate()
+            self.check_spin_wheel()
+            self.check_merge_candy()
+            self.check_feed_animal()
+            self.check_buy_candy()
+            self.check_swap_animals()
+            
+            self.check_egg_progress()
+            
+            # Player is stuck (no actions remaining) - end session early
+            if self.time_inapp > 60 and len(self.state[State.ACTIONS]) == 0:
+                self.state[State.CURRENT_SESS_ONLINE] = self.time_session
+        
+        # ----- Process Player actions -----
+        self.player.choose_action()
+        
+        # ----- Save out current status to a row in our results csv (see SnapshotPolicy) -----
+        if self.snapshot.policy.on_frame(self):
+            self.snapshot.save_snapshot()
+    
+    # -------------------------------------------------------------------------------------------------------------
     def simulation(self, env):
         while True:
+            # ----- Save the game (top of the loop - a resumed game starts here, see Checkpoint) -----
+            if self.checkpoint is not None:
+                self.checkpoint.check(self, env.now)
+            
             self.frame = env.now + 1
             
+            # ----- Close the previous row before anything in this frame happens (see SnapshotPolicy) -----
+            if self.snapshot.policy.on_frame_start(self):
+                self.snapshot.save_snapshot()
+            
             # ----- Check if player has gone offline -----
             # timer will hold the "offline time" if appropriate (0 if still online)
             timer = self.check_offline()
@@ -1284,35 +1301,7 @@ class Game:
             if timer > 0:
                 yield env.timeout(timer * self.settings[Setting.SIM_FPS])
             
-            # Check if video limit should be reset
-            self.player.check_reset_video_count()
-            
-            # ----- Check if player has earned soft currency -----
-            if self.frame % self.settings[Setting.SIM_FPS] == 0:
-                self.player.earn_soft_currency(self.player.get_soft_per_sec())
-            
-            # ----- Check available actions player can do -----
-            # If player is in middle of another action, don't check for new ones yet
-            if self.player.gcd <= 0:
-                # self.check_free_crate()
-                self.check_spin_wheel()
-                self.check_merge_candy()
-                self.check_feed_animal()
-                self.check_buy_candy()
-                self.check_swap_animals()
-                
-                self.check_egg_progress()
-                
-                # Player is stuck (no actions remaining) - end session early
-                if self.time_inapp > 60 and len(self.state[State.ACTIONS]) == 0:
-                    self.state[State.CURRENT_SESS_ONLINE] = self.time_session
-            
-            # ----- Process Player actions -----
-            self.player.choose_action()
-            
-            # ----- Save out current status to a row in our results csv -----
-            if self.frame % (self.settings[Setting.SNAPSHOT_TIME] * self.settings[Setting.SIM_FPS]) == 0:
-                self.snapshot.save_snapshot()
+            self.process_frame()
             
             yield env.timeout(1)
     
@@ -1320,7 +1309,27 @@ class Game:
     def start_sim(self, sim_time_length):
         self.env.process(self.simulation(self.env))
         self.env.run(until=int(sim_time_length))
+        
+        if self.snapshot.policy.SAVE_AT_END:
+            self.snapshot.save_snapshot()
     
     # ------------------------------------------------------------------------------------------------------------
-    def log(self, message, console=False, eol=True):
-        log_to_file(f"{self.player.player_id}, {self.frame / self.settings[Setting.SIM_FPS]}, " + message, console=console, eol=eol)
+    def log(self, category, level, message, *args, console=False, eol=True):
+        """Write a message to the log if its category is enabled at this level (see set_logging)
+        
+        The message is only formatted (message % args) once we know it is written, so pass the values as args
+        instead of building an f-string - a disabled call costs a dict lookup.
+        
+        Parameters:
+            category (String) - Log category
+            level (Int) - LogLevel of the message
+            message (String) - message (%-style format string when args are given)
+            args - values for the message placeholders"""
+        if level < self.log_levels[category]:
+            return
+        
+        if args:
+            message = message % args
+        
+        log_to_file(f"{self.frame / self.settings[Setting.SIM_FPS]}, {category}, " + message, console=console, eol=eol,
+                    player=self.player.player_id, variant=self.player.variant)
@@ -0,0 +1,349 @@
+import glob
+import math
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+# KPIs summarized per variant and day (gauges - read from each player's last snapshot row of the day)
+KPI_METRICS = ['player_level', 'soft_bal', 'anim_total', 'anim_sets_cmplt']
+
+# Quantiles reported for every (variant, day, kpi) - column p<q*100>
+KPI_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+class RunningStats:
+    """Welford mean / variance (plus min and max) for many slots at once - slot i is day i
+
+    add() takes one value per slot (NaN = nothing to add for that slot) and updates every slot in one vectorized
+    step.  Two RunningStats merge exactly (Chan et al. pairwise update) so each worker can keep its own and the
+    parent combines them at the end."""
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, size=0):
+        """
+        RunningStats Constructor
+
+        size (Int)                 - initial number of slots (grows as needed)
+        """
+        self.n = np.zeros(size, dtype=np.int64)
+        self.mean = np.zeros(size, dtype=np.float64)
+        self.m2 = np.zeros(size, dtype=np.float64)  # sum of squared differences from the mean
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.n)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def grow(self, size):
+        """Make room for at least size slots"""
+        extra = size - len(self.n)
+
+        if extra > 0:
+            self.n = np.concatenate([self.n, np.zeros(extra, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(extra)])
+            self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+            self.min = np.concatenate([self.min, np.full(extra, np.inf)])
+            self.max = np.concatenate([self.max, np.full(extra, -np.inf)])
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, values):
+        """Add one observation per slot
+
+        Parameters:
+            values (np.array<Float>) - value for slot 0, 1, ... (NaN = no observation)"""
+        self.grow(len(values))
+
+        slots = np.flatnonzero(~np.isnan(values))
+        x = values[slots]
+
+        self.n[slots] += 1
+        delta = x - self.mean[slots]
+        self.mean[slots] += delta / self.n[slots]
+        self.m2[slots] += delta * (x - self.mean[slots])
+        self.min[slots] = np.minimum(self.min[slots], x)
+        self.max[slots] = np.maximum(self.max[slots], x)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def merge(self, other):
+        """Add every observation of another RunningStats
+
+        Parameters:
+            other (RunningStats) - stats to merge in (unchanged)"""
+        self.grow(len(other))
+        size = len(other)
+
+        n_a, n_b = self.n[:size], other.n
+        n = n_a + n_b
+        safe_n = np.maximum(n, 1)
+        delta = other.mean - self.mean[:size]
+
+        self.mean[:size] += delta * n_b / safe_n
+        self.m2[:size] += other.m2 + delta ** 2 * n_a * n_b / safe_n
+        self.min[:size] = np.minimum(self.min[:size], other.min)
+        self.max[:size] = np.maximum(self.max[:size], other.max)
+        self.n[:size] = n
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_std(self):
+        """Sample standard deviation of every slot (NaN below 2 observations)
+
+        Returns np.array<Float>"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.n > 1, np.sqrt(self.m2 / (self.n - 1)), np.nan)
+
+
+# ------------------------------------------------------------------------------------------------------------
+class QuantileSketch:
+    """Mergeable quantile sketch for many slots at once (logarithmic buckets, DDSketch style)
+
+    A value x is counted in bucket ceil(log(|x|) / log(gamma)) with gamma = (1 + alpha) / (1 - alpha) (separate
+    buckets for negative values, one for |x| < MIN_VALUE), and a quantile is returned as the middle of its bucket -
+    within alpha relative error of the exact quantile, whatever the number of observations, and clamped to the
+    slot's observed min and max (a bucket middle can lie outside them).  Merging adds the bucket counts, so the
+    merged sketch is the same as one sketch fed every value."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all sketches)
+    MIN_VALUE = 1e-9  # smaller magnitudes are counted as 0
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, alpha=0.01):
+        """
+        QuantileSketch Constructor
+
+        alpha (Float)              - relative accuracy of the quantiles
+        """
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.counts = {}  # (slot, sign, bucket) -> count
+        self.min = {}  # slot -> smallest value added
+        self.max = {}  # slot -> largest value added
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, values):
+        """Add one observation per slot
+
+        Parameters:
+            values (np.array<Float>) - value for slot 0, 1, ... (NaN = no observation)"""
+        slots = np.flatnonzero(~np.isnan(values))
+        x = values[slots]
+
+        signs = np.where(np.abs(x) < self.MIN_VALUE, 0, np.sign(x)).astype(np.int64)
+        with np.errstate(divide='ignore'):
+            buckets = np.where(signs == 0, 0, np.ceil(np.log(np.abs(x)) / self.log_gamma)).astype(np.int64)
+
+        counts = self.counts
+        for key in zip(slots.tolist(), signs.tolist(), buckets.tolist()):
+            counts[key] = counts.get(key, 0) + 1
+
+        for slot, value in zip(slots.tolist(), x.tolist()):
+            self.min[slot] = min(self.min.get(slot, value), value)
+            self.max[slot] = max(self.max.get(slot, value), value)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def merge(self, other):
+        """Add every observation of another sketch (same alpha)
+
+        Parameters:
+            other (QuantileSketch) - sketch to merge in (unchanged)"""
+        if other.alpha != self.alpha:
+            raise ValueError(f'Cannot merge sketches with alpha {self.alpha} and {other.alpha}')
+
+        counts = self.counts
+        for key, count in other.counts.items():
+            counts[key] = counts.get(key, 0) + count
+
+        for slot, value in other.min.items():
+            self.min[slot] = min(self.min.get(slot, value), value)
+
+        for slot, value in other.max.items():
+            self.max[slot] = max(self.max.get(slot, value), value)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_value(self, sign, bucket):
+        """Value a bucket stands for (middle of the bucket, relative to its bounds)
+
+        Returns Float"""
+        if sign == 0:
+            return 0.0
+
+        return sign * 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_quantiles(self, quantiles):
+        """Quantiles of every slot with observations
+
+        Parameters:
+            quantiles (List<Float>) - quantiles (0 - 1)
+
+        Returns Dict - slot -> [value for each quantile]"""
+        slots = {}
+        for (slot, sign, bucket), count in self.counts.items():
+            slots.setdefault(slot, []).append((self.get_value(sign, bucket), count))
+
+        result = {}
+        for slot, buckets in slots.items():
+            buckets.sort()
+            values = np.array([value for value, _ in buckets])
+            cumulative = np.cumsum([count for _, count in buckets])
+
+            # rank of the quantile among the slot's n observations (0 based)
+            ranks = np.array(quantiles) * (cumulative[-1] - 1)
+            estimates = values[np.searchsorted(cumulative, ranks, side='right')]
+            result[slot] = np.clip(estimates, self.min[slot], self.max[slot]).tolist()
+
+        return result
+
+
+# ------------------------------------------------------------------------------------------------------------
+class KpiAggregator:
+    """Per variant, per day distribution of the KPIs across players, built while the simulation runs
+
+    Every worker feeds its players in as they finish (add_snapshots) - each KPI's value at the end of every day
+    goes into a RunningStats (mean, std, min, max) and a QuantileSketch per (variant, kpi), one slot per day.  Days
+    without a snapshot row carry the player's last value forward.  Workers save their aggregator next to their part
+    files and the parent merges them (see ResultWriter.read_kpis) - only the summary travels, never the raw rows."""
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, kpis=None, alpha=0.01):
+        """
+        KpiAggregator Constructor
+
+        kpis (List<String>)        - snapshot columns to summarize (default KPI_METRICS)
+        alpha (Float)              - relative accuracy of the quantiles (see QuantileSketch)
+        """
+        self.kpis = list(kpis or KPI_METRICS)
+        self.alpha = alpha
+        self.stats = {}  # (variant, kpi) -> (RunningStats, QuantileSketch)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_stats(self, variant, kpi):
+        """Stats and sketch of a (variant, kpi) (created on first use)
+
+        Returns Tuple - (RunningStats, QuantileSketch)"""
+        key = (variant, kpi)
+
+        if key not in self.stats:
+            self.stats[key] = (RunningStats(), QuantileSketch(self.alpha))
+
+        return self.stats[key]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add_player(self, variant, days, columns):
+        """Add one player's end of day KPI values
+
+        Parameters:
+            variant (String) - variant label
+            days (np.array<Int>) - day of every snapshot row (in row order)
+            columns (Dict) - kpi -> np.array of the value in every snapshot row"""
+        if len(days) == 0:
+            return
+
+        # last row of every day 0 .. last day (-1 = no row yet)
+        days = np.asarray(days, dtype=np.int64)
+        rows = np.searchsorted(days, np.arange(days[-1] + 1), side='right') - 1
+        has_row = rows >= 0
+
+        for kpi in self.kpis:
+            values = np.full(len(rows), np.nan)
+            values[has_row] = np.asarray(columns[kpi], dtype=np.float64)[rows[has_row]]
+
+            stats, sketch = self.get_stats(variant, kpi)
+            stats.add(values)
+            sketch.add(values)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add_snapshots(self, variant, results):
+        """Add one player's snapshot rows
+
+        Parameters:
+            variant (String) - variant label
+            results (SnapshotBuffer) - the player's snapshot rows (SimOutput.results)"""
+        if len(results) > 0:
+            self.add_player(variant, results.get_column('day'), {kpi: results.get_column(kpi) for kpi in self.kpis})
+
+    # ------------------------------------------------------------------------------------------------------------
+    def merge(self, other):
+        """Add everything another aggregator has seen
+
+        Parameters:
+            other (KpiAggregator) - aggregator to merge in (unchanged)"""
+        for (variant, kpi), (stats, sketch) in other.stats.items():
+            own_stats, own_sketch = self.get_stats(variant, kpi)
+            own_stats.merge(stats)
+            own_sketch.merge(sketch)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_df(self):
+        """Summary table - one row per (variant, day, kpi) with the number of players, mean, std, min, max and the
+        KPI_QUANTILES (p5, p25, ...)
+
+        Returns DataFrame"""
+        labels = [f'p{q * 100:g}' for q in KPI_QUANTILES]
+
+        report = []
+        for (variant, kpi), (stats, sketch) in self.stats.items():
+            std = stats.get_std()
+            quantiles = sketch.get_quantiles(KPI_QUANTILES)
+
+            for day in np.flatnonzero(stats.n):
+                row = {
+                    'variant': variant,
+                    'day'    : int(day),
+                    'kpi'    : kpi,
+                    'n'      : int(stats.n[day]),
+                    'mean'   : stats.mean[day],
+                    'std'    : std[day],
+                    'min'    : stats.min[day],
+                    'max'    : stats.max[day],
+                }
+                row.update(zip(labels, quantiles[day]))
+                report.append(row)
+
+        if not report:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(report)
+        df['kpi'] = pd.Categorical(df['kpi'], categories=self.kpis, ordered=True)
+        df = df.sort_values(['variant', 'day', 'kpi'], ignore_index=True)
+        df['kpi'] = df['kpi'].astype(str)
+
+        return df
+
+    # ------------------------------------------------------------------------------------------------------------
+    def save(self, path):
+        """Pickle the aggregator (a worker's part of the summary)
+
+        Parameters:
+            path (String) - file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def load(folder):
+        """Merge every saved aggregator (part-*.pkl) in a folder
+
+        Parameters:
+            folder (String) - folder the workers saved their aggregators in
+
+        Returns KpiAggregator (empty if there are none)"""
+        merged = None
+
+        for path in sorted(glob.glob(os.path.join(folder, 'part-*.pkl'))):
+            with open(path, 'rb') as f:
+                part = pickle.load(f)
+
+            if merged is None:
+                merged = part
+            else:
+                merged.merge(part)
+
+        return merged or KpiAggregator()
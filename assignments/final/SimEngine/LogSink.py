@@ -0,0 +1,115 @@
+import gzip
+import multiprocessing as mp
+import os
+import shutil
+import threading
+
+
+class LogSink:
+    """One log file for every process of a run
+
+    Processes never write the log file themselves - log_to_file buffers records in the process and flush_log hands
+    the whole batch to this sink's queue without waiting (put_nowait - if the queue is full the batch is dropped and
+    counted, the simulation never blocks on logging).  A single writer thread in the parent process drains the queue
+    and appends every batch in one write, so records from different workers never interleave mid line.
+
+    Each record is (worker, variant, player, message) and is written as "worker, variant, player, message".  When
+    the file grows past max_bytes it is rotated to {path}.1 (gzipped to {path}.1.gz when compress is on), the older
+    files move up one number and only the last backups are kept."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all sinks)
+    QUEUE_SIZE = 1000  # batches waiting to be written (a batch is up to ~100KB of log text - see log_to_file)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, path, max_bytes=50 * 2 ** 20, backups=10, compress=True, queue_size=QUEUE_SIZE):
+        """
+        LogSink Constructor (starts the writer thread)
+
+        path (String)              - log file
+        max_bytes (Int)            - rotate the file once it is bigger than this
+        backups (Int)              - rotated files to keep
+        compress (Boolean)         - gzip rotated files
+        queue_size (Int)           - batches the queue holds before new batches are dropped
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+
+        self.queue = mp.Queue(queue_size)  # pass to the workers (see attach_log_sink)
+        self.records = 0  # records written
+
+        self.thread = threading.Thread(target=self.drain, name='LogSink', daemon=True)
+        self.thread.start()
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def format_record(record):
+        """One log line
+
+        Parameters:
+            record (Tuple) - (worker, variant, player, message) - message ends with its own line end
+
+        Returns String"""
+        worker, variant, player, message = record
+
+        return f'{worker}, {variant}, {player}, {message}'
+
+    # ------------------------------------------------------------------------------------------------------------
+    def drain(self):
+        """Writer thread - write batches until stop() sends None"""
+        log_file = open(self.path, 'w')
+        size = 0
+
+        while True:
+            batch = self.queue.get()
+
+            if batch is None:
+                break
+
+            text = ''.join([self.format_record(record) for record in batch])
+
+            if size > 0 and size + len(text) > self.max_bytes:
+                log_file.close()
+                self.rotate()
+                log_file = open(self.path, 'w')
+                size = 0
+
+            log_file.write(text)
+            log_file.flush()
+            size += len(text)
+            self.records += len(batch)
+
+        log_file.close()
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_backup(self, n):
+        """Name of rotated file n
+
+        Returns String"""
+        return f'{self.path}.{n}' + ('.gz' if self.compress else '')
+
+    # ------------------------------------------------------------------------------------------------------------
+    def rotate(self):
+        """Move the (closed) log file to backup 1 - older backups move up one, the oldest is removed"""
+        if os.path.exists(self.get_backup(self.backups)):
+            os.remove(self.get_backup(self.backups))
+
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(self.get_backup(n)):
+                os.replace(self.get_backup(n), self.get_backup(n + 1))
+
+        if self.compress:
+            with open(self.path, 'rb') as source, gzip.open(self.get_backup(1), 'wb') as target:
+                shutil.copyfileobj(source, target)
+
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.get_backup(1))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def stop(self):
+        """Write everything still queued and stop the writer thread (call once every worker has finished)"""
+        self.queue.put(None)
+        self.thread.join()
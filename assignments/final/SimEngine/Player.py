@@ -1,7 +1,9 @@
-import random
 import math
-from functools import lru_cache
 
+from .AnimalCollection import AnimalCollection
+from .AnimalInventory import AnimalInventory
+from .EventLog import EventLog
+from .SessionSchedule import SessionSchedule
 from .StringConstants import *
 from .UtilityFunctions import *
 
@@ -38,6 +40,7 @@ class Player:
         }
         
         self.sessions = None
+        self.schedule = None  # SessionSchedule - pre-sampled online/offline durations
         
         # Behavior flags that determine how player will make choices
         self.behavior_action = None
@@ -89,19 +92,17 @@ class Player:
         }
         
         # player's inventory of earned animals
-        self.animal_inventory = {}
+        self.animal_inventory = AnimalInventory()
+        
+        # unique animals/sets collected (created in init_player once the animal sets are known)
+        self.collection = None
         
         # track counters for csv reporting per second
         self.track = {
             Track.ACTION_COUNT    : 0,
-            Track.ANIMAL_IDS      : '',
             Track.ANIMALS_EARNED  : 0,
-            Track.BUY_CANDY       : '',
             Track.DONATE_ANIMAL   : 0,
-            Track.EGG_COMPLETE    : '',
-            Track.FEED_ANIMAL     : '',
             Track.FREE_CRATE      : 0,
-            Track.MERGE_CANDY     : '',
             Track.PLAYER_LEVEL_UP : 0,
             Track.PREMIUM_EARNED  : 0,
             Track.PREMIUM_SPENT   : 0,
@@ -109,9 +110,6 @@ class Player:
             Track.SECONDARY_SPENT : 0,
             Track.SOFT_EARNED     : 0,
             Track.SOFT_SPENT      : 0,
-            Track.SPIN_WHEEL_1    : '',
-            Track.SPIN_WHEEL_2    : '',
-            Track.SWAP_ANIMAL     : '',
             Track.VIDEO_WATCHED   : 0
         }
     
@@ -135,6 +133,7 @@ class Player:
         self.game.settings[Setting.SIM_MODE] = v_data[Variants.SIM_MODE]
         self.game.settings[Setting.SIM_FPS] = v_data[Variants.SIM_FPS]
         self.game.settings[Setting.SNAPSHOT_TIME] = v_data[Variants.SIM_SNAPSHOT_TIME]
+        self.game.settings[Setting.SNAPSHOT_POLICY] = v_data.get(Variants.SIM_SNAPSHOT_POLICY, Snapshot.TICK)
         
         # initial soft currency to start with
         self.curr_soft[Currency.BALANCE] = v_data[Variants.CURRENCY_SOFT_START]
@@ -160,6 +159,7 @@ class Player:
         self.behavior_animal_swap = v_data[Variants.PLAYER_BEHAVIOR_ANIMAL_SWAP]
         self.behavior_bet = v_data[Variants.PLAYER_BEHAVIOR_BET]
         self.behavior_feed_order = v_data[Variants.PLAYER_BEHAVIOR_FEED_ORDER]
+        self.game.state[State.ACTIONS].set_feed_order(self.behavior_feed_order)
         self.behavior_offerwall = v_data[Variants.PLAYER_BEHAVIOR_OFFERWALL]
         self.behavior_shop = v_data[Variants.PLAYER_BEHAVIOR_SHOP]
         self.behavior_video = v_data[Variants.PLAYER_BEHAVIOR_VIDEO]
@@ -171,12 +171,21 @@ class Player:
         # Set a reference on the Game instance to this Player instance
         self.game.player = self
         
+        self.collection = AnimalCollection(self.game.get_animal_set_sizes())
+        self.animal_inventory.events = self.game.events
+        
         # Pick/initialize first animal (Dingo or Arabian Horse)
         roll = get_random_uniform(0,
                                   len(self.game.settings[Setting.STARTING_ANIMALS]),
-                                  RANDOM.INTEGER)
+                                  RANDOM.INTEGER,
+                                  rng=self.game.rng.stream(Stream.STARTING_ANIMAL))
         self.starting_animal_type = int(self.game.settings[Setting.STARTING_ANIMALS][roll])
         
+        # Sample every session's online/offline duration for the sim_length horizon
+        self.schedule = SessionSchedule(self.session_params,
+                                        self.game.rng.stream(Stream.SESSION),
+                                        int(v_data[Variants.SIM_LENGTH]))
+        
         # Set initial online session duration
         self.game.state[State.CURRENT_SESS_ONLINE] = self.get_session_duration(1)
         
@@ -219,48 +228,32 @@ class Player:
     # -------------------------------------------------------------------------------------------------------------
     def get_animal_to_socket(self):
         """Look through inventory and return optimal animal to make active"""
-        # Find best non-active animal
-        animals = self.get_animal_inventory(status=AnimalState.INVENTORIED)
-    
-        # If no animals available to swap, we can bail
-        if len(animals) == 0:
-            return False
-    
-        # Sort animals best to worse
-        animals_ordered = sorted(animals,
-                                 key=lambda a: (a[Animal.LEVEL], -a[Animal.RARITY], a[Animal.ID]))
-        return animals_ordered[0]
+        # Best non-active animal - lowest level, then highest rarity (False if none)
+        return self.animal_inventory.get_best('socket')
 
     # -------------------------------------------------------------------------------------------------------------
     def get_animal_to_swap(self):
         """Look through active animals and return optimal animal to swap to inventory"""
-        # Find best non-active animal
-        animals = self.get_animal_inventory(status=AnimalState.ACTIVE)
-    
-        # If no animals available to swap, we can bail
-        if len(animals) == 0:
-            return False
-    
-        # Sort animals best to worse
-        animals_ordered = sorted(animals,
-                                 key=lambda a: (-a[Animal.LEVEL], a[Animal.RARITY], a[Animal.ID]))
-        return animals_ordered[0]
+        # Best active animal to swap out - highest level, then lowest rarity (False if none)
+        return self.animal_inventory.get_best('swap')
 
     # -------------------------------------------------------------------------------------------------------------
     def get_animal_to_donate(self):
         """Look through inventory and return optimal animal to donate"""
-        # Find best non-active animal
-        animals = self.get_animal_inventory(status=AnimalState.INVENTORIED)
-    
-        # If no animals available to swap, we can bail
-        if len(animals) == 0:
+        # Best non-active animal to give away - highest level, then lowest rarity
+        animal = self.animal_inventory.get_best('donate')
+        
+        # If no animals available to donate, we can bail
+        if not animal:
             return False
-    
-        # Sort animals best to worse
-        animals_ordered = sorted(animals,
-                                 key=lambda a: (-a[Animal.LEVEL], a[Animal.RARITY], a[Animal.ID]))
-        return animals_ordered[0][Animal.ID]
+        
+        return animal[Animal.ID]
 
+    # -------------------------------------------------------------------------------------------------------------
+    def get_animal_to_feed(self):
+        """Look through active animals and return the one player would feed next (lowest level first)"""
+        return self.animal_inventory.get_best('feed')
+    
     # -------------------------------------------------------------------------------------------------------------
     def earn_animal(self, animal):
         """Player earned an animal
@@ -278,8 +271,9 @@ class Player:
         animal[Animal.LEVEL] = 1
         animal[Animal.STATUS] = AnimalState.INVENTORIED
         
-        # Add animal to inventory dictionary
-        self.animal_inventory[animal_unique_id] = animal
+        # Add animal to inventory
+        self.animal_inventory.add(animal)
+        self.collection.add(animal[Animal.TYPE_ID], animal[Animal.SET_ID])
         self.earn_secondary_currency(animal[Animal.TREATS_EARNED])
         
         # Auto slot animal if possible in a habitat
@@ -287,11 +281,11 @@ class Player:
             self.game.animal_socket_add(animal[Animal.ID])
         
         self.track[Track.ANIMALS_EARNED] += 1
-        self.track[Track.ANIMAL_IDS] += f'{animal[Animal.TYPE_ID]},'
+        self.game.events.add(Event.ANIMAL_EARNED, animal_unique_id, animal[Animal.TYPE_ID])
         
         # if player has exceeded inventory cap, must donate
-        active = len(self.get_animal_inventory(AnimalState.ACTIVE))
-        inventory = len(self.get_animal_inventory(AnimalState.INVENTORIED))
+        active = self.animal_inventory.count(AnimalState.ACTIVE)
+        inventory = self.animal_inventory.count(AnimalState.INVENTORIED)
         
         # Over cap, so must donate
         if active + inventory > self.game.settings[Setting.ANIMAL_INVENTORY_CAP]:
@@ -309,8 +303,8 @@ class Player:
             candy_level (Int) - Candy level feed to animal
             
         Returns Boolean"""
-        self.animal_inventory[animal_id][Animal.LEVEL] = candy_level + 1
-        self.track[Track.FEED_ANIMAL] += f'({animal_id}, {candy_level}),'
+        self.animal_inventory.set_level(animal_id, candy_level + 1)
+        self.game.events.add(Event.FEED_ANIMAL, animal_id, level=candy_level)
         
         return True
     
@@ -326,9 +320,10 @@ class Player:
         # Remove the animal from the habitat if necessary
         if animal_id in self.animal_inventory:
             self.game.animal_socket_remove(animal_id)
-            self.animal_inventory[animal_id][Animal.STATUS] = AnimalState.DONATED
+            self.animal_inventory.set_status(animal_id, AnimalState.DONATED)
             
             self.track[Track.DONATE_ANIMAL] += 1
+            self.game.events.add(Event.DONATE_ANIMAL, animal_id)
             
             if self.game.animal_socket_available():
                 animal = self.get_animal_to_socket()
@@ -342,70 +337,37 @@ class Player:
     def get_acquired_animals(self):
         """List all unique data_animals player has acquired
         Returns List<Animal Dict Objects>"""
-        acquired_animals = []
-        
-        for animal_id, animal in self.animal_inventory.items():
-            acquired_animals.append(animal[Animal.TYPE_ID])
-        
-        acquired_animals = list(set(acquired_animals))
-        return acquired_animals
+        return list(self.collection.types)
     
     # -------------------------------------------------------------------------------------------------------------
     def get_acquired_sets(self):
         """List all Animal Set #'s player has unlocked
         Returns List<Int> - Animal Sets layer has animals in"""
-        sets = []
-        
-        for animal_id, animal in self.animal_inventory.items():
-            sets.append(animal[Animal.SET_ID])
-        
-        sets = list(set(sets))
-        return sets
+        return list(self.collection.sets)
     
     # -------------------------------------------------------------------------------------------------------------
     def get_max_set(self):
         """List max unlocked Set #
         Returns Int - Max Animal Set unlocked"""
-        return max(self.get_acquired_sets())
+        return self.collection.max_set
 
     # -------------------------------------------------------------------------------------------------------------
     def get_sets_count(self):
-        """List all Animal Set #'s player has completed
-        Returns List<Int> - All Animal Sets completed"""
-    
-        # For completing sets, we need need to exclude duplicates of animals
-        # and only count unique copies
-        unique_animals = self.get_acquired_animals()
-        
-        sets_count = np.zeros(24)
-        for animal_id in unique_animals:
-            set_id = self.game.get_animal_set(animal_id)
-            sets_count[set_id] += 1
-    
-        return sets_count
+        """Count of unique animals collected per Animal Set #
+        Returns np.array - indexed by Animal Set #"""
+        return self.collection.sets_count
     
     # -------------------------------------------------------------------------------------------------------------
     def get_completed_sets(self):
         """List all Animal Set #'s player has completed
         Returns List<Int> - All Animal Sets completed"""
-        sets_count = self.get_sets_count()
-        
-        sets_completed = []
-        
-        for idx, s in enumerate(sets_count):
-            if s == 5:
-                sets_completed.append(idx)
-        
-        return sets_completed
+        return self.collection.completed
     
     # -------------------------------------------------------------------------------------------------------------
     def get_max_completed_set(self):
         """List max unlocked Set #
         Returns Int - Max Animal Set Completed"""
-        if len(self.get_completed_sets()) == 0:
-            return 0
-        else:
-            return max(self.get_completed_sets())
+        return self.collection.max_completed
     
     # -------------------------------------------------------------------------------------------------------------
     def animal_inventory_has(self, animal_id):
@@ -428,16 +390,7 @@ class Player:
             status (Boolean) - AnimalState.ACTIVE, .INVENTORIED, .DONATED, .ALL
             
         Returns List<Animal Dict Objects>"""
-        animals = []
-        
-        # Loop thru all animals and build list that matches requests status
-        for animal in self.animal_inventory.values():
-            if status == AnimalState.ALL:
-                animals.append(animal)
-            elif animal[Animal.STATUS] == status:
-                animals.append(animal)
-        
-        return animals
+        return self.animal_inventory.get_by_status(status)
     
     # =============================================================================================================
     # Currency PREMIUM
@@ -559,8 +512,7 @@ class Player:
     def get_soft_per_sec(self):
         """Get soft currency earned each second
         Returns Int"""
-        income = [a[Animal.REVENUE] for a in self.animal_inventory.values() if a[Animal.STATUS] == AnimalState.ACTIVE]
-        return sum(income)
+        return self.animal_inventory.revenue
     
     # =============================================================================================================
     # EGGS
@@ -575,7 +527,7 @@ class Player:
         animal_type = self.game.open_egg(egg_type)
         animal_id = self.earn_animal(animal_type)
         
-        self.track[Track.EGG_COMPLETE] += f'({egg_id},{egg_type}),'
+        self.game.events.add(Event.EGG_COMPLETE, EventLog.SPIN_EGG if egg_id == 'S' else egg_id, egg_type)
         if self.game.animal_socket_available:
             self.game.animal_socket_add(animal_id)
         
@@ -594,6 +546,7 @@ class Player:
         delta = level - old_level
         self.level = level
         self.track[Track.PLAYER_LEVEL_UP] += delta
+        self.game.events.add(Event.PLAYER_LEVEL_UP, level=level, amount=delta)
         
         soft, egg_type = self.game.get_player_level_reward(old_level)
         
@@ -611,34 +564,16 @@ class Player:
         """Clear the counters used to track earn/spend per snapshot reporting cycle"""
         for k in self.track.keys():
             self.track[k] = 0
-        
-        self.track[Track.ANIMAL_IDS] = ''
-        self.track[Track.BUY_CANDY] = ''
-        self.track[Track.EGG_COMPLETE] = ''
-        self.track[Track.FEED_ANIMAL] = ''
-        self.track[Track.MERGE_CANDY] = ''
-        self.track[Track.SPIN_WHEEL_1] = ''
-        self.track[Track.SPIN_WHEEL_2] = ''
-        self.track[Track.SWAP_ANIMAL] = ''
     
     # =============================================================================================================
     # SESSION TRACKING - Sessions per day, session length, etc
     # =============================================================================================================
-    def get_sessions_per_day(self):
-        """Using real session data - return session for day (drawn from Poisson)"""
-        sessions = np.random.poisson(self.session_params[Session.PER_DAY], 1)
-        
-        # Note we enforce at least 1 session per day
-        return sessions or 1
-    
-    # -------------------------------------------------------------------------------------------------------------
     def get_offline_duration(self):
-        """Using real session data - return time until next session (drawn from Poisson)"""
-        
-        session_rate = self.get_sessions_per_day()
-        
-        lambda_rate = 1 / session_rate
-        return math.floor(np.random.exponential(lambda_rate) * 86400)
+        """Using real session data - return time from the end of the current session until the next one starts
+        (sessions per day drawn from Poisson, time between sessions from Exponential - see SessionSchedule)
+
+        Returns Int"""
+        return self.schedule.get_offline(self.game.session)
 
     # -------------------------------------------------------------------------------------------------------------
     def get_session_duration(self, sess_num):
@@ -648,50 +583,13 @@ class Player:
             sess_num (int) - session number
             
         Returns Int"""
-        # Calculate duration lower bound from parameters in GoogleSheet
-        # Supports log, linear or fixed lower bound
-        if self.session_params[Session.DURATION_MIN][0] == 'log':
-            alpha = float(self.session_params[Session.DURATION_MIN][1])
-            beta = float(self.session_params[Session.DURATION_MIN][2])
-            dur_min = alpha * np.log(sess_num) + beta
-        elif self.session_params[Session.DURATION_MIN][0] == 'linear':
-            alpha = float(self.session_params[Session.DURATION_MIN][1])
-            beta = float(self.session_params[Session.DURATION_MIN][2])
-            dur_min = alpha * sess_num + beta
-        else:
-            dur_min = float(self.session_params[Session.DURATION_MIN][1])
-
-        # Calculate duration upper bound from parameters in GoogleSheet
-        # Supports log, linear or fixed lower bound
-        if self.session_params[Session.DURATION_MAX][0] == 'log':
-            alpha = float(self.session_params[Session.DURATION_MAX][1])
-            beta = float(self.session_params[Session.DURATION_MAX][2])
-            dur_max = alpha * np.log(sess_num) + beta
-        elif self.session_params[Session.DURATION_MAX][0] == 'linear':
-            alpha = float(self.session_params[Session.DURATION_MAX][1])
-            beta = float(self.session_params[Session.DURATION_MAX][2])
-            dur_max = alpha * sess_num + beta
-        else:
-            dur_max = float(self.session_params[Session.DURATION_MAX][1])
-
-        # Get a random duration between bounds.  Note, probably should
-        # change this to get a normal between bounds so durations are
-        # weighted to the middle
-        
-        # For Session 1-2, we override the default
-        if sess_num == 1:
-            session_dur = get_random_uniform(204, 1126, RANDOM.INTEGER)
-        elif sess_num == 2:
-            session_dur = get_random_uniform(208, 901, RANDOM.INTEGER)
-        else:
-            session_dur = get_random_uniform(dur_min, dur_max, RANDOM.INTEGER)
-
-        return math.floor(session_dur)
+        return self.schedule.get_online(sess_num)
         
     # -------------------------------------------------------------------------------------------------------------
     def get_general_time(self):
         """Get a normal distribution between a min and max"""
-        return round(get_random_normal(self.player_time_general_min, self.player_time_general_max), 2)
+        return round(get_random_normal(self.player_time_general_min, self.player_time_general_max,
+                                       rng=self.game.rng.stream(Stream.REACTION)), 2)
     
     # =============================================================================================================
     # VIDEO Watching
@@ -722,7 +620,7 @@ class Player:
             return False
         
         elif self.method_video == Video.RANDOM:
-            return get_random_boolean()
+            return get_random_boolean(rng=self.game.rng.stream(Stream.VIDEO))
         
         elif self.method_video == Video.EXPERT:
             # future expert system
@@ -747,24 +645,6 @@ class Player:
     # =============================================================================================================
     # Core Logic where Player Chooses Action to do
     # =============================================================================================================
-    @staticmethod
-    def get_actions_by_type(actions, action_type):
-        """Given a specific ActionType, return list of matching actions from Queue"""
-        filter_actions = []
-        
-        for i, action in enumerate(actions):
-            if action[Params.ACTION] == action_type:
-                filter_actions.append(action)
-        
-        return filter_actions
-    
-    # ------------
-    @staticmethod
-    def remove_action_by_id(actions, action_id):
-        """Given action_id, rebuild Action Queue without that action_id"""
-        return [a for a in actions if a[Params.ACTION_ID] != action_id]
-    
-    # ------------
     def clear_action(self, action):
         """Remove action from the Queue
         Parameters:
@@ -773,8 +653,7 @@ class Player:
         Return Boolean"""
         self.gcd = action[Params.TIMER]
         self.last_action = action
-        self.game.state[State.ACTIONS] = self.remove_action_by_id(self.game.state[State.ACTIONS],
-                                                                  action[Params.ACTION_ID])
+        self.game.state[State.ACTIONS].remove(action[Params.ACTION_ID])
         self.track[Track.ACTION_COUNT] += 1
         
         return True
@@ -809,41 +688,11 @@ class Player:
                                 Actions.SPIN_WHEEL,
                                 Actions.DONATE_ANIMAL]:
             
-            # Get actions from queue matching the ActionType
-            filter_actions = self.get_actions_by_type(self.game.state[State.ACTIONS], possible_action)
+            # Get the next action of this ActionType - the queue keeps each type in the player's priority order
+            action = self.game.state[State.ACTIONS].get_next(possible_action)
             
             # If we have some actions of the given type
-            if filter_actions and len(filter_actions) > 0:
-                
-                # If there are several possible options for the same action, sort them in priority order
-                if possible_action == Actions.FEED_ANIMAL:
-                    sort_method = self.behavior_feed_order
-                    
-                    if sort_method == 0:
-                        random.shuffle(filter_actions)
-                    elif sort_method == 1:
-                        filter_actions = sorted(filter_actions,
-                                                key=lambda i: (i[Params.DATA][Params.ANIMAL_LEVEL],
-                                                               i[Params.DATA][Params.ANIMAL_RARITY]),
-                                                reverse=True)
-                    elif sort_method == 2:
-                        filter_actions = sorted(filter_actions,
-                                                key=lambda i: (i[Params.DATA][Params.ANIMAL_RARITY],
-                                                               i[Params.DATA][Params.ANIMAL_LEVEL]),
-                                                reverse=True)
-                    elif sort_method == 3:
-                        filter_actions = sorted(filter_actions,
-                                                key=lambda i: (i[Params.DATA][Params.ANIMAL_LEVEL],
-                                                               i[Params.DATA][Params.ANIMAL_RARITY]),
-                                                reverse=False)
-                    elif sort_method == 4:
-                        filter_actions = sorted(filter_actions,
-                                                key=lambda i: (i[Params.DATA][Params.ANIMAL_RARITY],
-                                                               i[Params.DATA][Params.ANIMAL_LEVEL]),
-                                                reverse=False)
-                
-                # grab action off top of list
-                action = filter_actions.pop(0)
+            if action:
                 
                 # ==========================================
                 # Do the chosen ACTION
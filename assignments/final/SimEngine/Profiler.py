@@ -0,0 +1,360 @@
+import glob
+import json
+import os
+import time
+
+import pandas as pd
+
+from .StringConstants import *
+
+
+class PhaseProfiler:
+    """Opt-in timers and counters for the phases of a player's frame loop (set sim_profile on the Variants tab)
+
+    attach() replaces the phase methods of one Game/Player with timed wrappers on the instance (the classes are
+    untouched, so players without a profiler pay nothing).  Every call is counted, but only every sample_every-th
+    processed frame is timed - on a sampled frame every phase called is timed with perf_counter_ns into a log
+    scale histogram (4 buckets per power of 2, ~20% wide) for the percentiles, and the action queue length and
+    whether an action was taken are counted.  Phases outside process_frame (the offline check) use the
+    sampling decision of the last processed frame.
+
+    Profilers merge by adding their counts (see merge), so per player profiles add up to a variant's profile."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all profilers)
+
+    # (phase, owner ('game', 'player' or 'snapshot'), method name) - wrapped by attach
+    methods = [
+        (Phase.FRAME, 'game', 'process_frame'),
+        (Phase.SPIN_WHEEL, 'game', 'check_spin_wheel'),
+        (Phase.MERGE_CANDY, 'game', 'check_merge_candy'),
+        (Phase.FEED_ANIMAL, 'game', 'check_feed_animal'),
+        (Phase.BUY_CANDY, 'game', 'check_buy_candy'),
+        (Phase.SWAP_ANIMALS, 'game', 'check_swap_animals'),
+        (Phase.EGG_PROGRESS, 'game', 'check_egg_progress'),
+        (Phase.CHOOSE_ACTION, 'player', 'choose_action'),
+        (Phase.SAVE_SNAPSHOT, 'snapshot', 'save_snapshot'),
+        (Phase.OFFLINE, 'game', 'check_offline'),
+    ]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, sample_every=1):
+        """
+        PhaseProfiler Constructor
+
+        sample_every (Int)         - time one processed frame in every sample_every (1 = every frame)
+        """
+        self.sample_every = max(int(sample_every), 1)
+        self.sampled = False  # is the current frame timed?
+
+        self.frames = 0  # frames processed
+        self.sampled_frames = 0
+        self.phases = {phase: [0, 0, 0, {}] for phase, _, _ in self.methods}  # [calls, timed, total ns, histogram]
+        self.queue_lengths = {}  # action queue length when choose_action runs (sampled frames) -> count
+        self.actions = {}  # actions taken in a sampled frame (0 or 1) -> count
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_bucket(ns):
+        """Histogram bucket of a duration - 4 buckets per power of 2
+
+        Returns Int"""
+        bits = ns.bit_length()
+
+        if bits < 3:
+            return ns
+
+        return (bits << 2) | ((ns >> (bits - 3)) & 3)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_bucket_value(bucket):
+        """Middle of a histogram bucket (ns)
+
+        Returns Float"""
+        if bucket < 4:
+            return float(bucket)
+
+        bits, quarter = bucket >> 2, bucket & 3
+
+        return (4 + quarter + 0.5) * 2 ** (bits - 3)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def attach(self, game):
+        """Wrap the phase methods of a game (call once the player is set)
+
+        Parameters:
+            game (Game) - game to profile"""
+        owners = {'game': game, 'player': game.player, 'snapshot': game.snapshot}
+
+        for phase, owner, name in self.methods:
+            owner = owners[owner]
+            method = getattr(owner, name)
+
+            if phase == Phase.FRAME:
+                wrapped = self.wrap_frame(method)
+            elif phase == Phase.CHOOSE_ACTION:
+                wrapped = self.wrap_choose_action(method, game.state[State.ACTIONS])
+            else:
+                wrapped = self.wrap(phase, method)
+
+            setattr(owner, name, wrapped)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def detach(self, game):
+        """Take the wrappers attach() put on a game off again (the wrappers can't be pickled - see Checkpoint)
+
+        Parameters:
+            game (Game) - profiled game"""
+        owners = {'game': game, 'player': game.player, 'snapshot': game.snapshot}
+
+        for _, owner, name in self.methods:
+            vars(owners[owner]).pop(name, None)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def wrap(self, phase, method):
+        """Counted (and on sampled frames timed) version of a method
+
+        Returns Function"""
+        stats = self.phases[phase]
+        histogram = stats[3]
+        clock = time.perf_counter_ns
+        get_bucket = self.get_bucket
+
+        def timed(*args, **kwargs):
+            stats[0] += 1
+
+            if not self.sampled:
+                return method(*args, **kwargs)
+
+            start = clock()
+            result = method(*args, **kwargs)
+            ns = clock() - start
+
+            stats[1] += 1
+            stats[2] += ns
+            bucket = get_bucket(ns)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+            return result
+
+        return timed
+
+    # ------------------------------------------------------------------------------------------------------------
+    def wrap_frame(self, method):
+        """process_frame wrapper - decides whether the frame is sampled, then times it
+
+        Returns Function"""
+        timed = self.wrap(Phase.FRAME, method)
+
+        def frame(*args, **kwargs):
+            self.frames += 1
+            self.sampled = self.frames % self.sample_every == 0
+            self.sampled_frames += self.sampled
+
+            return timed(*args, **kwargs)
+
+        return frame
+
+    # ------------------------------------------------------------------------------------------------------------
+    def wrap_choose_action(self, method, queue):
+        """choose_action wrapper - also counts the queue length and the actions taken on sampled frames
+
+        Returns Function"""
+        timed = self.wrap(Phase.CHOOSE_ACTION, method)
+
+        def choose_action(*args, **kwargs):
+            if not self.sampled:
+                return timed(*args, **kwargs)
+
+            length = len(queue)
+            self.queue_lengths[length] = self.queue_lengths.get(length, 0) + 1
+
+            result = timed(*args, **kwargs)
+            taken = int(bool(result))
+            self.actions[taken] = self.actions.get(taken, 0) + 1
+
+            return result
+
+        return choose_action
+
+    # ------------------------------------------------------------------------------------------------------------
+    def merge(self, other):
+        """Add another profiler's counts
+
+        Parameters:
+            other (PhaseProfiler) - profiler to merge in (unchanged)"""
+        self.frames += other.frames
+        self.sampled_frames += other.sampled_frames
+
+        for phase, (calls, timed, total, histogram) in other.phases.items():
+            stats = self.phases.setdefault(phase, [0, 0, 0, {}])
+            stats[0] += calls
+            stats[1] += timed
+            stats[2] += total
+
+            for bucket, count in histogram.items():
+                stats[3][bucket] = stats[3].get(bucket, 0) + count
+
+        for own, counts in ((self.queue_lengths, other.queue_lengths), (self.actions, other.actions)):
+            for key, count in counts.items():
+                own[key] = own.get(key, 0) + count
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_percentile(self, histogram, q):
+        """Percentile of a timing histogram (ns, middle of the bucket it falls in)
+
+        Returns Float"""
+        total = sum(histogram.values())
+        rank = q * (total - 1)
+        seen = 0
+
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+
+            if seen > rank:
+                return self.get_bucket_value(bucket)
+
+        return float('nan')
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_dict(self):
+        """JSON friendly copy of every count
+
+        Returns Dict"""
+        return {
+            'sample_every'  : self.sample_every,
+            'frames'        : self.frames,
+            'sampled_frames': self.sampled_frames,
+            'phases'        : {phase: {'calls'    : calls,
+                                       'timed'    : timed,
+                                       'total_ns' : total,
+                                       'histogram': {str(b): c for b, c in sorted(histogram.items())}}
+                               for phase, (calls, timed, total, histogram) in self.phases.items()},
+            'queue_lengths' : {str(k): c for k, c in sorted(self.queue_lengths.items())},
+            'actions'       : {str(k): c for k, c in sorted(self.actions.items())},
+        }
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def from_dict(data):
+        """Rebuild a profiler from to_dict()
+
+        Returns PhaseProfiler"""
+        profiler = PhaseProfiler(data['sample_every'])
+        profiler.frames = data['frames']
+        profiler.sampled_frames = data['sampled_frames']
+        profiler.phases = {phase: [p['calls'], p['timed'], p['total_ns'],
+                                   {int(b): c for b, c in p['histogram'].items()}]
+                           for phase, p in data['phases'].items()}
+        profiler.queue_lengths = {int(k): c for k, c in data['queue_lengths'].items()}
+        profiler.actions = {int(k): c for k, c in data['actions'].items()}
+
+        return profiler
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_rows(self):
+        """Summary row for every phase that was called
+
+        Times are per call in microseconds.  est_total_s scales the timed calls up to every call, and frame_pct is
+        the phase's share of the process_frame time (phases outside process_frame are compared to it too).
+
+        Returns List<Dict>"""
+        frame_calls, frame_timed, frame_total, _ = self.phases[Phase.FRAME]
+        frame_est = frame_total * frame_calls / frame_timed if frame_timed else 0
+
+        rows = []
+        for phase, (calls, timed, total, histogram) in self.phases.items():
+            if calls == 0:
+                continue
+
+            est_total = total * calls / timed if timed else float('nan')
+
+            rows.append({
+                'phase'      : phase,
+                'calls'      : calls,
+                'timed'      : timed,
+                'mean_us'    : total / timed / 1000 if timed else float('nan'),
+                'p50_us'     : self.get_percentile(histogram, 0.5) / 1000,
+                'p90_us'     : self.get_percentile(histogram, 0.9) / 1000,
+                'p99_us'     : self.get_percentile(histogram, 0.99) / 1000,
+                'est_total_s': est_total / 1e9,
+                'frame_pct'  : 100 * est_total / frame_est if frame_est else float('nan'),
+            })
+
+        return rows
+
+
+# ------------------------------------------------------------------------------------------------------------
+class RunProfile:
+    """PhaseProfilers merged per variant - what ResultWriter keeps for the players a worker ran, and what the parent
+    merges the workers' profiles into (JSON plus a summary table)"""
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self):
+        """
+        RunProfile Constructor
+        """
+        self.variants = {}  # variant label -> PhaseProfiler
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.variants)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add(self, variant, profiler):
+        """Merge a player's (or worker's) profiler into its variant
+
+        Parameters:
+            variant (String) - variant label
+            profiler (PhaseProfiler) - profiler to merge in (unchanged)"""
+        if variant not in self.variants:
+            self.variants[variant] = PhaseProfiler(profiler.sample_every)
+
+        self.variants[variant].merge(profiler)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def merge(self, other):
+        """Merge every variant of another RunProfile"""
+        for variant, profiler in other.variants.items():
+            self.add(variant, profiler)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_df(self):
+        """Summary table - one row per (variant, phase), see PhaseProfiler.to_rows
+
+        Returns DataFrame"""
+        rows = [dict(variant=variant, **row) for variant, profiler in self.variants.items()
+                for row in profiler.to_rows()]
+
+        return pd.DataFrame(rows)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def save(self, path):
+        """Write the profile as JSON
+
+        Parameters:
+            path (String) - file"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'w') as f:
+            json.dump({variant: profiler.to_dict() for variant, profiler in self.variants.items()}, f, indent=1)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def load(folder):
+        """Merge every saved profile (part-*.json) in a folder
+
+        Parameters:
+            folder (String) - folder the workers saved their profiles in
+
+        Returns RunProfile (empty if there are none)"""
+        profile = RunProfile()
+
+        for path in sorted(glob.glob(os.path.join(folder, 'part-*.json'))):
+            with open(path) as f:
+                for variant, data in json.load(f).items():
+                    profile.add(variant, PhaseProfiler.from_dict(data))
+
+        return profile
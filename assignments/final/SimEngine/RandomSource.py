@@ -0,0 +1,199 @@
+import zlib
+
+import numpy as np
+
+from scipy.stats import truncnorm
+
+
+class RandomSource:
+    """Buffered random numbers for one player
+
+    Draws come from a numpy.random.Generator in blocks (uniforms, standard normals, standard exponentials) and are
+    handed out one at a time, so the simulation loop never pays NumPy/SciPy per-call overhead for a single value.
+    Truncated normals and Poisson counts depend on their parameters, so each (a, b, loc, scale) / lambda gets its own
+    buffer that is refilled lazily when it runs out.
+
+    Each stochastic decision point draws from its own named substream (stream(Stream.SESSION), ...).  A player whose
+    economy makes it take a different path (more eggs, fewer feeds) still sees the same session schedule and
+    reaction times, which is what common random numbers (CRN) across variants relies on."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all random sources)
+    BLOCK_SIZE = 4096  # draws per refill of the uniform/normal/exponential blocks
+    PARAM_BLOCK_SIZE = 256  # draws per refill of a parameterized (truncnorm/poisson) buffer
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, seed=None, block_size=None):
+        """
+        RandomSource Constructor
+
+        seed (Int/SeedSequence/Generator) - seed for the generator (None = fresh OS entropy)
+        block_size (Int)                  - override BLOCK_SIZE
+        """
+        if isinstance(seed, np.random.Generator):
+            self.seed_seq = None
+            self.generator = seed
+        else:
+            self.seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+            self.generator = np.random.default_rng(self.seed_seq)
+
+        # Provenance (written to the simulation output so a player can be re-run)
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed = seed.entropy
+            self.replication = seed.spawn_key[-1] if seed.spawn_key else 0
+        else:
+            self.seed = seed if isinstance(seed, int) else None
+            self.replication = 0
+
+        self.block_size = block_size or self.BLOCK_SIZE
+
+        # block name -> [values (List<Float>), next index]
+        self.blocks = {}
+
+        # stream name -> RandomSource
+        self.streams = {}
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_master_seed(seed=None):
+        """Master seed for a run - the given seed, or a fresh one from OS entropy (kept below 2^63 so it fits the
+        int64 'seed' output column)
+
+        Returns Int"""
+        if seed is not None:
+            return int(seed)
+
+        return int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> np.uint64(1))
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def spawn(master_seed, variant, replication, crn=False):
+        """SeedSequence for one player of a run
+
+        The stream only depends on (master_seed, variant, replication) - not on how many workers there are or
+        which order they pick up tasks - so any single player from a large run can be re-run alone with
+        Game(seed=RandomSource.spawn(master_seed, variant, replication, crn)).
+
+        In CRN mode the variant is left out of the key, so replication i of every variant gets the same streams.
+
+        Parameters:
+            master_seed (Int) - run level seed (recorded in the simulation output)
+            variant (Int) - variant id
+            replication (Int) - player number within the variant (0...sim_count - 1)
+            crn (Boolean) - common random numbers across variants
+
+        Returns SeedSequence"""
+        spawn_key = (int(replication),) if crn else (int(variant), int(replication))
+
+        return np.random.SeedSequence(master_seed, spawn_key=spawn_key)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def stream(self, name):
+        """Named substream for one decision point (Stream.SESSION, Stream.EGG, ...)
+
+        Parameters:
+            name (String) - stream name
+
+        Returns RandomSource"""
+        child = self.streams.get(name)
+
+        if child is None:
+            if self.seed_seq is None:
+                return self
+
+            # crc32 (not hash()) so the key is the same in every process
+            spawn_key = self.seed_seq.spawn_key + (zlib.crc32(name.encode()),)
+            child = RandomSource(np.random.SeedSequence(self.seed_seq.entropy, spawn_key=spawn_key), self.block_size)
+            child.seed = self.seed
+            child.replication = self.replication
+            self.streams[name] = child
+
+        return child
+
+    # ------------------------------------------------------------------------------------------------------------
+    def next_value(self, name, refill, block_size):
+        """Return the next value from a named block, refilling it first if it is used up
+
+        Parameters:
+            name (Object) - block key
+            refill (Function) - refill(size) returns an ndarray of fresh draws
+            block_size (Int) - number of draws per refill
+
+        Returns Float"""
+        block = self.blocks.get(name)
+
+        if block is None or block[1] >= len(block[0]):
+            block = [refill(block_size).tolist(), 0]
+            self.blocks[name] = block
+
+        value = block[0][block[1]]
+        block[1] += 1
+
+        return value
+
+    # ------------------------------------------------------------------------------------------------------------
+    def random(self):
+        """Uniform float in [0, 1)
+
+        Returns Float"""
+        return self.next_value('uniform', self.generator.random, self.block_size)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def integers(self, low, high):
+        """Uniform integer in [low, high) - same bounds handling as np.random.randint (floats are truncated)
+
+        Returns Int"""
+        low = int(low)
+        high = int(high)
+
+        if high <= low:
+            raise ValueError(f'RandomSource.integers(): low >= high ({low} >= {high})')
+
+        return low + int(self.random() * (high - low))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def uniform(self, low, high):
+        """Uniform float in [low, high)
+
+        Returns Float"""
+        return self.random() * (high - low) + low
+
+    # ------------------------------------------------------------------------------------------------------------
+    def normal(self, loc=0.0, scale=1.0):
+        """Normal draw
+
+        Returns Float"""
+        return loc + scale * self.next_value('normal', self.generator.standard_normal, self.block_size)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def exponential(self, scale=1.0):
+        """Exponential draw with the given scale (1 / rate) - same parameterization as np.random.exponential
+
+        Returns Float"""
+        return scale * self.next_value('exponential', self.generator.standard_exponential, self.block_size)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def poisson(self, lam):
+        """Poisson count with mean lam
+
+        Returns Int"""
+        return self.next_value(('poisson', lam),
+                               lambda size: self.generator.poisson(lam, size),
+                               self.PARAM_BLOCK_SIZE)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def truncnorm(self, a, b, loc=0.0, scale=1.0):
+        """Truncated normal draw (same parameters as scipy.stats.truncnorm - a, b are in standard deviations)
+
+        Returns Float"""
+        return self.next_value(('truncnorm', a, b, loc, scale),
+                               lambda size: truncnorm.rvs(a, b, loc=loc, scale=scale, size=size,
+                                                          random_state=self.generator),
+                               self.PARAM_BLOCK_SIZE)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def choice_index(self, n):
+        """Random index into a sequence of length n
+
+        Returns Int"""
+        return self.integers(0, n)
@@ -0,0 +1,318 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .KpiAggregator import KpiAggregator
+from .Profiler import RunProfile
+from .SimOutput import SimOutput
+
+
+class ResultWriter:
+    """Stream simulation results from one worker process into a Parquet dataset
+
+    Layout (one folder per variant, one file per worker per variant, one row group per player):
+        {folder}/snapshots/v_id={variant}/part-{worker}.parquet - every snapshot row, typed schema per variant
+        {folder}/events/v_id={variant}/part-{worker}.parquet    - every event (long format - see EventLog)
+        {folder}/final/part-{worker}.parquet                     - last snapshot of each player (fixed columns only)
+        {folder}/kpis/part-{worker}.pkl                          - KpiAggregator of every player the worker ran
+        {folder}/profile/part-{worker}.json                      - RunProfile of the profiled players (sim_profile)
+
+    Every table has its own folder, so each one reads as a dataset on its own (pd.read_parquet(f'{folder}/snapshots')).
+    The snapshot and events tables are only written when raw is on - large sweeps can keep just the final rows and
+    the per day KPI summary (see write_player).
+
+    The snapshot table is written wide (with the comma-joined actions_* and a_<Animal_ID> columns rebuilt from the
+    event log) unless wide is off - the events table holds the same information either way.
+
+    Each worker only ever holds one player's rows in memory.  Once every worker has closed its writer, merge()
+    writes the _metadata/_common_metadata summary files for each variant - a metadata only step, so it stays flat
+    however many players were simulated."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all writers)
+    COMPRESSION = 'gzip'
+
+    # Table folders under the dataset folder
+    SNAPSHOTS = 'snapshots'
+    EVENTS = 'events'
+
+    # Output type -> Arrow type
+    arrow_types = {
+        'int' : pa.int64(),
+        'str' : pa.string(),
+        'list': pa.list_(pa.string()),
+    }
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, folder, worker_id, bundles, wide=True, raw=True):
+        """
+        ResultWriter Constructor
+
+        folder (String)            - dataset folder
+        worker_id (Int)            - worker number (names this worker's part files)
+        bundles (Dict)             - {v_id: EconomyBundle} (defines each variant's columns)
+        wide (Boolean)             - write the wide snapshot view (see SimOutput.get_results_df)
+        raw (Boolean)              - write every snapshot row and event (off = final rows and KPI summary only)
+        """
+        self.folder = folder
+        self.worker_id = worker_id
+        self.bundles = bundles
+        self.wide = wide
+        self.raw = raw
+
+        self.writers = {}  # (table, v_id) -> ParquetWriter
+        self.schemas = {}  # (table, v_id) -> (column types, Arrow schema)
+        self.final = []  # last snapshot row of each player written
+        self.kpis = KpiAggregator()  # per variant, per day KPI distributions of the players written
+        self.profile = RunProfile()  # per variant phase timings of the players written with a PhaseProfiler
+
+        self.final_schema = self.get_schema(SimOutput.dtypes)
+        self.event_schema = self.get_schema(SimOutput.event_dtypes)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def get_schema(cls, columns):
+        """Arrow schema for {column name: output type}
+
+        Returns Schema"""
+        return pa.schema([(name, cls.arrow_types[dtype]) for name, dtype in columns.items()])
+
+    # ------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def to_table(cls, df, columns, schema):
+        """Convert a results DataFrame to an Arrow table with the given schema
+
+        Missing int cells become 0, missing str cells stay null.  Columns the player never produced (animals never
+        collected) are added as all 0/null.
+
+        Returns Table"""
+        arrays = []
+        for name, dtype in columns.items():
+            values = df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+
+            if dtype == 'int':
+                values = values.fillna(0)
+
+                # Game getters return False for "none" - store it as 0
+                if values.dtype == object:
+                    values = values.map(lambda v: int(v) if isinstance(v, (bool, np.bool_)) else v)
+
+                # safe cast - a fractional or non numeric value raises instead of being truncated
+                array = pa.array(values.to_numpy(), type=pa.int64())
+            elif dtype == 'list':
+                array = pa.array([list(v) if isinstance(v, (list, tuple)) else None for v in values],
+                                 type=cls.arrow_types['list'])
+            else:
+                array = pa.array([None if v is None or v != v else str(v) for v in values], type=pa.string())
+
+            arrays.append(array)
+
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_writer(self, table, v_id):
+        """Open (on first use) the part file of a table (SNAPSHOTS or EVENTS) for a variant
+
+        Returns Tuple - (ParquetWriter, column types, Arrow schema)"""
+        key = (table, v_id)
+
+        if key not in self.writers:
+            if table == self.EVENTS:
+                columns, schema = SimOutput.event_dtypes, self.event_schema
+            else:
+                columns = SimOutput.get_columns(self.bundles[v_id], self.wide)
+                schema = self.get_schema(columns)
+
+            path = os.path.join(self.folder, table, f'v_id={v_id}', f'part-{self.worker_id}.parquet')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            self.schemas[key] = (columns, schema)
+            self.writers[key] = pq.ParquetWriter(path, schema, compression=self.COMPRESSION)
+
+        return (self.writers[key],) + self.schemas[key]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def write(self, v_id, results_df, events_df=None):
+        """Write one player's snapshot rows (and events) as a row group
+
+        Parameters:
+            v_id (Int) - variant id
+            results_df (DataFrame) - SimOutput.get_results_df(wide)
+            events_df (DataFrame) - SimOutput.events_df"""
+        if len(results_df) > 0:
+            writer, columns, schema = self.get_writer(self.SNAPSHOTS, v_id)
+            writer.write_table(self.to_table(results_df, columns, schema))
+
+            self.final.append(self.to_table(results_df.iloc[[-1]], SimOutput.dtypes, self.final_schema))
+
+        if events_df is not None and len(events_df) > 0:
+            writer, columns, schema = self.get_writer(self.EVENTS, v_id)
+            writer.write_table(self.to_table(events_df, columns, schema))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def write_player(self, v_id, snapshot):
+        """Add a finished player to the KPI summary and write its rows (only its final row when raw is off)
+
+        Parameters:
+            v_id (Int) - variant id
+            snapshot (SimOutput) - the player's game.snapshot"""
+        self.kpis.add_snapshots(snapshot.player.variant_label, snapshot.results)
+
+        if snapshot.game.profiler is not None:
+            self.profile.add(snapshot.player.variant_label, snapshot.game.profiler)
+
+        if self.raw:
+            self.write(v_id, snapshot.get_results_df(self.wide), snapshot.events_df)
+        elif len(snapshot.results) > 0:
+            results_df = snapshot.get_results_df(wide=False)
+            self.final.append(self.to_table(results_df.iloc[[-1]], SimOutput.dtypes, self.final_schema))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def close(self):
+        """Close every open file (and write the final rows table and the KPI summary)"""
+        for writer in self.writers.values():
+            writer.close()
+
+        if self.final:
+            path = os.path.join(self.folder, 'final', f'part-{self.worker_id}.parquet')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pq.write_table(pa.concat_tables(self.final), path, compression=self.COMPRESSION)
+
+        if self.kpis.stats:
+            self.kpis.save(os.path.join(self.folder, 'kpis', f'part-{self.worker_id}.pkl'))
+
+        if len(self.profile) > 0:
+            self.profile.save(os.path.join(self.folder, 'profile', f'part-{self.worker_id}.json'))
+
+        self.writers = {}
+        self.final = []
+        self.kpis = KpiAggregator()
+        self.profile = RunProfile()
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_part_ids(folder):
+        """Worker numbers that wrote part files in a dataset folder
+
+        Returns Set<Int>"""
+        paths = glob.glob(os.path.join(folder, '**', 'part-*.*'), recursive=True)
+
+        return {int(os.path.basename(path)[5:].split('.')[0]) for path in paths}
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def remove_part(folder, worker_id):
+        """Remove every file one worker wrote (a worker process that died leaves unreadable part files behind)
+
+        Parameters:
+            folder (String) - dataset folder
+            worker_id (Int) - worker number"""
+        for path in glob.glob(os.path.join(folder, '**', f'part-{worker_id}.*'), recursive=True):
+            os.remove(path)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def merge(folder):
+        """Write _metadata / _common_metadata for each variant folder (row group statistics of every part file) of
+        the snapshot and events tables
+
+        Parameters:
+            folder (String) - dataset folder
+
+        Returns Int - number of snapshot rows in the dataset"""
+        ResultWriter.merge_table(os.path.join(folder, ResultWriter.EVENTS))
+
+        return ResultWriter.merge_table(os.path.join(folder, ResultWriter.SNAPSHOTS))
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def merge_table(folder):
+        """Write _metadata / _common_metadata for each variant folder of one table
+
+        Parameters:
+            folder (String) - table folder
+
+        Returns Int - number of rows in the table"""
+        rows = 0
+
+        for variant_folder in sorted(glob.glob(os.path.join(folder, 'v_id=*'))):
+            metadata = None
+            schema = None
+
+            for path in sorted(glob.glob(os.path.join(variant_folder, 'part-*.parquet'))):
+                part = pq.read_metadata(path)
+                part.set_file_path(os.path.basename(path))
+
+                if metadata is None:
+                    metadata = part
+                    schema = pq.read_schema(path)
+                else:
+                    metadata.append_row_groups(part)
+
+            if metadata is not None:
+                pq.write_metadata(schema, os.path.join(variant_folder, '_common_metadata'))
+                pq.write_metadata(schema, os.path.join(variant_folder, '_metadata'), metadata_collector=[metadata])
+                rows += metadata.num_rows
+
+        return rows
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def read_final(folder):
+        """Last snapshot of every player (small - one row per player)
+
+        Returns DataFrame"""
+        return pq.read_table(os.path.join(folder, 'final')).to_pandas()
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def read_kpis(folder):
+        """Per variant, per day KPI summary of every player (merges the workers' aggregators)
+
+        Returns DataFrame - see KpiAggregator.to_df"""
+        return KpiAggregator.load(os.path.join(folder, 'kpis')).to_df()
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def read_profile(folder):
+        """Per variant phase timings of every profiled player (merges the workers' profiles)
+
+        Returns RunProfile"""
+        return RunProfile.load(os.path.join(folder, 'profile'))
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def export_csv(folder, path):
+        """Write a whole table to one CSV, one row group at a time (union of every variant's columns - missing
+        cells are 0, same as the old per-player CSVs)
+
+        Parameters:
+            folder (String) - table folder (SNAPSHOTS or EVENTS under the dataset folder)
+            path (String) - CSV file"""
+        variant_folders = sorted(glob.glob(os.path.join(folder, 'v_id=*')))
+
+        columns = []
+        for variant_folder in variant_folders:
+            for name in pq.read_schema(os.path.join(variant_folder, '_common_metadata')).names:
+                if name not in columns:
+                    columns.append(name)
+
+        header = True
+        for variant_folder in variant_folders:
+            for part in sorted(glob.glob(os.path.join(variant_folder, 'part-*.parquet'))):
+                parquet_file = pq.ParquetFile(part)
+
+                for i in range(parquet_file.num_row_groups):
+                    df = parquet_file.read_row_group(i).to_pandas().reindex(columns=columns)
+
+                    # Arrow lists come back as arrays - print them as lists like the simulation does
+                    if 'a' in df.columns:
+                        df['a'] = [list(v) if v is not None else [] for v in df['a']]
+
+                    df = df.fillna(0)
+                    df.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+                    header = False
@@ -0,0 +1,202 @@
+import math
+
+import numpy as np
+
+from .RandomSource import RandomSource
+from .StringConstants import *
+
+
+class SessionSchedule:
+    """Every session's online and offline duration for a player, sampled up front
+
+    The session model from the Variants tab (sessions per day, duration min/max as 'log,alpha,beta',
+    'linear,alpha,beta' or 'fixed,value') is parsed once, and the durations for the whole sim_length horizon are drawn
+    in vectorized NumPy.  Arrays are indexed by session number (index 0 is unused):
+        - online[k]    : seconds session k lasts
+        - offline[k]   : seconds from the end of session k to the start of session k + 1 (before the Game subtracts
+                         the session length - see Game.check_offline)
+
+    Sessions are sampled in fixed size blocks so a player's durations don't depend on the horizon (a 3 day run sees
+    the same first sessions as a 90 day run).  If a player runs past the pre-sampled sessions more blocks are added.
+    """
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all schedules)
+
+    # Session 1-2 use fixed bounds (from real session data) instead of the variant's model
+    FIRST_SESSIONS = {1: (204, 1126), 2: (208, 901)}
+
+    BLOCK_SIZE = 64  # sessions sampled per block
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, session_params, rng, horizon):
+        """
+        SessionSchedule Constructor
+
+        session_params (Dict)      - Session.PER_DAY, Session.DURATION_MIN, Session.DURATION_MAX (Variants tab values)
+        rng (RandomSource)         - random numbers (the player's Stream.SESSION stream)
+        horizon (Int)              - seconds of real time the schedule should cover (sim_length)
+        """
+        self.rng = rng
+        self.horizon = horizon
+
+        self.per_day = float(session_params[Session.PER_DAY])
+        self.duration_min = self.parse_bound(session_params[Session.DURATION_MIN])
+        self.duration_max = self.parse_bound(session_params[Session.DURATION_MAX])
+
+        self.online = np.zeros(1, dtype=np.int64)
+        self.offline = np.zeros(1, dtype=np.int64)
+
+        # Expected real seconds per session cycle is about 1 day / sessions per day - sample a bit past the horizon
+        self.extend(max(int(math.ceil(1.5 * horizon * max(self.per_day, 1) / 86400)), 8))
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def parse_bound(bound):
+        """Parse a session duration bound from the Variants tab
+
+        Parameters:
+            bound (String or List) - 'log,alpha,beta', 'linear,alpha,beta' or 'fixed,value'
+
+        Returns Tuple - (kind, alpha, beta)"""
+        parts = bound.split(',') if isinstance(bound, str) else list(bound)
+
+        if parts[0] in ('log', 'linear'):
+            return parts[0], float(parts[1]), float(parts[2])
+
+        return 'fixed', 0.0, float(parts[1])
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def eval_bound(bound, sess_num):
+        """Evaluate a parsed bound for an array of session numbers
+
+        Returns ndarray<Float>"""
+        kind, alpha, beta = bound
+
+        if kind == 'log':
+            return alpha * np.log(sess_num) + beta
+        elif kind == 'linear':
+            return alpha * sess_num + beta
+
+        return np.full(len(sess_num), beta)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def extend(self, count):
+        """Sample (at least) the next count sessions and append them to the arrays
+
+        Parameters:
+            count (Int) - number of sessions to add"""
+        for _ in range(int(math.ceil(count / self.BLOCK_SIZE))):
+            self.extend_block()
+
+    # ------------------------------------------------------------------------------------------------------------
+    def extend_block(self):
+        """Sample the next BLOCK_SIZE sessions and append them to the arrays"""
+        generator = self.rng.generator
+        count = self.BLOCK_SIZE
+        first = len(self.online)
+        sess_num = np.arange(first, first + count, dtype=np.float64)
+
+        # --- Online duration: uniform integer between the bounds for the session number
+        dur_min = self.eval_bound(self.duration_min, sess_num)
+        dur_max = self.eval_bound(self.duration_max, sess_num)
+
+        for k, (low, high) in self.FIRST_SESSIONS.items():
+            dur_min[sess_num == k] = low
+            dur_max[sess_num == k] = high
+
+        low = np.minimum(dur_min, dur_max)
+        high = np.maximum(dur_min, dur_max)
+
+        # Same truncation as np.random.randint(low, high) (floats are cut to ints, high is exclusive)
+        low_int = np.trunc(low)
+        span = np.maximum(np.trunc(high) - low_int, 1)
+        online = np.floor(low_int + np.floor(generator.random(count) * span))
+        online = np.where(dur_min == dur_max, np.floor(dur_min), online)
+
+        # --- Offline duration: sessions that day ~ Poisson (at least 1), time until next ~ Exponential
+        sessions = np.maximum(generator.poisson(self.per_day, count), 1)
+        offline = np.floor(generator.standard_exponential(count) / sessions * 86400)
+
+        self.online = np.concatenate([self.online, online.astype(np.int64)])
+        self.offline = np.concatenate([self.offline, offline.astype(np.int64)])
+
+    # ------------------------------------------------------------------------------------------------------------
+    def ensure(self, sess_num):
+        """Make sure session sess_num has been sampled"""
+        while sess_num >= len(self.online):
+            self.extend(len(self.online))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_online(self, sess_num):
+        """Seconds session sess_num lasts
+
+        Returns Int"""
+        self.ensure(sess_num)
+
+        return int(self.online[sess_num])
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_offline(self, sess_num):
+        """Seconds from the end of session sess_num until the next session starts (see Game.check_offline)
+
+        Returns Int"""
+        self.ensure(sess_num)
+
+        return int(self.offline[sess_num])
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_session_starts(self):
+        """Simulation time (seconds) each session starts at - session k + 1 starts offline[k] seconds after session k
+        started, or straight after session k ends if it ran longer than that (same as Game.check_offline)
+
+        Returns ndarray<Int> - indexed by session number"""
+        cycle = np.maximum(self.offline[1:], self.online[1:])
+
+        return np.concatenate([[0, 0], np.cumsum(cycle)])[:len(self.online)]
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_online_seconds(self, horizon=None):
+        """Seconds spent online within the horizon (a session cut off by the horizon counts up to the horizon)
+
+        Parameters:
+            horizon (Int) - seconds of real time (default: the schedule's horizon)
+
+        Returns Int"""
+        horizon = self.horizon if horizon is None else horizon
+
+        # Sample until the schedule runs past the horizon
+        while self.get_session_starts()[-1] < horizon:
+            self.extend(len(self.online))
+
+        starts = self.get_session_starts()[1:]
+        online = self.online[1:]
+
+        return int(np.clip(horizon - starts, 0, online).sum())
+
+    # ------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def expected_online_seconds(cls, v_data, horizon=None, replications=1000, seed=None):
+        """Mean online seconds per player for a variant without running the simulation
+
+        Parameters:
+            v_data (Dict) - variant config (Variants tab)
+            horizon (Int) - seconds of real time (default sim_length)
+            replications (Int) - number of sampled players
+            seed (Int) - random seed
+
+        Returns Float"""
+        horizon = int(v_data[Variants.SIM_LENGTH]) if horizon is None else horizon
+        session_params = {
+            Session.PER_DAY     : v_data[Variants.SESS_PER_DAY],
+            Session.DURATION_MIN: v_data[Variants.SESS_DURATION_MIN],
+            Session.DURATION_MAX: v_data[Variants.SESS_DURATION_MAX],
+        }
+
+        seed_seq = np.random.SeedSequence(seed)
+        total = 0
+        for child in seed_seq.spawn(replications):
+            total += cls(session_params, RandomSource(child), horizon).get_online_seconds()
+
+        return total / replications
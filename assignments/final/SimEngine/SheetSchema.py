@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+
+from .StringConstants import *
+from .UtilityFunctions import log_to_file
+
+# Column types:
+#   'int'    - whole numbers (blank cells allowed - the column is then float64 with NaN, as pandas reads it)
+#   'number' - int64 if every value is whole, float64 otherwise
+#   'float'  - float64
+#   'str'    - text
+#   'auto'   - number if the cell parses as one, text otherwise (Variants tab parameters without a declared type)
+
+# Economy sheets (data_* tabs) - columns not listed here are dropped when the sheet is loaded
+SHEET_SCHEMAS = {
+    Variants.DATA_ANIMALS        : {
+        Column.ANIMAL_ID     : 'int',
+        Column.FAMILY        : 'int',
+        Column.RARITY        : 'int',
+        Column.SET_NAME      : 'str',
+        Column.ANIMAL_NAME   : 'str',
+        Column.LEVEL_UNLOCKED: 'int',
+        Column.REVENUE       : 'number',
+        Column.TREATS_EARNED : 'number',
+        Column.SET_ID        : 'int',
+    },
+    Variants.DATA_ANIMAL_SETS    : {
+        Column.ANIMAL_SET_ID: 'int',
+        Column.RARITY_1     : 'int',
+        Column.RARITY_2     : 'int',
+        Column.RARITY_3     : 'int',
+        Column.RARITY_4     : 'int',
+        Column.RARITY_5     : 'int',
+    },
+    Variants.DATA_ANIMAL_SOCKETS : {
+        Column.SOCKET_ID   : 'int',
+        Column.UNLOCK_LEVEL: 'int',
+    },
+    Variants.DATA_CANDIES        : {
+        Column.CANDY_LEVEL : 'int',
+        Column.CANDY_COST  : 'number',
+        Column.XP_EARNED   : 'number',
+        Column.UNLOCK_LEVEL: 'int',
+    },
+    Variants.DATA_CANDY_SLOTS    : {
+        Column.CANDY_SLOT_ID: 'int',
+        Column.CANDY_SLOTS  : 'int',
+        Column.UNLOCK_LEVEL : 'int',
+    },
+    Variants.DATA_CURRENCY_LABELS: {
+        Column.CURR_NUMBER : 'int',
+        Column.CURR_VALUE  : 'float',
+        Column.CURR_LETTERS: 'str',
+        Column.CURR_NAME   : 'str',
+    },
+    Variants.DATA_EGGS           : {
+        Column.PLAYER_LEVEL: 'int',
+        Column.EGG_COUNT   : 'int',
+        Column.GOAL        : 'number',
+        Column.REWARD_ID   : 'int',
+        Column.CUMULATIVE  : 'int',
+    },
+    Variants.DATA_GACHA_EGGS     : {
+        Column.EGG_ID  : 'int',
+        Column.EGG_NAME: 'str',
+        Column.RARITY_1: 'int',
+        Column.RARITY_2: 'int',
+        Column.RARITY_3: 'int',
+        Column.RARITY_4: 'int',
+        Column.RARITY_5: 'int',
+    },
+    Variants.DATA_PLAYER_LEVELS  : {
+        Column.PLAYER_LEVEL   : 'int',
+        Column.SHOP_ID        : 'int',
+        Column.ANIMAL_SOCKETS : 'int',
+        Column.CANDY_SLOTS    : 'int',
+        Column.CANDY_LEVEL_MIN: 'int',
+        Column.CANDY_LEVEL_MAX: 'int',
+        Column.CANDY_COST_MIN : 'number',
+        Column.CANDY_COST_MAX : 'number',
+        Column.CANDY_MERGE_MAX: 'int',
+        Column.XP_REQ_NEXT    : 'number',
+        Column.XP_REQ_TOTAL   : 'number',
+        Column.LUR_EGG_ID     : 'int',
+        Column.LUR_SOFT       : 'number',
+    },
+    Variants.DATA_RTP            : {
+        Column.PLAYER_LEVEL      : 'int',
+        Column.RTP_TARGET_ANIMALS: 'number',
+        Column.RTP_TARGET_STARS  : 'number',
+        Column.RTP_TARGET_REVENUE: 'number',
+    },
+    Variants.DATA_SHOP           : {
+        Column.SHOP_ID      : 'int',
+        Column.CURRENCY     : 'str',
+        Column.CURRENCY_SOFT: 'number',
+        Column.COST         : 'number',
+        Column.UNLOCK_LEVEL : 'int',
+    },
+}
+
+# Variants tab - one row per parameter (parameters not listed here are converted as 'auto')
+VARIANT_SCHEMA = {
+    Variants.VARIANT_LABEL              : 'str',
+    Variants.SIM_CORES                  : 'int',
+    Variants.SIM_COUNT                  : 'int',
+    Variants.SIM_LENGTH                 : 'int',
+    Variants.SIM_FPS                    : 'int',
+    Variants.SIM_LOG_LEVEL              : 'str',
+    Variants.SIM_LOG_CATEGORIES         : 'str',
+    Variants.SIM_MODE                   : 'int',
+    Variants.SIM_PROFILE                : 'int',
+    Variants.SIM_SNAPSHOT_TIME          : 'int',
+    Variants.SIM_SNAPSHOT_POLICY        : 'str',
+    Variants.SESS_PER_DAY               : 'number',
+    Variants.SESS_DURATION_MIN          : 'str',
+    Variants.SESS_DURATION_MAX          : 'str',
+    Variants.DATA_ANIMALS               : 'str',
+    Variants.DATA_ANIMAL_SETS           : 'str',
+    Variants.DATA_ANIMAL_SOCKETS        : 'str',
+    Variants.DATA_CANDY_SLOTS           : 'str',
+    Variants.DATA_CANDIES               : 'str',
+    Variants.DATA_CURRENCY_LABELS       : 'str',
+    Variants.DATA_EGGS                  : 'str',
+    Variants.DATA_GACHA_EGGS            : 'str',
+    Variants.DATA_PLAYER_LEVELS         : 'str',
+    Variants.DATA_RTP                   : 'str',
+    Variants.DATA_SHOP                  : 'str',
+    Variants.ANIMAL_INVENTORY_CAP       : 'int',
+    Variants.CANDY_FEED_LEVEL_MAX       : 'int',
+    Variants.CANDY_LEVEL_MAX            : 'int',
+    Variants.CURRENCY_SOFT_LABEL        : 'str',
+    Variants.CURRENCY_SOFT_START        : 'number',
+    Variants.CURRENCY_SECONDARY_LABEL   : 'str',
+    Variants.CURRENCY_SECONDARY_START   : 'number',
+    Variants.CURRENCY_PREMIUM_LABEL     : 'str',
+    Variants.CURRENCY_PREMIUM_START     : 'number',
+    Variants.EGG_UNLOCK_LEVEL           : 'int',
+    Variants.FORTUNE_SPIN_UNLOCK_1      : 'int',
+    Variants.FORTUNE_SPIN_COST_1        : 'number',
+    Variants.FORTUNE_SPIN_REWARD_1      : 'int',
+    Variants.FORTUNE_SPIN_UNLOCK_2      : 'int',
+    Variants.FORTUNE_SPIN_COST_2        : 'number',
+    Variants.FORTUNE_SPIN_REWARD_2      : 'int',
+    Variants.INITIAL_BALANCE            : 'number',
+    'max_level'                         : 'int',
+    Variants.OFFLINE_REGEN_CAP          : 'int',
+    Variants.PLAYER_BEHAVIOR_ACTION     : 'int',
+    Variants.PLAYER_BEHAVIOR_ANIMAL_SWAP: 'int',
+    Variants.PLAYER_BEHAVIOR_BET        : 'int',
+    Variants.PLAYER_BEHAVIOR_FEED_ORDER : 'int',
+    Variants.PLAYER_BEHAVIOR_OFFERWALL  : 'int',
+    'player_behavior_shop'              : 'int',
+    Variants.PLAYER_BEHAVIOR_VIDEO      : 'int',
+    'player_time_general_min'           : 'number',
+    'player_time_general_max'           : 'number',
+    'rtp'                               : 'number',
+    'rtp_time_min'                      : 'number',
+    'rtp_time_max'                      : 'number',
+    Variants.STARTING_ANIMAL            : 'str',
+    Variants.VIDEO_LIMIT                : 'int',
+    Variants.VIDEO_LIMIT_RESET          : 'int',
+}
+
+
+# ------------------------------------------------------------------------------------------------------------
+class SchemaError(ValueError):
+    """Cells that don't match the declared type (the message lists every bad cell)"""
+
+    def __init__(self, name, cells):
+        """
+        SchemaError Constructor
+
+        name (String)              - sheet name
+        cells (List<Tuple>)        - (row, column, value) of every bad cell (row numbers as in the sheet)
+        """
+        self.name = name
+        self.cells = cells
+
+        super().__init__(f'{name}: {len(cells)} bad cell(s) - ' +
+                         ', '.join(f'row {row} {column!r}: {value!r}' for row, column, value in cells))
+
+
+# ------------------------------------------------------------------------------------------------------------
+def convert_column(values, dtype):
+    """Convert a column to its declared type
+
+    Parameters:
+        values (ndarray) - raw column (as read from the CSV/Google sheet)
+        dtype (String) - 'int', 'number', 'float', 'str' or 'auto'
+
+    Returns Tuple - (converted ndarray, ndarray<Boolean> marking the cells that don't match the type)"""
+    blank = pd.isna(values)
+
+    # Columns pandas already read as numbers skip the text parsing
+    if values.dtype == object:
+        text = values.astype(str)
+        blank |= np.char.strip(text) == ''
+
+        if dtype == 'str':
+            return np.where(blank, values, text).astype(object), np.zeros(len(values), dtype=bool)
+
+        numbers = pd.to_numeric(np.where(blank, np.nan, values), errors='coerce').astype(np.float64)
+    elif dtype == 'str':
+        return np.where(blank, values, values.astype(str)).astype(object), np.zeros(len(values), dtype=bool)
+    else:
+        numbers = values.astype(np.float64)
+
+    bad = np.isnan(numbers) & ~blank
+    whole = (numbers % 1 == 0) | np.isnan(numbers)
+
+    if dtype == 'auto':
+        skip = bad | blank
+        values = np.array([v if s else (int(n) if w else n) for v, n, w, s in zip(values, numbers, whole, skip)],
+                          dtype=object)
+
+        return values, np.zeros(len(values), dtype=bool)
+
+    if dtype == 'int':
+        bad |= ~whole
+
+    if dtype in ('int', 'number') and whole.all() and not np.isnan(numbers).any():
+        numbers = numbers.astype(np.int64)
+
+    return numbers, bad
+
+
+# ------------------------------------------------------------------------------------------------------------
+def convert_sheet(df, name):
+    """Convert an economy sheet to its declared column types (SHEET_SCHEMAS)
+
+    Columns that aren't declared are dropped (spreadsheet errors such as #REF! in them are logged).  Declared columns
+    that are missing or hold a value of the wrong type raise a SchemaError.
+
+    Parameters:
+        df (DataFrame) - sheet as read from the CSV cache
+        name (String) - sheet name (Variants.DATA_*)
+
+    Returns DataFrame"""
+    schema = SHEET_SCHEMAS[name]
+
+    missing = [c for c in schema if c not in df.columns]
+    if missing:
+        raise SchemaError(name, [(1, c, None) for c in missing])
+
+    for column in df.columns:
+        if column not in schema:
+            values = df[column].dropna().astype(str)
+            errors = values[values.str.startswith('#')]
+            log_to_file(f'{name}: column {column!r} is not in the schema - dropped' +
+                        (f' ({len(errors)} spreadsheet error(s), first at row {errors.index[0] + 2}: '
+                         f'{errors.iloc[0]!r})' if len(errors) else ''))
+
+    converted = {}
+    cells = []
+    for column, dtype in schema.items():
+        values = df[column].to_numpy()
+        converted[column], bad = convert_column(values, dtype)
+        cells += [(i + 2, column, values[i]) for i in np.flatnonzero(bad)]
+
+    if cells:
+        raise SchemaError(name, cells)
+
+    return pd.DataFrame(converted, index=df.index)
+
+
+# ------------------------------------------------------------------------------------------------------------
+def convert_variants(variant_df):
+    """Convert the Variants tab (one row per parameter, one column per variant) to the declared parameter types
+    (VARIANT_SCHEMA)
+
+    Parameters:
+        variant_df (DataFrame) - Variants tab as read from the CSV cache
+
+    Returns DataFrame - same layout, values are Python ints/floats/strings"""
+    params = variant_df.iloc[:, 0]
+    dtypes = params.map(lambda p: VARIANT_SCHEMA.get(p, 'auto'))
+
+    df = variant_df.astype(object)
+    cells = []
+
+    for column in variant_df.columns[1:]:
+        for dtype in dtypes.unique():
+            rows = dtypes.index[dtypes == dtype]
+            raw = variant_df.loc[rows, column].to_numpy()
+            values, bad = convert_column(raw, dtype)
+
+            # Python scalars - 'number' is decided per parameter (int if whole), not per group of parameters
+            values = [v.item() if hasattr(v, 'item') else v for v in values]
+            if dtype == 'number':
+                values = [int(v) if v == v and v % 1 == 0 else v for v in values]
+
+            df.loc[rows, column] = values
+            cells += [(rows[i] + 2, f'{params[rows[i]]} (variant {column})', raw[i]) for i in np.flatnonzero(bad)]
+
+    if cells:
+        raise SchemaError('data_variants', cells)
+
+    return df
@@ -1,4 +1,7 @@
 import pandas as pd
+from .EventLog import EventLog
+from .SnapshotBuffer import SnapshotBuffer
+from .SnapshotPolicy import SnapshotPolicy
 from .StringConstants import *
 from .UtilityFunctions import *
 
@@ -9,6 +12,41 @@ class SimOutput:
     # -----------------------------------------------------------
     # STATIC PROPERTIES GO HERE (Shared by all player instances)
     
+    # ------------------------------------------------------------------------------------------------------------
+    # Fixed snapshot columns (save_snapshot() appends values in this order)
+    columns = ['day', 'session', 'time_real', 'time_inapp', 'time_sess', 'id', 'variant', 'seed', 'replication',
+               'player_level', 'player_xp', 'anim_total', 'anim_socketed', 'anim_earned', 'anim_ids',
+               'anim_sets_unlck', 'anim_sets_max', 'anim_sets_cmplt', 'anim_sets_max_cmplt', 'egg_id', 'egg_prog',
+               'egg_goal', 'soft_earned', 'soft_spent', 'soft_bal', 'secondary_earned', 'secondary_spent',
+               'secondary_bal', 'premium_earned', 'premium_spent', 'premium_bal', 'candy_count', 'a', 'actions',
+               'actions_buy', 'actions_merge', 'actions_feed', 'actions_eggs', 'actions_level', 'actions_crate',
+               'actions_spin_1', 'actions_spin_2', 'actions_swap', 'actions_donate']
+    
+    # Output type of each fixed column ('int' = int64, 'str' = string, 'list' = list of strings) - every other fixed
+    # column is an int.  Sparse columns: as_<Set_ID> is an int (count), a_<Animal_ID> a string (see get_columns)
+    dtypes = dict({c: 'int' for c in columns},
+                  variant='str', anim_ids='str', actions_buy='str', actions_merge='str', actions_feed='str',
+                  actions_eggs='str', actions_spin_1='str', actions_spin_2='str', actions_swap='str', a='list')
+    
+    # Comma-joined columns rebuilt from the EventLog (wide view only) - column -> Event type
+    event_columns = {
+        'anim_ids'      : Event.ANIMAL_EARNED,
+        'actions_buy'   : Event.BUY_CANDY,
+        'actions_merge' : Event.MERGE_CANDY,
+        'actions_feed'  : Event.FEED_ANIMAL,
+        'actions_eggs'  : Event.EGG_COMPLETE,
+        'actions_spin_1': Event.SPIN_WHEEL_1,
+        'actions_spin_2': Event.SPIN_WHEEL_2,
+        'actions_swap'  : Event.SWAP_ANIMAL,
+    }
+    
+    # Columns saved by save_snapshot() (same order)
+    snapshot_columns = sorted(set(columns) - set(event_columns), key=columns.index)
+    
+    # Long format event output (EventLog columns plus the player)
+    event_dtypes = dict({c: 'int' for c in ['id', 'variant', 'seed', 'replication'] + EventLog.columns},
+                        variant='str', event='str')
+    
     # ------------------------------------------------------------------------------------------------------------
     def __init__(self, game):
         """
@@ -17,11 +55,39 @@ class SimOutput:
         self.game = game
         self.player = None
         # self.results_df = pd.DataFrame()  # Hold player simulation output
-        self.results = []
+        self.results = SnapshotBuffer(self.snapshot_columns)
+        self.events = game.events
+        self.policy = None  # when rows are saved (SnapshotPolicy - set in init once the player settings are known)
+    
+    # ---------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def get_columns(cls, bundle, wide=True):
+        """Every output column for a variant with its type - the fixed columns, then as_<Set_ID> for every animal
+        set and a_<Animal_ID> for every animal in the economy
+
+        Parameters:
+            bundle (EconomyBundle) - compiled variant economy
+            wide (Boolean) - include the views rebuilt from the EventLog (comma-joined actions and a_<Animal_ID>)
+
+        Returns Dict - column name -> type ('int', 'str', 'list')"""
+        set_ids = {int(a[Column.SET_ID]) for a in bundle.data_animals.values()} | set(bundle.data_animal_sets)
+        animal_ids = sorted(int(animal_id) for animal_id in bundle.data_animals)
+        
+        columns = dict(cls.dtypes) if wide else {c: cls.dtypes[c] for c in cls.snapshot_columns}
+        columns.update({f'as_{i}': 'int' for i in range(1, max(set_ids, default=0) + 1)})
+        
+        if wide:
+            columns.update({f'a_{i}': 'str' for i in animal_ids})
+        
+        return columns
     
     # ---------------------------------------------------------------------------------------------------------------
     def init(self, player):
+        settings = self.game.settings
+        
         self.player = player
+        self.policy = SnapshotPolicy.create(settings[Setting.SNAPSHOT_POLICY], settings[Setting.SNAPSHOT_TIME],
+                                            settings[Setting.SIM_FPS])
     
     # ---------------------------------------------------------------------------------------------------------------
     def save_snapshot(self):
@@ -30,74 +96,100 @@ class SimOutput:
         # adviser_cards = sum([c[Param.COUNT] for k, c in self.player.advisers.items()]) if advisers > 0 else 0
         # adviser_max = max([c[Param.LEVEL] for k, c in self.player.advisers.items()]) if advisers > 0 else 0
         # adviser_unleveled = sum([c[Param.UNLEVELED] for k, c in self.player.advisers.items()]) if advisers > 0 else 0
+        game = self.game
+        player = self.player
+        track = player.track
+        
+        # Same order as SimOutput.columns
+        snapshot = (
+            int(game.day),                                    # day
+            int(game.session),                                # session
+            int(game.time_real),                              # time_real
+            int(game.time_inapp),                             # time_inapp
+            int(game.time_session),                           # time_sess
+            player.player_id,                                 # id
+            player.variant_label,                             # variant
+            game.rng.seed,                                    # seed
+            game.rng.replication,                             # replication
+            player.level,                                     # player_level
+            player.get_xp(),                                  # player_xp
+            len(player.animal_inventory),                     # anim_total
+            len(game.state[State.ANIMAL_SOCKETS]),            # anim_socketed
+            track[Track.ANIMALS_EARNED],                      # anim_earned
+            len(player.get_acquired_sets()),                  # anim_sets_unlck
+            player.get_max_set(),                             # anim_sets_max
+            len(player.get_completed_sets()),                 # anim_sets_cmplt
+            player.get_max_completed_set(),                   # anim_sets_max_cmplt
+            game.get_curr_egg_id(),                           # egg_id
+            game.get_curr_egg_progress(),                     # egg_prog
+            game.get_curr_egg_goal() or 0,                    # egg_goal
+            track[Track.SOFT_EARNED],                         # soft_earned
+            track[Track.SOFT_SPENT],                          # soft_spent
+            player.curr_soft[Currency.BALANCE],               # soft_bal
+            track[Track.SECONDARY_EARNED],                    # secondary_earned
+            track[Track.SECONDARY_SPENT],                     # secondary_spent
+            player.curr_secondary[Currency.BALANCE],          # secondary_bal
+            track[Track.PREMIUM_EARNED],                      # premium_earned
+            track[Track.PREMIUM_SPENT],                       # premium_spent
+            player.curr_premium[Currency.BALANCE],            # premium_bal
+            len(game.state[State.CANDY_SLOTS]),               # candy_count
+            game.state[State.ACTIONS].get_action_types(),     # a
+            track[Track.ACTION_COUNT],                        # actions
+            track[Track.PLAYER_LEVEL_UP],                     # actions_level
+            track[Track.FREE_CRATE],                          # actions_crate
+            track[Track.DONATE_ANIMAL],                       # actions_donate
+        )
+        
+        # Sparse columns to track completed Animal Sets (the animal inventory a_<Animal_ID> columns are rebuilt
+        # from the EventLog - see get_results_df)
+        sets_count = player.get_sets_count()
+        sets = [(f'as_{i}', sets_count[i]) for i in range(1, len(sets_count)) if sets_count[i] > 0]
         
-        snapshot = {
-            'day'                : int(self.game.day),
-            'session'            : int(self.game.session),
-            'time_real'          : int(self.game.time_real),
-            'time_inapp'         : int(self.game.time_inapp),
-            'time_sess'          : int(self.game.time_session),
-            'id'                 : self.player.player_id,
-            'variant'            : self.player.variant_label,
-            'player_level'       : self.player.level,
-            'player_xp'          : self.player.get_xp(),
-            'anim_total'         : len(self.player.animal_inventory),
-            'anim_socketed'      : len(self.game.state[State.ANIMAL_SOCKETS]),
-            'anim_earned'        : self.player.track[Track.ANIMALS_EARNED],
-            'anim_ids'           : self.player.track[Track.ANIMAL_IDS],
-            'anim_sets_unlck'    : len(self.player.get_acquired_sets()),
-            'anim_sets_max'      : self.player.get_max_set(),
-            'anim_sets_cmplt'    : len(self.player.get_completed_sets()),
-            'anim_sets_max_cmplt': self.player.get_max_completed_set(),
-            'egg_id'             : self.game.get_curr_egg_id(),
-            'egg_prog'           : self.game.get_curr_egg_progress(),
-            'egg_goal'           : self.game.get_curr_egg_goal() or 0,
-            'soft_earned'        : self.player.track[Track.SOFT_EARNED],
-            'soft_spent'         : self.player.track[Track.SOFT_SPENT],
-            'soft_bal'           : self.player.curr_soft[Currency.BALANCE],
-            'secondary_earned'   : self.player.track[Track.SECONDARY_EARNED],
-            'secondary_spent'    : self.player.track[Track.SECONDARY_SPENT],
-            'secondary_bal'      : self.player.curr_secondary[Currency.BALANCE],
-            'premium_earned'     : self.player.track[Track.PREMIUM_EARNED],
-            'premium_spent'      : self.player.track[Track.PREMIUM_SPENT],
-            'premium_bal'        : self.player.curr_premium[Currency.BALANCE],
-            'candy_count'        : len(self.game.state[State.CANDY_SLOTS]),
-            'a'                  : [a[Params.ACTION] for a in self.game.state[State.ACTIONS]],
-            'actions'            : self.player.track[Track.ACTION_COUNT],
-            'actions_buy'        : self.player.track[Track.BUY_CANDY],
-            'actions_merge'      : self.player.track[Track.MERGE_CANDY],
-            'actions_feed'       : self.player.track[Track.FEED_ANIMAL],
-            'actions_eggs'       : self.player.track[Track.EGG_COMPLETE],
-            'actions_level'      : self.player.track[Track.PLAYER_LEVEL_UP],
-            'actions_crate'      : self.player.track[Track.FREE_CRATE],
-            'actions_spin_1'     : self.player.track[Track.SPIN_WHEEL_1],
-            'actions_spin_2'     : self.player.track[Track.SPIN_WHEEL_2],
-            'actions_swap'       : self.player.track[Track.SWAP_ANIMAL],
-            'actions_donate'     : self.player.track[Track.DONATE_ANIMAL],
-        }
-        
-        # Loop and add columns to track animal inventory
-        for key, a in self.player.animal_inventory.items():
-            active = False
-            
-            if a[Animal.STATUS] == AnimalState.ACTIVE or a[Animal.STATUS] == AnimalState.INVENTORIED:
-                active = 'S' if a[Animal.STATUS] == AnimalState.ACTIVE else 'I'
-            
-            if active:
-                if f'a_{a[Animal.TYPE_ID]}' in snapshot:
-                    snapshot[f'a_{a[Animal.TYPE_ID]}'] += f'({key},{a[Animal.LEVEL]},{active}),'
-                else:
-                    snapshot[f'a_{a[Animal.TYPE_ID]}'] = f'({key},{a[Animal.LEVEL]},{active}),'
-        
-        # Loop and add columns to track completed Animal Sets
-        sets_count = self.player.get_sets_count()
-        for i in range(1, 24):
-            if sets_count[i] > 0:
-                snapshot[f'as_{i}'] = sets_count[i]
-        
-        self.results += [snapshot]
-        self.player.reset_reporting_counters()
+        self.results.append(snapshot, sets)
+        self.events.next_snapshot()
+        player.reset_reporting_counters()
     
+    # ---------------------------------------------------------------------------------------------------------------
+    def get_results_df(self, wide=True):
+        """Snapshot rows
+        
+        Parameters:
+            wide (Boolean) - add the views rebuilt from the EventLog: the comma-joined anim_ids/actions_* columns and
+                             the a_<Animal_ID> inventory columns ("(id,level,S|I),...", sorted by animal id)
+        
+        Returns DataFrame"""
+        df = self.results.to_df()
+        
+        if not wide or len(df) == 0:
+            return df
+        
+        rows = len(df)
+        for column, event in self.event_columns.items():
+            df[column] = self.events.get_strings(event, rows)
+        
+        animals = self.events.get_animal_columns(rows)
+        animals = {c: animals[c] for c in sorted(animals, key=lambda c: int(c[2:]))}
+        
+        return pd.concat([df[self.columns + [c for c in df.columns if c not in self.columns]],
+                          pd.DataFrame(animals, index=df.index)], axis=1)
+    
+    # ---------------------------------------------------------------------------------------------------------------
     @property
     def results_df(self):
-        return pd.DataFrame(self.results)
+        return self.get_results_df()
+    
+    # ---------------------------------------------------------------------------------------------------------------
+    @property
+    def events_df(self):
+        """Long format event log of the player (one row per event - see EventLog)
+        
+        Returns DataFrame"""
+        df = self.events.to_df()
+        
+        # Same player columns as the snapshot rows
+        df.insert(0, 'id', self.player.player_id)
+        df.insert(1, 'variant', self.player.variant_label)
+        df.insert(2, 'seed', self.game.rng.seed)
+        df.insert(3, 'replication', self.game.rng.replication)
+        
+        return df
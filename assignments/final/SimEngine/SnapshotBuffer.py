@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+
+class SnapshotBuffer:
+    """Columnar storage for simulation snapshots
+
+    Fixed columns (known up front) are kept in typed, growable NumPy arrays - one array per column, capacity doubled
+    when full - so a snapshot costs a few array writes instead of a Python dict per row.  The column type is taken
+    from the first value written (int -> int64, float -> float64, bool -> bool, anything else -> object) and widened
+    if a later value doesn't fit (int -> float64, anything else -> object).
+
+    Sparse columns (the a_* animal and as_* animal set columns only exist for some rows) are kept as side tables of
+    runs per column name - [first row, end row, value] for consecutive rows with the same value (most animals don't
+    change between snapshots) - and are filled with NaN elsewhere when the frame is built, the same result
+    pd.DataFrame(list of dicts) gives."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all buffers)
+    INITIAL_CAPACITY = 256
+
+    # Python/NumPy types each column type takes without widening (object columns take anything)
+    ACCEPTS = {
+        np.dtype(np.bool_)  : {bool, np.bool_},
+        np.dtype(np.int64)  : {int, np.int64, np.int32},
+        np.dtype(np.float64): {float, np.float64, np.float32, int, np.int64, np.int32},
+    }
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, columns):
+        """
+        SnapshotBuffer Constructor
+
+        columns (List<String>)     - fixed column names (values are passed to append() in this order)
+        """
+        self.columns = list(columns)
+        self.arrays = [None] * len(self.columns)  # column index -> ndarray (created on first append)
+        self.accepts = [set()] * len(self.columns)  # column index -> types stored as is (None = any type)
+        self.sparse = {}  # sparse column name -> [[first row, end row, value], ...] - first appearance order
+        self.rows = 0
+        self.capacity = 0
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return self.rows
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __getstate__(self):
+        """Pickled state (see Checkpoint) - only the rows written, not the spare capacity"""
+        state = self.__dict__.copy()
+        state['arrays'] = [None if array is None else array[:self.rows] for array in self.arrays]
+        state['capacity'] = self.rows
+
+        return state
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_dtype(value):
+        """Storage type for a Python value"""
+        if isinstance(value, (bool, np.bool_)):
+            return np.bool_
+        elif isinstance(value, (int, np.integer)):
+            return np.int64
+        elif isinstance(value, (float, np.floating)):
+            return np.float64
+
+        return object
+
+    # ------------------------------------------------------------------------------------------------------------
+    def grow(self):
+        """Double the capacity of every fixed column"""
+        self.capacity = max(self.capacity * 2, self.INITIAL_CAPACITY)
+
+        for c, array in enumerate(self.arrays):
+            if array is not None:
+                grown = np.empty(self.capacity, dtype=array.dtype)
+                grown[:self.rows] = array[:self.rows]
+                self.arrays[c] = grown
+
+    # ------------------------------------------------------------------------------------------------------------
+    def widen(self, c, value):
+        """Change column c to a type that can hold value (and everything already stored)"""
+        array = self.arrays[c]
+        dtype = self.get_dtype(value)
+
+        if array.dtype == np.int64 and dtype == np.float64:
+            widened = array.astype(np.float64)
+        else:
+            widened = np.empty(self.capacity, dtype=object)
+            widened[:self.rows] = array[:self.rows].tolist()
+
+        self.arrays[c] = widened
+        self.accepts[c] = self.ACCEPTS.get(widened.dtype)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def append(self, values, sparse=None):
+        """Add one snapshot row
+
+        Parameters:
+            values (Sequence) - one value per fixed column (same order as columns)
+            sparse (Iterable) - (column name, value) pairs for the sparse columns set in this row"""
+        if self.rows == self.capacity:
+            self.grow()
+
+        row = self.rows
+
+        for c, value in enumerate(values):
+            accepts = self.accepts[c]
+
+            if accepts is not None and type(value) not in accepts:
+                if self.arrays[c] is None:
+                    self.arrays[c] = np.empty(self.capacity, dtype=self.get_dtype(value))
+                    self.accepts[c] = self.ACCEPTS.get(self.arrays[c].dtype)
+                else:
+                    self.widen(c, value)
+
+            try:
+                self.arrays[c][row] = value
+            except OverflowError:
+                # Python ints too big for int64
+                self.widen(c, None)
+                self.arrays[c][row] = value
+
+        if sparse:
+            for name, value in sparse:
+                runs = self.sparse.get(name)
+
+                if runs is None:
+                    self.sparse[name] = [[row, row + 1, value]]
+                elif runs[-1][1] == row and runs[-1][2] == value:
+                    runs[-1][1] = row + 1
+                else:
+                    runs.append([row, row + 1, value])
+
+        self.rows += 1
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_column(self, name):
+        """Values of one column (fixed or sparse - NaN where a sparse column is not set)
+
+        Returns ndarray"""
+        if name in self.columns:
+            array = self.arrays[self.columns.index(name)]
+            return array[:self.rows] if array is not None else np.empty(0)
+
+        runs = self.sparse[name]
+
+        if all(isinstance(run[2], (int, float, np.integer, np.floating)) for run in runs):
+            column = np.full(self.rows, np.nan)
+        else:
+            column = np.full(self.rows, np.nan, dtype=object)
+
+        for first, end, value in runs:
+            column[first:end] = value
+
+        return column
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_dict(self):
+        """Every column (fixed first, then sparse in order of first appearance)
+
+        Returns Dict - column name -> ndarray"""
+        return {name: self.get_column(name) for name in self.columns + list(self.sparse)}
+
+    # ------------------------------------------------------------------------------------------------------------
+    def to_df(self):
+        """Build a DataFrame from the buffer
+
+        Returns DataFrame"""
+        if self.rows == 0:
+            return pd.DataFrame()
+
+        return pd.DataFrame(self.to_dict())
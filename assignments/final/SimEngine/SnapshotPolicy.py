@@ -0,0 +1,150 @@
+from .StringConstants import *
+
+
+class SnapshotPolicy:
+    """When does a player's state get written out as a snapshot row?
+
+    The Game asks the policy before (on_frame_start) and after (on_frame) every processed frame and at every session
+    end (on_session_end), and saves one more row when the simulation ends if SAVE_AT_END is set.  Counters in
+    Player.track (earned/spent currency, actions, animals earned, ...) and the EventLog intervals are only reset when
+    a row is saved, so every row sums everything since the row before it, whatever the policy - gauges (balances,
+    level, inventory) are the value at the time of the row.  A coarser policy gives fewer rows with the same totals.
+
+    Picked per variant with sim_snapshot_policy on the Variants tab (see create):
+        'tick'              - every sim_snapshot_time seconds and at every session end (default)
+        'session'           - at every session end
+        'day'               - at the first session end of each new day
+        'change'            - after a frame where the player levelled up or earned an animal (set completions
+                              only happen when an animal is earned)
+        'rollup,<seconds>'  - one row per <seconds> seconds of simulation time the player was online in (saved
+                              before the first frame of the next period runs, no session end rows)
+
+    This base class is the 'tick' policy."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all policies)
+    SAVE_AT_END = False  # save a last row for whatever happened since the last one when the simulation ends
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, period=1, fps=1):
+        """
+        SnapshotPolicy Constructor
+
+        period (Int)               - seconds between interval snapshots
+        fps (Int)                  - simulation frames per second
+        """
+        self.period_frames = int(period) * int(fps)
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def create(spec, period, fps):
+        """Build the policy for a sim_snapshot_policy value
+
+        Parameters:
+            spec (String) - policy ('tick', 'session', 'day', 'change', 'rollup,<seconds>')
+            period (Int) - sim_snapshot_time (seconds between 'tick' snapshots)
+            fps (Int) - simulation frames per second
+
+        Returns SnapshotPolicy"""
+        parts = str(spec).replace(' ', '').split(',')
+        name = parts[0].lower()
+
+        if name == Snapshot.TICK:
+            return SnapshotPolicy(period, fps)
+        elif name == Snapshot.SESSION:
+            return SessionSnapshotPolicy()
+        elif name == Snapshot.DAY:
+            return DaySnapshotPolicy()
+        elif name == Snapshot.CHANGE:
+            return ChangeSnapshotPolicy()
+        elif name == Snapshot.ROLLUP and len(parts) == 2:
+            return RollupSnapshotPolicy(int(parts[1]), fps)
+
+        raise ValueError(f'Unknown snapshot policy {spec!r}')
+
+    # ------------------------------------------------------------------------------------------------------------
+    def on_frame_start(self, game):
+        """Save a row before this frame (game.frame) is processed?
+
+        Returns Boolean"""
+        return False
+
+    # ------------------------------------------------------------------------------------------------------------
+    def on_frame(self, game):
+        """Save a row after this frame?
+
+        Returns Boolean"""
+        return game.frame % self.period_frames == 0
+
+    # ------------------------------------------------------------------------------------------------------------
+    def on_session_end(self, game):
+        """Save a row now a session has ended? (game.day and game.session are already the next session's)
+
+        Returns Boolean"""
+        return True
+
+
+# ------------------------------------------------------------------------------------------------------------
+class SessionSnapshotPolicy(SnapshotPolicy):
+    """One row per session"""
+    SAVE_AT_END = True
+
+    def on_frame(self, game):
+        return False
+
+
+# ------------------------------------------------------------------------------------------------------------
+class DaySnapshotPolicy(SessionSnapshotPolicy):
+    """One row per simulated day (saved when the first session of a new day ends)"""
+
+    def __init__(self):
+        super().__init__()
+        self.day = 1
+
+    def on_session_end(self, game):
+        if game.day == self.day:
+            return False
+
+        self.day = game.day
+
+        return True
+
+
+# ------------------------------------------------------------------------------------------------------------
+class ChangeSnapshotPolicy(SessionSnapshotPolicy):
+    """A row after every frame where the player levelled up or earned an animal"""
+
+    def on_frame(self, game):
+        track = game.player.track
+
+        return track[Track.PLAYER_LEVEL_UP] > 0 or track[Track.ANIMALS_EARNED] > 0
+
+    def on_session_end(self, game):
+        return False
+
+
+# ------------------------------------------------------------------------------------------------------------
+class RollupSnapshotPolicy(SnapshotPolicy):
+    """A row for every period the player was online in (the 'tick' check only fires if the player happens to be
+    online on the exact frame), no session end rows"""
+    SAVE_AT_END = True
+
+    def __init__(self, period, fps):
+        super().__init__(period, fps)
+        self.bucket = 1  # period of the frames since the last row
+
+    def on_frame_start(self, game):
+        bucket = -(-game.frame // self.period_frames)
+
+        if bucket == self.bucket:
+            return False
+
+        self.bucket = bucket
+
+        return True
+
+    def on_frame(self, game):
+        return False
+
+    def on_session_end(self, game):
+        return False
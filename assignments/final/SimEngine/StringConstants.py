@@ -129,6 +129,49 @@ class EggNames:
     RARITY_5_5 = 'Rarity_5_5'
 
 
+# ------------------------------------------------------------------------------------------------------------
+class Event:
+    """Event types recorded in the EventLog (see EventLog for what id_1/id_2/level/amount hold for each)"""
+    ANIMAL_EARNED = 1
+    ANIMAL_STATE = 2
+    BUY_CANDY = 3
+    DONATE_ANIMAL = 4
+    EGG_COMPLETE = 5
+    FEED_ANIMAL = 6
+    FREE_CRATE = 7
+    MERGE_CANDY = 8
+    PLAYER_LEVEL_UP = 9
+    SPIN_WHEEL_1 = 10
+    SPIN_WHEEL_2 = 11
+    SWAP_ANIMAL = 12
+
+
+# ------------------------------------------------------------------------------------------------------------
+class Log:
+    # Game.log categories (sim_log_categories picks which ones are written)
+    ALL = 'all'
+    BUY = 'buy'
+    CRATE = 'crate'
+    DONATE = 'donate'
+    EGGS = 'eggs'
+    FEED = 'feed'
+    MERGE = 'merge'
+    SESSION = 'session'
+    SPIN = 'spin'
+    SWAP = 'swap'
+    
+    CATEGORIES = [BUY, CRATE, DONATE, EGGS, FEED, MERGE, SESSION, SPIN, SWAP]
+
+
+# ------------------------------------------------------------------------------------------------------------
+class LogLevel:
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+    OFF = 100
+
+
 # ------------------------------------------------------------------------------------------------------------
 class Params:
     ACTION = 'action'
@@ -149,12 +192,50 @@ class Params:
     TIMER = 'timer'
 
 
+# ------------------------------------------------------------------------------------------------------------
+class Phase:
+    # Frame loop phases timed by PhaseProfiler
+    BUY_CANDY = 'buy_candy'
+    CHOOSE_ACTION = 'choose_action'
+    EGG_PROGRESS = 'egg_progress'
+    FEED_ANIMAL = 'feed_animal'
+    FRAME = 'frame'
+    MERGE_CANDY = 'merge_candy'
+    OFFLINE = 'offline'
+    SAVE_SNAPSHOT = 'save_snapshot'
+    SPIN_WHEEL = 'spin_wheel'
+    SWAP_ANIMALS = 'swap_animals'
+
+
 # ------------------------------------------------------------------------------------------------------------
 class RANDOM:
     INTEGER = 1
     FLOAT = 2
 
 
+# ------------------------------------------------------------------------------------------------------------
+class Snapshot:
+    """Snapshot policies (see SnapshotPolicy)"""
+    CHANGE = 'change'
+    DAY = 'day'
+    ROLLUP = 'rollup'
+    SESSION = 'session'
+    TICK = 'tick'
+
+
+# ------------------------------------------------------------------------------------------------------------
+class Stream:
+    """Named random substreams - one per stochastic decision point (see RandomSource.stream)"""
+    CANDY = 'candy'
+    EGG = 'egg'
+    FEED = 'feed'
+    FREE_CRATE = 'free_crate'
+    REACTION = 'reaction'
+    SESSION = 'session'
+    STARTING_ANIMAL = 'starting_animal'
+    VIDEO = 'video'
+
+
 # ------------------------------------------------------------------------------------------------------------
 class Setting:
     ANIMAL_INVENTORY_CAP = 'animal_inventory_cap'
@@ -171,6 +252,7 @@ class Setting:
     RTP_TIME_MIN = 'rtp_time_min'
     SIM_FPS = 'sim_fps'
     SIM_MODE = 'sim_mode'
+    SNAPSHOT_POLICY = 'snapshot_policy'
     SNAPSHOT_TIME = 'snapshot_time'
     STARTING_ANIMALS = 'starting_animals'
     VIDEO_LIMIT = 'video_limit'
@@ -209,14 +291,9 @@ class State:
 # ------------------------------------------------------------------------------------------------------------
 class Track:
     ACTION_COUNT = 'action_count'
-    ANIMAL_IDS = 'animal_ids'
     ANIMALS_EARNED = 'animals_earned'
-    BUY_CANDY = 'buy_candy'
     DONATE_ANIMAL = 'donate_animal'
-    EGG_COMPLETE = 'egg_complete'
-    FEED_ANIMAL = 'feed_animal'
     FREE_CRATE = 'free_crate'
-    MERGE_CANDY = 'merge_candy'
     PLAYER_LEVEL_UP = 'player_level_up'
     PREMIUM_EARNED = 'premium_earned'
     PREMIUM_SPENT = 'premium_spent'
@@ -224,9 +301,6 @@ class Track:
     SECONDARY_SPENT = 'secondary_spent'
     SOFT_EARNED = 'soft_earned'
     SOFT_SPENT = 'soft_spent'
-    SPIN_WHEEL_1 = 'spin_wheel_1'
-    SPIN_WHEEL_2 = 'spin_wheel_2'
-    SWAP_ANIMAL = 'swap_animal'
     VIDEO_WATCHED = 'video_watched'
 
 
@@ -237,7 +311,11 @@ class Variants:
     SIM_CORES = 'sim_cores'
     SIM_LENGTH = 'sim_length'
     SIM_FPS = 'sim_fps'
+    SIM_LOG_CATEGORIES = 'sim_log_categories'
+    SIM_LOG_LEVEL = 'sim_log_level'
     SIM_MODE = 'sim_mode'
+    SIM_PROFILE = 'sim_profile'
+    SIM_SNAPSHOT_POLICY = 'sim_snapshot_policy'
     SIM_SNAPSHOT_TIME = 'sim_snapshot_time'
     
     SESS_PER_DAY = 'sess_per_day'
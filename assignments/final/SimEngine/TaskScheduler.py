@@ -0,0 +1,288 @@
+import multiprocessing as mp
+import queue
+import time
+import traceback
+
+from .UtilityFunctions import log_to_file
+
+
+class TaskScheduler:
+    """Run tasks (players) on a pool of worker processes
+
+    Every worker has its own inbox and is handed chunks of tasks by the parent - the parent is the only one that
+    decides who runs what, so no worker ever races another for the last task (no empty()/get() guessing).  Tasks are
+    handed out longest first (by their cost, e.g. sim_length) and a chunk holds about remaining cost / (chunk_factor
+    * processors) worth of tasks (at most max_chunk), so chunks start big and shrink to single tasks towards the end
+    and long and short variants finish together.
+
+    Workers report every task on one result channel - done (with the task's result) or failed (with the
+    traceback) - and ask for the next chunk when they finish one (see serve).  A failed task is handed out again
+    with the same task (same seed) up to max_retries times, then recorded in failed.  A worker can be recycled
+    (exits cleanly and a fresh process takes its place) after max_tasks tasks to keep memory bounded.
+
+    A worker's results only count once it has exited cleanly (its ResultWriter closed its part files).  If a worker
+    process dies (crash, killed, out of memory) the task it was running counts as a failed try, every task it had
+    finished is handed out again (its part files are incomplete - on_crash(worker_id) is called to remove them) and
+    a new worker takes its place.
+
+    Every process gets a new worker id (part file number), so recycled and replacement workers never share files."""
+
+    # -----------------------------------------------------------
+    # STATIC PROPERTIES GO HERE (Shared by all schedulers)
+
+    # Result channel messages - (kind, worker id, task id, payload)
+    DONE = 'done'  # payload: the task's result
+    FAILED = 'failed'  # payload: traceback text
+    READY = 'ready'  # chunk finished, send the next one
+    EXIT = 'exit'  # worker finished cleanly, payload: worker stats
+
+    POLL = 1  # seconds between checks for dead workers while waiting for messages
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, target, args=(), processors=1, max_retries=2, max_tasks=0, chunk_factor=2, max_chunk=16,
+                 on_crash=None, on_exit=None, first_worker=0):
+        """
+        TaskScheduler Constructor
+
+        target (Function)          - worker process target(worker_id, inbox, results, *args) - runs serve()
+        args (Tuple)               - extra target arguments
+        processors (Int)           - concurrent worker processes
+        max_retries (Int)          - times a failed task is handed out again
+        max_tasks (Int)            - recycle a worker after this many tasks (0 = never)
+        chunk_factor (Float)       - chunks are remaining cost / (chunk_factor * processors)
+        max_chunk (Int)            - most tasks in a chunk
+        on_crash (Function)        - on_crash(worker_id), called in the parent when a worker process dies
+        on_exit (Function)         - on_exit(worker_id, task ids), called in the parent when a worker exits cleanly
+        first_worker (Int)         - id of the first worker (ids already used by an earlier, interrupted run)
+        """
+        self.target = target
+        self.args = args
+        self.processors = max(int(processors), 1)
+        self.max_retries = max_retries
+        self.max_tasks = max_tasks
+        self.chunk_factor = chunk_factor
+        self.max_chunk = max(int(max_chunk), 1)
+        self.on_crash = on_crash
+        self.on_exit = on_exit
+
+        self.tasks = {}  # task id -> (task, cost)
+        self.pending = []  # task ids not handed out yet, longest first
+        self.tries = {}  # task id -> failed tries
+
+        self.workers = {}  # worker id -> [process, inbox, tasks handed out (in order), done {task id: result}]
+        self.next_worker = first_worker
+
+        self.results = {}  # task id -> result (of workers that exited cleanly)
+        self.failed = {}  # task id -> traceback of the last try (after max_retries)
+        self.worker_stats = []  # stats sent by each worker that exited cleanly
+        self.crashes = 0
+        self.start = 0.0  # perf_counter when run() started
+        self.drained = 0.0  # seconds into the run when the last task was handed out
+
+    # ------------------------------------------------------------------------------------------------------------
+    def add_task(self, task_id, task, cost=1):
+        """Queue a task
+
+        Parameters:
+            task_id (Int) - unique id (key of results/failed)
+            task (Tuple) - what the worker gets (must pickle)
+            cost (Float) - expected run time, any unit (longest first)"""
+        self.tasks[task_id] = (task, cost)
+        self.tries[task_id] = 0
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_chunk(self, limit):
+        """Take the next chunk off the pending tasks
+
+        Parameters:
+            limit (Int) - most tasks in the chunk
+
+        Returns List<Tuple> - (task id, task)"""
+        remaining = sum(self.tasks[task_id][1] for task_id in self.pending)
+        target = remaining / (self.chunk_factor * self.processors)
+
+        chunk, cost = [], 0
+        while self.pending and len(chunk) < limit and (not chunk or cost < target):
+            task_id = self.pending.pop(0)
+            chunk.append((task_id, self.tasks[task_id][0]))
+            cost += self.tasks[task_id][1]
+
+        return chunk
+
+    # ------------------------------------------------------------------------------------------------------------
+    def send_chunk(self, worker_id):
+        """Hand a worker its next chunk - or tell it to exit (no tasks left or due for recycling)"""
+        process, inbox, handed, _ = self.workers[worker_id]
+
+        if not self.pending or (self.max_tasks and len(handed) >= self.max_tasks):
+            inbox.put(None)
+            return
+
+        limit = min(self.max_chunk, self.max_tasks - len(handed)) if self.max_tasks else self.max_chunk
+        chunk = self.get_chunk(limit)
+        handed.extend(task_id for task_id, _ in chunk)
+        inbox.put(chunk)
+
+        if not self.pending:
+            self.drained = time.perf_counter() - self.start
+
+    # ------------------------------------------------------------------------------------------------------------
+    def start_worker(self, results):
+        """Start a worker process and hand it its first chunk"""
+        worker_id = self.next_worker
+        self.next_worker += 1
+
+        inbox = mp.Queue()
+        process = mp.Process(target=self.target, args=(worker_id, inbox, results) + tuple(self.args))
+        self.workers[worker_id] = [process, inbox, [], {}]
+
+        process.start()
+        self.send_chunk(worker_id)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def requeue(self, task_ids):
+        """Put tasks back in the pending list (longest first)"""
+        self.pending.extend(task_ids)
+        self.pending.sort(key=lambda task_id: -self.tasks[task_id][1])
+
+    # ------------------------------------------------------------------------------------------------------------
+    def fail(self, task_id, error):
+        """Count a failed try - hand the task out again or give up on it
+
+        Returns Boolean - will the task be tried again"""
+        self.tries[task_id] += 1
+
+        if self.tries[task_id] > self.max_retries:
+            self.failed[task_id] = error
+            log_to_file(f'Task {task_id} failed {self.tries[task_id]} times, giving up:\n{error}')
+            return False
+
+        log_to_file(f'Task {task_id} failed (try {self.tries[task_id]}), retrying:\n{error}')
+        return True
+
+    # ------------------------------------------------------------------------------------------------------------
+    def handle(self, message):
+        """Act on one result channel message"""
+        kind, worker_id, task_id, payload = message
+
+        if worker_id not in self.workers:  # late message from a worker that crashed
+            return
+
+        process, inbox, handed, done = self.workers[worker_id]
+
+        if kind == self.DONE:
+            done[task_id] = payload
+        elif kind == self.FAILED:
+            handed.remove(task_id)
+
+            if self.fail(task_id, payload):
+                self.requeue([task_id])
+        elif kind == self.READY:
+            self.send_chunk(worker_id)
+        elif kind == self.EXIT:
+            self.results.update(done)
+            self.worker_stats.append(payload)
+
+            process.join()
+            del self.workers[worker_id]
+
+            if self.on_exit is not None:
+                self.on_exit(worker_id, list(done))
+
+    # ------------------------------------------------------------------------------------------------------------
+    def crashed(self, worker_id):
+        """A worker process died - re-run what it had done, retry what it was running"""
+        process, inbox, handed, done = self.workers.pop(worker_id)
+        self.crashes += 1
+
+        running = [task_id for task_id in handed if task_id not in done]
+        log_to_file(f'Worker {worker_id} died (exit code {process.exitcode}) - re-running its {len(handed)} tasks')
+
+        # Tasks run in chunk order - the first one not done was running when the worker died
+        if running and not self.fail(running[0], f'worker {worker_id} died (exit code {process.exitcode})'):
+            handed.remove(running[0])
+
+        self.requeue(handed)
+
+        if self.on_crash is not None:
+            self.on_crash(worker_id)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def run(self):
+        """Run every task (blocks until all are done or have failed max_retries times)
+
+        Returns Dict - task id -> result (see failed for the tasks that never finished)"""
+        results = mp.Queue()
+        self.start = time.perf_counter()
+        self.requeue(self.tasks)
+
+        while self.pending or self.workers:
+            # Keep the pool full while there is work (replaces recycled and crashed workers)
+            while self.pending and len(self.workers) < self.processors:
+                self.start_worker(results)
+
+            try:
+                self.handle(results.get(timeout=self.POLL))
+            except queue.Empty:
+                # Processes that ended before the channel was drained - a clean exit always sent EXIT first
+                ended = [worker_id for worker_id, (process, _, _, _) in self.workers.items()
+                         if process.exitcode is not None]
+
+                try:
+                    while True:
+                        self.handle(results.get_nowait())
+                except queue.Empty:
+                    pass
+
+                for worker_id in ended:
+                    if worker_id in self.workers:
+                        self.crashed(worker_id)
+
+        return self.results
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def serve(worker_id, inbox, results, run_task, stats=None):
+        """Worker side - run chunks from the inbox until told to exit
+
+        Each task's result (or traceback) is reported as soon as it finishes.  The caller sends exit() once it has
+        cleaned up (closed its files).
+
+        Parameters:
+            worker_id (Int) - this worker's id
+            inbox (Queue) - chunks from the scheduler
+            results (Queue) - result channel
+            run_task (Function) - run_task(task) -> result (must pickle, keep it small)
+            stats (Dict) - optional, adds up chunks and queue_s (seconds spent waiting for chunks)"""
+        stats = {} if stats is None else stats
+        stats.setdefault('chunks', 0)
+        stats.setdefault('queue_s', 0.0)
+
+        while True:
+            start = time.perf_counter()
+            chunk = inbox.get()
+            stats['queue_s'] += time.perf_counter() - start
+
+            if chunk is None:
+                break
+
+            stats['chunks'] += 1
+
+            for task_id, task in chunk:
+                try:
+                    results.put((TaskScheduler.DONE, worker_id, task_id, run_task(task)))
+                except Exception:
+                    results.put((TaskScheduler.FAILED, worker_id, task_id, traceback.format_exc()))
+
+            results.put((TaskScheduler.READY, worker_id, None, None))
+
+    # ------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def exit(worker_id, results, stats=None):
+        """Worker side - tell the scheduler this worker finished cleanly (its results now count)
+
+        Parameters:
+            worker_id (Int) - this worker's id
+            results (Queue) - result channel
+            stats (Dict) - anything the worker wants to report (see worker_stats)"""
+        results.put((TaskScheduler.EXIT, worker_id, None, stats))
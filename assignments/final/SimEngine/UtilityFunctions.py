@@ -1,23 +1,34 @@
 import os
 import glob
+import shutil
 import numpy as np
 from functools import lru_cache
 import pandas as pd
 import datetime
 import math
+import queue
 from sympy import symbols, integrate
 
+from SimEngine.LogSink import LogSink
+from SimEngine.RandomSource import RandomSource
 from SimEngine.StringConstants import *
 
-from scipy.stats import truncnorm
-
 # --- make sure we have a ./logs folder ---
 if not os.path.exists('./logs'):
     os.mkdir('./logs')
 
 log_ts = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-log_file = open(f"logs/sim_{log_ts}.log", "w")
-log_data = ''
+log_path = f"logs/sim_{log_ts}.log"  # this process's own log file - only used when no LogSink is attached
+log_data = []  # records not sent yet - (worker, variant, player, message)
+log_size = 0  # characters in log_data
+log_sink = None  # LogSink queue (see attach_log_sink)
+log_context = {'worker': 'main', 'variant': '', 'player': ''}  # tags added to every record
+log_dropped = 0  # records dropped because the LogSink queue was full
+
+LOG_BUFFER_SIZE = 100000  # characters buffered before flush_log is called
+
+# Fallback random source for callers that don't pass their own (each Game owns one)
+random_source = RandomSource()
 
 
 # ------------------------------------------------------------------------------------------------------------
@@ -28,9 +39,10 @@ def pad_zeros(n, size):
 
 
 # ------------------------------------------------------------------------------------------------------------
-def get_random_normal(min_value=0, max_value=10, sd=1):
+def get_random_normal(min_value=0, max_value=10, sd=1, rng=None):
     """Get a normal distribution between a min and max.  We will approximate a normal using a Beta
     Distribution"""
+    rng = rng or random_source
     
     # IF min and max are the same, just return that value
     if min_value == max_value:
@@ -49,16 +61,16 @@ def get_random_normal(min_value=0, max_value=10, sd=1):
     if a == 0 and b == 0:
         return 0
     
-    x = truncnorm.rvs(a, b, loc=mean_value, scale=sd, size=1)
-    
-    return x[0]
+    return rng.truncnorm(a, b, loc=mean_value, scale=sd)
 
 
 # ------------------------------------------------------------------------------------------------------------
-def get_random_uniform(min_value=None, max_value=None, random_type=None):
+def get_random_uniform(min_value=None, max_value=None, random_type=None, rng=None):
     """Get a uniform distribution between a min and max"""
+    rng = rng or random_source
+    
     if min_value is None and max_value is None and random_type is None:
-        return np.random.random()
+        return rng.random()
     
     elif min_value is None and max_value is None:
         return False
@@ -76,21 +88,23 @@ def get_random_uniform(min_value=None, max_value=None, random_type=None):
         max_value = temp
 
     if random_type == RANDOM.INTEGER:
-        random_value = np.random.randint(min_value, max_value)
+        random_value = rng.integers(min_value, max_value)
     
     elif random_type == RANDOM.FLOAT:
-        random_value = np.random.random() * (max_value - min_value) + min_value
+        random_value = rng.uniform(min_value, max_value)
     
     else:
-        random_value = np.random.random() * (max_value - min_value) + min_value
+        random_value = rng.uniform(min_value, max_value)
 
     return random_value
 
 
 # ------------------------------------------------------------------------------------------------------------
-def get_random_boolean():
+def get_random_boolean(rng=None):
     """Get a random boolean: True of False"""
-    return bool(np.random.randint(0, 1))
+    rng = rng or random_source
+    
+    return bool(rng.integers(0, 1))
 
 
 # ------------------------------------------------------------------------------------------------------------
@@ -117,24 +131,32 @@ def convert_numbers(x):
 # ------------------------------------------------------------------------------------------------------------
 def purge_disk_cache(folder):
     """
-    Method to clear all files from our cache folder
+    Method to clear all files (and result dataset folders) from our cache folder
     """
     files = glob.glob(folder)
     
     for f in files:
-        os.remove(f)
+        if os.path.isdir(f):
+            shutil.rmtree(f)
+        else:
+            os.remove(f)
 
 
 # ------------------------------------------------------------------------------------------------------------
-def log_to_file(message, console=False, eol=True, end='\n'):
-    global log_ts, log_data, log_file
+def log_to_file(message, console=False, eol=True, end='\n', player=None, variant=None):
+    """Buffer a log record (tagged with the worker and the player and variant of set_log_context, unless given)
+    - the buffer is flushed every LOG_BUFFER_SIZE characters"""
+    global log_size
     
     end = end if eol else ""
-    log_data += f"{message}{end}"
+    log_data.append((log_context['worker'],
+                     log_context['variant'] if variant is None else variant,
+                     log_context['player'] if player is None else player,
+                     f"{message}{end}"))
+    log_size += len(message)
     
-    if len(log_data) > 100000:
-        print(f"{log_data}", file=log_file)
-        log_data = ""
+    if log_size > LOG_BUFFER_SIZE:
+        flush_log()
     
     if console:
         print(f"{message}", end=end)
@@ -142,12 +164,60 @@ def log_to_file(message, console=False, eol=True, end='\n'):
 
 # ------------------------------------------------------------------------------------------------------------
 def flush_log():
-    global log_ts, log_data, log_file
-    print(f"{log_data}", file=log_file)
-    log_data = ""
+    """Send the buffered records to the LogSink without waiting (dropped and counted if its queue is full), or
+    append them to this process's own log file when no sink is attached"""
+    global log_data, log_size, log_dropped
+    
+    if not log_data and not log_dropped:
+        return
+    
+    records = log_data
+    log_data = []
+    log_size = 0
+    
+    if log_sink is None:
+        with open(log_path, 'a') as f:
+            f.write(''.join([LogSink.format_record(record) for record in records]))
+        
+        return
+    
+    if log_dropped:
+        records.insert(0, (log_context['worker'], '', '', f'{log_dropped} log records dropped (log queue full)\n'))
+    
+    try:
+        log_sink.put_nowait(records)
+        log_dropped = 0
+    except queue.Full:
+        log_dropped += len(records) - (1 if log_dropped else 0)
 
 
 # ------------------------------------------------------------------------------------------------------------
 def reset_log():
-    global log_ts, log_data, log_file
-    log_data = ""
+    """Drop the buffered records"""
+    global log_data, log_size
+    
+    log_data = []
+    log_size = 0
+
+
+# ------------------------------------------------------------------------------------------------------------
+def attach_log_sink(sink_queue, worker):
+    """Send this process's log records to a LogSink (call once at the start of every worker process)
+    
+    Parameters:
+        sink_queue (Queue) - LogSink.queue
+        worker (Int/String) - worker tag for the records"""
+    global log_sink
+    
+    log_sink = sink_queue
+    log_context['worker'] = worker
+    
+    # a forked worker starts with a copy of the parent's buffer
+    reset_log()
+
+
+# ------------------------------------------------------------------------------------------------------------
+def set_log_context(player='', variant=''):
+    """Player and variant tags for the following log records"""
+    log_context['player'] = player
+    log_context['variant'] = variant
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+# KPIs compared across variants (read from each player's last snapshot)
+REPORT_KPIS = ['player_level', 'anim_total', 'anim_sets_cmplt', 'soft_earned', 'soft_spent', 'actions', 'session']
+
+
+# ------------------------------------------------------------------------------------------------------------
+def get_final_rows(results_df):
+    """Last snapshot of every player (one row per variant + replication)
+
+    Parameters:
+        results_df (DataFrame) - combined simulation output (needs 'variant' and 'replication' columns)
+
+    Returns DataFrame"""
+    return results_df.groupby(['variant', 'replication'], sort=True).tail(1).set_index(['variant', 'replication'])
+
+
+# ------------------------------------------------------------------------------------------------------------
+def compare_variants(results_df, kpis=None, baseline=None):
+    """Per variant KPI differences against a baseline variant
+
+    Replication i of each variant is paired with replication i of the baseline.  With common random numbers (CRN)
+    the pairs share their session schedule, reaction times, egg draws, etc. so the paired standard error is much
+    smaller than the independent one - variance_reduction reports by how much (0 = no gain, as with independent
+    streams).
+
+    Parameters:
+        results_df (DataFrame) - combined simulation output
+        kpis (List<String>) - columns to compare (default REPORT_KPIS)
+        baseline (String) - baseline variant label (default first variant)
+
+    Returns DataFrame - one row per (variant, kpi)"""
+    final = get_final_rows(results_df)
+    kpis = [k for k in (kpis or REPORT_KPIS) if k in final.columns]
+
+    variants = list(final.index.get_level_values('variant').unique())
+    baseline = variants[0] if baseline is None else baseline
+    base = final.loc[baseline]
+
+    report = []
+    for variant in variants:
+        if variant == baseline:
+            continue
+
+        other = final.loc[variant]
+        reps = base.index.intersection(other.index)
+        n = len(reps)
+
+        for kpi in kpis:
+            x_base = base.loc[reps, kpi].astype(float)
+            x_var = other.loc[reps, kpi].astype(float)
+            diff = x_var - x_base
+
+            var_indep = x_var.var() + x_base.var() if n > 1 else np.nan
+            var_paired = diff.var() if n > 1 else np.nan
+
+            report.append({
+                'variant'           : variant,
+                'baseline'          : baseline,
+                'kpi'               : kpi,
+                'n'                 : n,
+                'mean_baseline'     : x_base.mean(),
+                'mean_variant'      : x_var.mean(),
+                'mean_diff'         : diff.mean(),
+                'se_paired'         : np.sqrt(var_paired / n) if n > 1 else np.nan,
+                'se_independent'    : np.sqrt(var_indep / n) if n > 1 else np.nan,
+                'variance_reduction': 1 - var_paired / var_indep if var_indep else np.nan,
+            })
+
+    return pd.DataFrame(report)
@@ -0,0 +1,309 @@
+"""Micro-benchmarks for the SimEngine hot methods on the cached economy (datasets/cache)
+
+Every check_*/click_* pair, Player.choose_action and SimOutput.save_snapshot are timed at three player states -
+early (10 minutes in), mid (day 3) and late (day 30) of a fixed seed player.  A click is timed at the first frame
+(within the next STATE_SEARCH processed frames) where its check queues something to click.  Each timed call gets its
+own copy of the state (copies are made before the clock starts), so every call does the same work.
+Game.init_game, get_random_normal and a whole simulated day (fixed seed) are timed too.
+
+Results (median / mean / min per call in microseconds) are written as JSON and compared with a stored baseline -
+the delta column is the change of the median vs the baseline, REGRESSION marks anything slower than --threshold %.
+
+    python benchmarks/bench_engine.py                      # run, write benchmarks/results/<timestamp>.json, compare
+    python benchmarks/bench_engine.py --save-baseline      # run and store the results as the new baseline
+    python benchmarks/bench_engine.py --filter buy         # only benchmarks with 'buy' in the name
+
+Baselines are machine specific - refresh benchmarks/baseline.json on the machine you compare on.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from common import load_bundle, new_game
+
+from SimEngine.Checkpoint import Checkpoint
+from SimEngine.Game import Game
+from SimEngine.RandomSource import RandomSource
+from SimEngine.SnapshotBuffer import SnapshotBuffer
+from SimEngine.StringConstants import *
+from SimEngine.UtilityFunctions import get_random_normal
+
+BASELINE = 'benchmarks/baseline.json'
+RESULTS_FOLDER = 'benchmarks/results'
+
+# Processed frames searched after each state's start for a frame where each action type gets queued
+STATE_SEARCH = 2000
+
+# Player states the method benchmarks start from (name, sim seconds played)
+STATES = [
+    ('early', 600),
+    ('mid', 3 * 86400),
+    ('late', 30 * 86400),
+]
+
+# (name, check method, click method, queued action type) - click is timed on the action its check queued
+PAIRS = [
+    ('buy_candy', 'check_buy_candy', 'click_buy_candy', Actions.BUY_CANDY),
+    ('feed_animal', 'check_feed_animal', 'click_feed_animal', Actions.FEED_ANIMAL),
+    ('free_crate', 'check_free_crate', 'click_free_crate', Actions.FREE_CRATE),
+    ('merge_candy', 'check_merge_candy', 'click_merge_candy', Actions.MERGE_CANDY),
+    ('spin_wheel', 'check_spin_wheel', 'click_spin_wheel', Actions.SPIN_WHEEL),
+    ('swap_animals', 'check_swap_animals', 'click_swap_animals', Actions.SWAP_ANIMALS),
+    ('egg_progress', 'check_egg_progress', None, None),
+]
+
+
+# ==================================================================================
+class GameCopier:
+    """Independent copies of a game - pickled once (see Checkpoint), every copy is linked to the same economy bundle
+    (as in a real run) and gets its own simpy environment at the game's simulated time"""
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, game):
+        """
+        GameCopier Constructor
+
+        game (Game)                - game to copy
+        """
+        self.bundle = game.bundle
+        self.data = Checkpoint.to_bytes(game, compress=False)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def get_copies(self, n):
+        """n independent copies
+
+        Returns List<Game>"""
+        return [Checkpoint.from_bytes(self.data, self.bundle) for _ in range(n)]
+
+
+# ==================================================================================
+def get_queued_types(state):
+    """Action types queued after running every check on a copy of the state
+
+    Parameters:
+        state (GameCopier) - player state
+
+    Returns Set<String>"""
+    probe = state.get_copies(1)[0]
+
+    for _, check, _, _ in PAIRS:
+        getattr(probe, check)()
+
+    return set(probe.state[State.ACTIONS].get_action_types())
+
+
+# ==================================================================================
+def get_state(bundle, seconds):
+    """A fixed seed player after seconds of simulation time, and for every action type the first frame after it
+    (one processed frame at a time, up to STATE_SEARCH frames) where the checks queue an action of that type
+
+    The snapshot rows and event log collected so far are dropped - they don't change what the methods do and keep
+    the copies small.
+
+    Returns Tuple - (GameCopier, {action type: GameCopier})"""
+    wanted = {action_type for _, _, _, action_type in PAIRS if action_type}
+
+    game = new_game(bundle)
+    game.start_sim(seconds * int(bundle.v_data[Variants.SIM_FPS]))
+
+    state, queued = None, {}
+    for _ in range(STATE_SEARCH):
+        game.snapshot.results = SnapshotBuffer(game.snapshot.snapshot_columns)
+        game.events.data = game.events.data[:0]
+
+        copier = GameCopier(game)
+        state = state or copier
+
+        for action_type in (get_queued_types(copier) & wanted) - set(queued):
+            queued[action_type] = copier
+
+        if len(queued) == len(wanted):
+            break
+
+        game.env.step()
+
+    return state, queued
+
+
+# ==================================================================================
+def time_calls(calls):
+    """Time each call once
+
+    Parameters:
+        calls (List<Function>) - calls without arguments
+
+    Returns List<Float> - microseconds per call"""
+    clock = time.perf_counter_ns
+    times = []
+
+    for call in calls:
+        start = clock()
+        call()
+        times.append((clock() - start) / 1000)
+
+    return times
+
+
+# ==================================================================================
+def summarize(times):
+    """Summary of one benchmark
+
+    Returns Dict"""
+    if not times:
+        return {'n': 0}
+
+    return {
+        'n'        : len(times),
+        'median_us': statistics.median(times),
+        'mean_us'  : statistics.fmean(times),
+        'min_us'   : min(times),
+    }
+
+
+# ==================================================================================
+def bench_state(name, state, queued, repeat):
+    """Method benchmarks at one player state
+
+    Parameters:
+        name (String) - state name
+        state (GameCopier) - the player state (checks, choose_action and save_snapshot)
+        queued (Dict) - {action type: GameCopier} first state after it where each action type gets queued (clicks)
+        repeat (Int) - timed calls per benchmark
+
+    Returns Dict - benchmark name -> list of times"""
+    results = {}
+
+    for pair, check, click, action_type in PAIRS:
+        results[f'{pair}.check.{name}'] = time_calls([getattr(g, check) for g in state.get_copies(repeat)])
+
+        if click is None:
+            continue
+
+        clicks = []
+        for g in queued[action_type].get_copies(repeat) if action_type in queued else []:
+            getattr(g, check)()
+            action = g.state[State.ACTIONS].get_next(action_type)
+            clicks.append(lambda g=g, action=action: getattr(g, click)(action[Params.DATA]))
+
+        results[f'{pair}.click.{name}'] = time_calls(clicks)
+
+    # choose_action with a full queue (every check run first) and no cool down
+    games = state.get_copies(repeat)
+    for g in games:
+        for _, check, _, _ in PAIRS:
+            getattr(g, check)()
+
+        g.player.gcd = 0
+
+    results[f'choose_action.{name}'] = time_calls([g.player.choose_action for g in games])
+    results[f'save_snapshot.{name}'] = time_calls([g.snapshot.save_snapshot for g in state.get_copies(repeat)])
+
+    return results
+
+
+# ==================================================================================
+def bench_other(bundle, repeat, days):
+    """init_game, get_random_normal and whole simulated days
+
+    Returns Dict - benchmark name -> list of times"""
+    results = {}
+
+    games = [Game(seed=1) for _ in range(repeat)]
+    results['init_game'] = time_calls([lambda g=g: g.init_game(bundle) for g in games])
+
+    rng = RandomSource(1)
+    results['get_random_normal'] = time_calls([lambda: get_random_normal(0.5, 1.5, 0.25, rng=rng)] * repeat * 10)
+
+    frames = 86400 * int(bundle.v_data[Variants.SIM_FPS])
+    games = [new_game(bundle) for _ in range(days)]
+    results['sim_one_day'] = time_calls([lambda g=g: g.start_sim(frames) for g in games])
+
+    return results
+
+
+# ==================================================================================
+def compare(results, baseline, threshold):
+    """Print every benchmark with its change vs the baseline
+
+    Returns Int - number of regressions"""
+    regressions = 0
+
+    print(f'{"benchmark":<34}{"n":>6}{"median us":>12}{"baseline":>12}{"delta":>9}')
+
+    for name, result in results.items():
+        if result['n'] == 0:
+            print(f'{name:<34}{0:>6}{"-":>12}  (nothing to click near this state)')
+            continue
+
+        base = baseline.get(name, {}).get('median_us')
+        line = f'{name:<34}{result["n"]:>6}{result["median_us"]:>12.2f}'
+
+        if base:
+            delta = 100 * (result['median_us'] - base) / base
+            line += f'{base:>12.2f}{delta:>+8.1f}%'
+
+            if delta > threshold:
+                line += '  REGRESSION'
+                regressions += 1
+
+        print(line)
+
+    return regressions
+
+
+# ==================================================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='SimEngine micro-benchmarks')
+    parser.add_argument('--repeat', type=int, default=200, help='timed calls per benchmark')
+    parser.add_argument('--days', type=int, default=5, help='simulated days timed for sim_one_day')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=10, help='slower than this %% vs baseline = regression')
+    args = parser.parse_args()
+
+    bundle = load_bundle()
+
+    times = {}
+    for name, seconds in STATES:
+        times.update(bench_state(name, *get_state(bundle, seconds), args.repeat))
+
+    times.update(bench_other(bundle, args.repeat, args.days))
+
+    results = {name: summarize(t) for name, t in sorted(times.items()) if args.filter in name}
+
+    output = {
+        'meta'   : {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python'   : platform.python_version(),
+            'machine'  : platform.platform(),
+            'repeat'   : args.repeat,
+        },
+        'results': results,
+    }
+
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    path = os.path.join(RESULTS_FOLDER, datetime.datetime.now().strftime('%Y%m%d_%H%M%S') + '.json')
+    with open(path, 'w') as f:
+        json.dump(output, f, indent=1)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    regressions = compare(results, baseline, args.threshold)
+    print(f'Results: {path}' + (f' - {regressions} regression(s) vs {args.baseline}' if baseline else ''))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(output, f, indent=1)
+
+        print(f'Baseline saved: {args.baseline}')
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,72 @@
+"""Benchmark: cost of Game.log at each logging setting
+
+Runs the same player (same seed) with logging off, one category on and every category at debug level and prints
+simulated frames (ticks) per second of wall time, plus the cost of a single disabled Game.log call.
+
+Run from assignments/final:
+    python benchmarks/bench_logging.py [sim seconds] [repeats]
+"""
+import sys
+import time
+import timeit
+
+from common import load_bundle, new_game
+
+from SimEngine.Game import Game
+from SimEngine.StringConstants import *
+from SimEngine.UtilityFunctions import reset_log
+
+# (label, sim_log_level, sim_log_categories)
+SETTINGS = [
+    ('off', 'off', Log.ALL),
+    ('session info', 'info', Log.SESSION),
+    ('all info', 'info', Log.ALL),
+    ('all debug', 'debug', Log.ALL),
+]
+
+
+# ==================================================================================
+def run_player(bundle, level, categories, seconds):
+    """Simulate one player
+
+    Returns Tuple - (frames simulated, seconds taken)"""
+    game = new_game(bundle)
+    game.set_logging(level, categories)
+
+    frames = seconds * int(bundle.v_data[Variants.SIM_FPS])
+
+    start = time.perf_counter()
+    game.start_sim(frames)
+    elapsed = time.perf_counter() - start
+
+    reset_log()
+
+    return frames, elapsed
+
+
+# ==================================================================================
+if __name__ == "__main__":
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 30 * 86400
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    bundle = load_bundle()
+
+    print(f'{seconds} sim seconds, best of {repeats}')
+    print(f'{"logging":<14}{"seconds":>10}{"ticks/sec":>14}{"vs off":>10}')
+
+    base = None
+    for label, level, categories in SETTINGS:
+        frames, elapsed = min((run_player(bundle, level, categories, seconds) for _ in range(repeats)),
+                              key=lambda r: r[1])
+        base = base or elapsed
+
+        print(f'{label:<14}{elapsed:>10.2f}{frames / elapsed:>14,.0f}{base / elapsed:>10.2f}')
+
+    # Cost of one call that is filtered out
+    game = Game(seed=1)
+    calls = 1000000
+    disabled = timeit.timeit(lambda: game.log(Log.BUY, LogLevel.DEBUG, 'click_buy_candy(), %s, %s', 1, 2),
+                             number=calls)
+    empty = timeit.timeit(lambda: None, number=calls)
+
+    print(f'disabled Game.log call: {(disabled - empty) / calls * 1e9:.0f} ns')
@@ -0,0 +1,255 @@
+"""End-to-end throughput and scaling of the multiprocessing driver (main.py) on the cached economy (datasets/cache)
+
+Runs the same synthetic workload - players of the first cached variant, each simulating --seconds - through
+main.worker at every worker count in --workers (and every chunk size in --max-chunk), the way main.py runs them
+(one TaskScheduler, one LogSink, every worker streaming into its own part of the Parquet dataset), then merges the
+dataset and reads back the KPI summary as main.py does.  Per run it reports:
+
+    players/h      - players finished per hour of wall time (process start to the last worker joined)
+    sim s/wall s   - simulated seconds per wall second, over all workers
+    speedup / eff  - throughput vs the smallest worker count (same chunk size), and speedup per worker relative to
+                     it (1.0 = linear)
+    chunks         - chunks handed out
+    idle %         - share of the workers' wall time not spent simulating or writing (start up, queue, tail)
+    tail s         - last task handed out to the last worker done (load imbalance)
+    queue ms       - mean time per task the workers spent waiting for chunks
+    write %        - share of the workers' busy time spent writing results
+    merge s        - ResultWriter.merge plus reading the KPI summary back
+    peak MB        - peak resident memory of all processes together (sampled every 50ms) and of the largest worker
+
+With --weak the workload grows with the worker count (--players per worker) instead of staying fixed.
+
+    python benchmarks/bench_scaling.py                          # 1..physical cores, 24 players of 3 days
+    python benchmarks/bench_scaling.py --workers 1,2,4,8 --players 64 --seconds 604800
+    python benchmarks/bench_scaling.py --workers 4 --max-chunk 1,4,16          # compare chunk sizes
+    python benchmarks/bench_scaling.py --weak --players 4 --summary-only
+    python benchmarks/bench_scaling.py --workers 2 --checkpoint 604800                # cost of weekly checkpoints
+
+Results are written to benchmarks/results/scaling_<timestamp>.json (and .csv for plotting the curves).
+"""
+import argparse
+import datetime
+import json
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import psutil
+
+from common import load_bundle
+
+import main
+from SimEngine.Checkpoint import RunCheckpoints
+from SimEngine.LogSink import LogSink
+from SimEngine.RandomSource import RandomSource
+from SimEngine.ResultWriter import ResultWriter
+from SimEngine.StringConstants import *
+from SimEngine.TaskScheduler import TaskScheduler
+
+RESULTS_FOLDER = 'benchmarks/results'
+MEMORY_SAMPLE = 0.05  # seconds between resident memory samples
+
+# Printed table (header, result key, width, format)
+COLUMNS = [
+    ('workers', 'workers', 7, ''),
+    ('chunk', 'max_chunk', 6, ''),
+    ('players', 'players', 8, ''),
+    ('wall s', 'wall_s', 9, '.2f'),
+    ('players/h', 'players_per_h', 11, ',.0f'),
+    ('sim s/wall s', 'sim_per_wall_s', 14, ',.0f'),
+    ('speedup', 'speedup', 9, '.2f'),
+    ('eff', 'efficiency', 6, '.2f'),
+    ('chunks', 'chunks', 7, ''),
+    ('idle %', 'idle_pct', 8, '.1f'),
+    ('tail s', 'tail_s', 8, '.2f'),
+    ('queue ms', 'queue_ms', 10, '.2f'),
+    ('write %', 'write_pct', 9, '.1f'),
+    ('merge s', 'merge_s', 9, '.2f'),
+    ('peak MB', 'peak_mb', 9, '.0f'),
+    ('worker MB', 'peak_worker_mb', 10, '.0f'),
+]
+
+
+# ==================================================================================
+class MemoryMonitor:
+    """Peak resident memory of this process and its children, sampled by a thread until stop()"""
+
+    # ------------------------------------------------------------------------------------------------------------
+    def __init__(self, interval=MEMORY_SAMPLE):
+        """
+        MemoryMonitor Constructor (starts sampling)
+
+        interval (Float)           - seconds between samples
+        """
+        self.interval = interval
+        self.peak_total = 0  # bytes, every process together
+        self.peak_child = 0  # bytes, largest single child
+
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.sample, name='MemoryMonitor', daemon=True)
+        self.thread.start()
+
+    # ------------------------------------------------------------------------------------------------------------
+    def sample(self):
+        """Sampling thread"""
+        parent = psutil.Process()
+
+        while not self.done.is_set():
+            total = parent.memory_info().rss
+
+            for child in parent.children(recursive=True):
+                try:
+                    rss = child.memory_info().rss
+                except psutil.Error:  # finished between listing and reading it
+                    continue
+
+                total += rss
+                self.peak_child = max(self.peak_child, rss)
+
+            self.peak_total = max(self.peak_total, total)
+            self.done.wait(self.interval)
+
+    # ------------------------------------------------------------------------------------------------------------
+    def stop(self):
+        """Stop sampling"""
+        self.done.set()
+        self.thread.join()
+
+
+# ==================================================================================
+def run_workload(bundles, processors, players, args):
+    """Run players through main.worker on a TaskScheduler with processors workers, then merge the dataset (in a
+    temporary folder)
+
+    Returns Dict - measurements of the run"""
+    folder = tempfile.mkdtemp(prefix='bench_scaling_')
+    fn = os.path.join(folder, 'results')
+    seconds = int(bundles[1].v_data[Variants.SIM_LENGTH])
+
+    try:
+        sink = LogSink(os.path.join(folder, 'sim.log'))
+        checkpoints = RunCheckpoints(os.path.join(folder, 'checkpoints')) if args.checkpoint > 0 else None
+        scheduler = TaskScheduler(main.worker, (bundles, fn, not args.narrow, not args.summary_only, sink.queue,
+                                                checkpoints, args.checkpoint),
+                                  processors,
+                                  max_tasks=args.max_tasks,
+                                  chunk_factor=args.chunk_factor,
+                                  max_chunk=args.max_chunk,
+                                  on_crash=lambda worker_id: ResultWriter.remove_part(fn, worker_id))
+
+        for i in range(players):
+            scheduler.add_task(i, (i, 1, RandomSource.spawn(1, 1, i)), cost=seconds)
+
+        memory = MemoryMonitor()
+
+        run_start = time.time()
+        start = time.perf_counter()
+        scheduler.run()
+        wall = time.perf_counter() - start
+
+        memory.stop()
+
+        start = time.perf_counter()
+        ResultWriter.merge(fn)
+        ResultWriter.read_kpis(fn)
+        merge = time.perf_counter() - start
+
+        sink.stop()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    workers = scheduler.worker_stats
+    first = [w for w in workers if w['worker'] < processors]  # the pool started with these
+
+    tasks = sum(w['tasks'] for w in workers)
+    busy = sum(w['sim_s'] + w['write_s'] for w in workers)
+
+    return {
+        'workers'       : processors,
+        'max_chunk'     : args.max_chunk,
+        'players'       : tasks,
+        'failed'        : len(scheduler.failed),
+        'wall_s'        : wall,
+        'players_per_h' : tasks / wall * 3600,
+        'sim_per_wall_s': sum(w['sim_seconds'] for w in workers) / wall,
+        'chunks'        : sum(w['chunks'] for w in workers),
+        'idle_pct'      : 100 * (1 - busy / (processors * wall)),
+        'startup_s'     : sum(w['start'] - run_start for w in first) / len(first),
+        'tail_s'        : wall - scheduler.drained,
+        'queue_ms'      : 1000 * sum(w['queue_s'] for w in workers) / tasks,
+        'write_pct'     : 100 * sum(w['write_s'] for w in workers) / busy,
+        'merge_s'       : merge,
+        'peak_mb'       : memory.peak_total / 2 ** 20,
+        'peak_worker_mb': memory.peak_child / 2 ** 20,
+        'per_worker'    : workers,
+    }
+
+
+# ==================================================================================
+def print_table(runs):
+    """Scaling table - speedup and efficiency are relative to the smallest worker count with the same chunk size"""
+    bases = {}
+
+    print(''.join(f'{header:>{width}}' for header, _, width, _ in COLUMNS))
+
+    for run in runs:
+        base = bases.setdefault(run['max_chunk'], run)
+        run['speedup'] = run['players_per_h'] / base['players_per_h']
+        run['efficiency'] = run['speedup'] * base['workers'] / run['workers']
+
+        print(''.join(f'{run[key]:>{width}{fmt}}' for _, key, width, fmt in COLUMNS))
+
+
+# ==================================================================================
+if __name__ == "__main__":
+    cores = psutil.cpu_count(logical=False) or 1
+
+    parser = argparse.ArgumentParser(description='Driver throughput and scaling benchmark')
+    parser.add_argument('--workers', default=','.join(str(n) for n in range(1, cores + 1)),
+                        help='comma separated worker counts (default 1..physical cores)')
+    parser.add_argument('--players', type=int, default=24, help='players in the workload (per worker with --weak)')
+    parser.add_argument('--seconds', type=int, default=3 * 86400, help='simulated seconds per player')
+    parser.add_argument('--weak', action='store_true', help='grow the workload with the worker count')
+    parser.add_argument('--max-chunk', default='16', help='comma separated most players per chunk (TaskScheduler)')
+    parser.add_argument('--chunk-factor', type=float, default=2, help='chunk cost = remaining / (factor * workers)')
+    parser.add_argument('--max-tasks', type=int, default=0, help='recycle workers after this many players (0 = never)')
+    parser.add_argument('--checkpoint', type=int, default=0,
+                        help='simulated seconds between player checkpoints (0 = off)')
+    parser.add_argument('--narrow', action='store_true', help='narrow snapshot rows (SIMULATION_WIDE_OUTPUT off)')
+    parser.add_argument('--summary-only', action='store_true',
+                        help='final rows and KPI summary only (SIMULATION_RAW_OUTPUT off)')
+    args = parser.parse_args()
+
+    bundle = load_bundle()
+    bundle.v_data[Variants.SIM_LENGTH] = args.seconds
+    bundles = {1: bundle}
+
+    worker_counts = sorted(int(n) for n in args.workers.split(','))
+    chunk_sizes = [int(n) for n in args.max_chunk.split(',')]
+
+    runs = []
+    for max_chunk, processors in itertools.product(chunk_sizes, worker_counts):
+        players = args.players * processors if args.weak else args.players
+        runs.append(run_workload(bundles, processors, players, argparse.Namespace(**{**vars(args),
+                                                                                      'max_chunk': max_chunk})))
+        print(f'{processors} worker(s), chunks <= {max_chunk}: {runs[-1]["wall_s"]:.2f}s', flush=True)
+
+    print(f'{args.seconds} sim seconds per player, {"weak" if args.weak else "strong"} scaling, '
+          f'{psutil.cpu_count(logical=False)} physical / {psutil.cpu_count()} logical CPUs')
+    print_table(runs)
+
+    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(RESULTS_FOLDER, f'scaling_{ts}')
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+
+    with open(path + '.json', 'w') as f:
+        json.dump({'args': vars(args), 'cpus': [psutil.cpu_count(logical=False), psutil.cpu_count()], 'runs': runs},
+                  f, indent=1)
+
+    pd.DataFrame([{k: v for k, v in run.items() if k != 'per_worker'} for run in runs]).to_csv(path + '.csv',
+                                                                                               index=False)
+    print(f'Results: {path}.json')
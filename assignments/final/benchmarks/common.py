@@ -0,0 +1,45 @@
+"""Shared setup for the benchmark scripts - run them from anywhere, they work from assignments/final"""
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pandas as pd
+
+from SimEngine.EconomyBundle import EconomyBundle
+from SimEngine.Game import Game
+from SimEngine.Player import Player
+from SimEngine.RandomSource import RandomSource
+from SimEngine.SheetSchema import convert_sheet, convert_variants
+
+
+# ==================================================================================
+def load_bundle():
+    """Compile the first variant of the cached Variants tab (datasets/cache)
+
+    Returns EconomyBundle"""
+    variant_df = convert_variants(pd.read_csv('datasets/cache/data_variants.csv'))
+    v_data = {row[0]: row[1] for row in variant_df.iloc[:, :2].itertuples(index=False)}
+
+    for d in [d for d in v_data if d[0:5] == 'data_']:
+        v_data[d] = convert_sheet(pd.read_csv(f'datasets/cache/{d}.csv'), d)
+
+    return EconomyBundle(1, v_data)
+
+
+# ==================================================================================
+def new_game(bundle, seed=1, player_id=0):
+    """A game with its player, ready for start_sim (fixed seed: RandomSource.spawn(seed, 1, player_id))
+
+    Returns Game"""
+    game = Game(seed=RandomSource.spawn(seed, 1, player_id))
+    game.init_game(bundle)
+
+    player = Player()
+    player.init_player(player_id=player_id, variant=1, v_data=bundle.v_data, game=game)
+    game.set_player(player)
+
+    return game
@@ -4,21 +4,25 @@ import datetime
 
 import pickle
 import os.path
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 
 # Visualization
 
 # Parallel Processing
-import multiprocessing as mp
 import psutil
 
 # Custom Classes
+from SimEngine.Checkpoint import Checkpoint, RunCheckpoints
+from SimEngine.EconomyBundle import EconomyBundle
 from SimEngine.Game import Game
+from SimEngine.LogSink import LogSink
 from SimEngine.Player import Player
+from SimEngine.RandomSource import RandomSource
+from SimEngine.ResultWriter import ResultWriter
+from SimEngine.SheetSchema import convert_sheet, convert_variants
 from SimEngine.StringConstants import *
+from SimEngine.TaskScheduler import TaskScheduler
 from SimEngine.UtilityFunctions import *
+from SimEngine.VariantReport import compare_variants
 
 # ==================================================================================
 # Enter variant details here:
@@ -26,28 +30,117 @@ from SimEngine.UtilityFunctions import *
 SIMULATION_GOOGLE_SHEET_ID = '<Insert GoogleSheet ID here>'
 SIMULATION_VARIANTS_SHEET = 'variants!A1:G100'
 
+# Master random seed for the whole run (None = pick a new one).  It is logged and written to the output ('seed'
+# column) - re-run any single player with Game(seed=RandomSource.spawn(seed, variant, replication, SIMULATION_CRN))
+SIMULATION_SEED = None
+
+# Common random numbers: replication i of every variant shares its random streams (session schedule, reaction
+# times, egg draws, starting animal, ...) so variant differences need far fewer replications to show up
+SIMULATION_CRN = False
+
+# Also write the whole result dataset out as one CSV (streamed one player at a time - the Parquet dataset is the
+# primary output)
+SIMULATION_EXPORT_CSV = True
+
+# Snapshot table also holds the comma-joined actions_* and a_<Animal_ID> inventory columns (rebuilt from the event
+# log).  Off = narrow snapshot rows, the events table (events/ in the dataset) has the same information
+SIMULATION_WIDE_OUTPUT = True
+
+# Write every snapshot row and event to the dataset.  Off = only each player's final row and the per variant, per
+# day KPI summary (_kpis.csv - built as players finish, see KpiAggregator) for large sweeps
+SIMULATION_RAW_OUTPUT = True
+
+# Log file rotation (every process logs through one LogSink - see logs/sim_<timestamp>.log)
+SIMULATION_LOG_MAX_MB = 50
+SIMULATION_LOG_BACKUPS = 10
+SIMULATION_LOG_COMPRESS = True
+
+# Task scheduling - a player that fails (or whose worker dies) is re-run with the same seed up to TASK_RETRIES
+# times.  Workers are replaced by a fresh process after WORKER_MAX_TASKS players (0 = never) to keep memory bounded,
+# and are handed at most MAX_CHUNK players at a time (see TaskScheduler)
+SIMULATION_TASK_RETRIES = 2
+SIMULATION_WORKER_MAX_TASKS = 0
+SIMULATION_MAX_CHUNK = 16
+
+# Save every player's game each CHECKPOINT_TIME simulated seconds (0 = off) under CHECKPOINT_FOLDER/<output name>/ -
+# a player whose worker dies picks up from its last checkpoint instead of day 1, with the same output (see
+# Checkpoint).  Weekly checkpoints cost ~5% on a 90 day player
+SIMULATION_CHECKPOINT_TIME = 7 * 86400
+SIMULATION_CHECKPOINT_FOLDER = 'datasets/checkpoints/'
+
+# Finish an interrupted run (stopped, machine rebooted) instead of starting a new one - the output name of that run,
+# e.g. 'simulation_results_20200715_1433_100'.  Players that were safely written are kept, the rest resume from
+# their checkpoints.  Use the same variants as the interrupted run
+SIMULATION_RESUME = None
+
 
 # ==================================================================================
-def worker(task_queue):
+def worker(worker_id, inbox, results, bundles, folder, wide, raw, log_queue, checkpoints=None, checkpoint_time=0):
     """
     Worker process - this will be run in each CPU in it's own Kernel.
 
     NOTE: This method does NOT have access to globals or any information in the parent process.
-    It ony knows what is passed in via the task queue.
+    It ony knows what the TaskScheduler hands it (chunks of players on its inbox) and the compiled economies
+    (bundles).  The bundles are handed over once when the process starts (shared copy-on-write when the OS forks)
+    so each task is just (run_number, v_id, seed).  Every player is reported back on the results channel (rows
+    written, or the traceback if it failed).  Results (snapshots and events) are streamed into this worker's part of
+    the Parquet dataset in folder (one row group per player) and summarized in the worker's KPI aggregator.
+    Log records go to the parent's LogSink through log_queue (tagged with the worker, player and variant).
+    With checkpoints (RunCheckpoints) every player saves its game each checkpoint_time simulated seconds, and a
+    player that already has a checkpoint continues from it.
+    Once the scheduler has nothing left for it (or recycles it) the worker closes its files and reports its timings
+    (see benchmarks/bench_scaling.py).
     """
+    attach_log_sink(log_queue, worker_id)
+    writer = ResultWriter(folder, worker_id, bundles, wide, raw)
     
-    while not task_queue.empty():
-        run_number, v_id, v_data = task_queue.get()
-        
-        # Create a game
-        game = Game()
-        game.init_game(v_data)
-        
-        log_to_file(f'Simulation Start: ({run_number} | {v_id} | {v_data["sim_count"]} | {v_data["sim_length"]})', end='\n')
+    # Wall clock start/end (comparable across processes), seconds spent waiting for chunks, simulating and writing
+    # results
+    stats = {'worker': worker_id, 'start': time.time(), 'tasks': 0, 'sim_seconds': 0, 'sim_s': 0.0, 'write_s': 0.0}
+    
+    TaskScheduler.serve(worker_id, inbox, results,
+                        lambda task: run_player(task, bundles, writer, stats, checkpoints, checkpoint_time), stats)
+    
+    start = time.perf_counter()
+    writer.close()
+    stats['write_s'] += time.perf_counter() - start
+    
+    set_log_context()
+    flush_log()
+    
+    stats['end'] = time.time()
+    TaskScheduler.exit(worker_id, results, stats)
+    
+    return True
 
-        # Create a game
-        game = Game()
-        game.init_game(v_data)
+
+# ==================================================================================
+def run_player(task, bundles, writer, stats, checkpoints=None, checkpoint_time=0):
+    """
+    Simulate one player (in a worker process) and stream its results to the worker's ResultWriter
+    (continues the player from its checkpoint if it has one)
+
+    Returns Int - snapshot rows of the player
+    """
+    clock = time.perf_counter
+    run_number, v_id, seed = task
+    bundle = bundles[v_id]
+    v_data = bundle.v_data
+    set_log_context(player=run_number, variant=v_id)
+    
+    log_to_file(f'Simulation Start: ({run_number} | {v_id} | {v_data["sim_count"]} | {v_data["sim_length"]} | '
+                f'{bundle.hash[:12]})', end='\n')
+    
+    path = checkpoints.get_path(run_number) if checkpoints is not None else None
+    
+    if path is not None and os.path.exists(path):
+        # Pick the player up where its last checkpoint left off (its worker died or the run was stopped)
+        game = Checkpoint.load(path, bundle)
+        log_to_file(f'Simulation Resume: ({run_number} | {v_id} | day {game.day} | frame {game.env.now})')
+    else:
+        # Create a game (every player gets its own seeded random source)
+        game = Game(seed=seed)
+        game.init_game(bundle)
 
         # initialize virtual player
         player = Player()
@@ -57,41 +150,37 @@ def worker(task_queue):
                            game=game)
 
         game.set_player(player)
-        game.start_sim(int(v_data['sim_length']) * int(v_data['sim_fps']))
-        flush_log()
-
-        # Save player simulation csv candy to folder
-        results_df = game.snapshot.results_df
-        results_df.fillna(0, inplace=True)
-        results_df = results_df.applymap(convert_numbers)
+        
+        if path is not None and checkpoint_time > 0:
+            game.set_checkpoint(path, checkpoint_time)
 
-        # Reorder Animal and Candy Columns to End of DataFrame
-        cols = results_df.columns
-        candy_cols = sorted([c_col for c_col in cols if c_col[:2] == 'c_'], key=lambda x: int(x[2:]))
-        animal_cols = sorted([a_col for a_col in cols if a_col[:2] == 'a_'], key=lambda x: int(x[2:]))
-        cols_c_a = candy_cols + animal_cols
-        other_cols = [o_col for o_col in cols if o_col not in cols_c_a]
+    start = clock()
+    game.start_sim(int(v_data['sim_length']) * int(v_data['sim_fps']))
+    stats['sim_s'] += clock() - start
 
-        cols = other_cols + cols_c_a
-        results_df = results_df[cols]
+    # Stream player simulation results to the dataset
+    start = clock()
+    writer.write_player(v_id, game.snapshot)
+    stats['write_s'] += clock() - start
 
-        results_df.to_csv(f'datasets/batch/{v_id}_{run_number}.csv', index=False)
+    stats['tasks'] += 1
+    stats['sim_seconds'] += int(v_data['sim_length'])
 
-        log_to_file(f'Simulation End: ({run_number} | {v_id} | {v_data["sim_count"]} | {v_data["sim_length"]})')
-        flush_log()
+    log_to_file(f'Simulation End: ({run_number} | {v_id} | {v_data["sim_count"]} | {v_data["sim_length"]})')
+    flush_log()
 
-        del game, player, run_number, v_id, v_data
-    
-    return True
+    return len(game.snapshot.results)
 
 
 # ==================================================================================
-def add_tasks(task_queue, variants):
+def load_bundles(variants):
     """
-    Method to populate list of initialization candy for every simulation run
+    Load the data_* sheets for every variant and compile each variant's economy once (EconomyBundle)
     This method is run by the parent process so has access to globals
+
+    Returns Dict - {v_id: EconomyBundle}
     """
-    num = 0
+    bundles = {}
     
     for v_id in variants.keys():
         v_data = variants[v_id]
@@ -103,29 +192,48 @@ def add_tasks(task_queue, variants):
         for d in data_sheets:
             # Load the variant candy fro the Google sheet
             # The "False" will force candy sheets to be reloaded every time to replace cache
-            if True and os.path.exists(f'datasets/cache/{d}.csv'):
-                v_data[d] = pd.read_csv(f'datasets/cache/{d}.csv')
-                v_data[d] = v_data[d].applymap(convert_numbers)
-            else:
+            if not (True and os.path.exists(f'datasets/cache/{d}.csv')):
                 data = load_data(SIMULATION_GOOGLE_SHEET_ID, v_data[d])
-                v_data[d] = pd.DataFrame(data[1:], columns=data[0])
-                v_data[d] = v_data[d].applymap(convert_numbers)
-                
-                v_data[d].to_csv(f'datasets/cache/{d}.csv', index=False)
-                v_data[d] = pd.read_csv(f'datasets/cache/{d}.csv')
-                v_data[d] = v_data[d].applymap(convert_numbers)
+                pd.DataFrame(data[1:], columns=data[0]).to_csv(f'datasets/cache/{d}.csv', index=False)
+            
+            # Typed columns from the sheet schema (a bad cell raises a SchemaError naming the row and column)
+            v_data[d] = convert_sheet(pd.read_csv(f'datasets/cache/{d}.csv'), d)
         
-        # --- Add parameters to sim queue
-        for i in range(v_data['sim_count']):
-            task_queue.put((num, v_id, v_data))
+        bundles[v_id] = EconomyBundle(v_id, v_data)
+        log_to_file(f'Variant {v_id} economy compiled: {bundles[v_id].hash}')
+    
+    return bundles
+
+
+# ==================================================================================
+def add_tasks(scheduler, bundles, master_seed, done=()):
+    """
+    Method to populate list of initialization candy for every simulation run (except the players in done - already
+    written by an interrupted run that is being resumed)
+    This method is run by the parent process so has access to globals
+    """
+    num = 0
+    
+    for v_id, bundle in bundles.items():
+        # --- Add parameters to the scheduler (each player gets its own stream spawned from the master seed, longest
+        # sim_length is handed out first)
+        for i in range(bundle.v_data['sim_count']):
+            if num not in done:
+                scheduler.add_task(num, (num, v_id, RandomSource.spawn(master_seed, v_id, i, SIMULATION_CRN)),
+                                   cost=int(bundle.v_data['sim_length']))
             num += 1
     
-    return task_queue
+    return scheduler
 
 
 # ==================================================================================
 def load_data(file, sheet_range):
     """Load candy from GoogleSheets"""
+    # Only needed when a sheet isn't cached yet (keeps main importable without the Google client, e.g. benchmarks)
+    from googleapiclient.discovery import build
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     credentials = None
     
     # The file token.pickle stores the user's access and refresh tokens, and is
@@ -162,14 +270,11 @@ def load_data(file, sheet_range):
 if __name__ == "__main__":
     # ----
     # Load the variant candy fro the Google sheet
-    if True and os.path.isfile('datasets/cache/data_variants.csv'):
-        variant_df = pd.read_csv('datasets/cache/data_variants.csv')
-        variant_df = variant_df.applymap(convert_numbers)
-    else:
+    if not (True and os.path.isfile('datasets/cache/data_variants.csv')):
         variant_data = load_data(SIMULATION_GOOGLE_SHEET_ID, SIMULATION_VARIANTS_SHEET)
-        variant_df = pd.DataFrame(variant_data[1:], columns=variant_data[0])
-        variant_df = variant_df.applymap(convert_numbers)
-        variant_df.to_csv('datasets/cache/data_variants.csv', index=False)
+        pd.DataFrame(variant_data[1:], columns=variant_data[0]).to_csv('datasets/cache/data_variants.csv', index=False)
+    
+    variant_df = convert_variants(pd.read_csv('datasets/cache/data_variants.csv'))
     
     # --- Build VARIANTS Dictionary
     VARIANTS = {}
@@ -184,65 +289,127 @@ if __name__ == "__main__":
             VARIANTS[int(col)][row[1][0]] = row[1][c]
     
     # Define runtime settings
-    NUM_CPUS = psutil.cpu_count(logical=False)
+    NUM_CPUS = psutil.cpu_count(logical=False) or 1  # None when psutil can't tell
     
     # ----- Simulation parameters
-    PROCESSORS = NUM_CPUS - 1  # number of concurrent jobs (based on # CPU's in system)
+    PROCESSORS = max(1, NUM_CPUS - 1)  # number of concurrent jobs (based on # CPU's in system, at least 1)
     SIM_CYCLES = sum([v['sim_count'] for v in VARIANTS.values()])
     
     CACHE_FOLDER = 'datasets/batch/*'
     OUTPUT_FOLDER = 'datasets/output/'
     
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+    fn = f'{OUTPUT_FOLDER}simulation_results_{ts}_{SIM_CYCLES}'
+    
+    if SIMULATION_RESUME:
+        fn = OUTPUT_FOLDER + SIMULATION_RESUME
+    
+    # Player checkpoints of this run (see Checkpoint)
+    CHECKPOINTS = None
+    if SIMULATION_CHECKPOINT_TIME > 0 or SIMULATION_RESUME:
+        CHECKPOINTS = RunCheckpoints(SIMULATION_CHECKPOINT_FOLDER + os.path.basename(fn))
+    
     # ==================================================================================
     
     # -----
     # If fewer sim cycles than CPU's, only initialize with the number of sim cycles
-    PROCESSORS = SIM_CYCLES if (SIM_CYCLES < PROCESSORS) else PROCESSORS
-    processes = []
+    PROCESSORS = SIM_CYCLES if (0 < SIM_CYCLES < PROCESSORS) else PROCESSORS
     
     reset_log()
+    LOG_SINK = LogSink(log_path, SIMULATION_LOG_MAX_MB * 2 ** 20, SIMULATION_LOG_BACKUPS, SIMULATION_LOG_COMPRESS)
+    attach_log_sink(LOG_SINK.queue, 'main')
     log_to_file(f'Running {SIM_CYCLES} players with {PROCESSORS} CPUs!')
     flush_log()
     
     # -----
-    # Clear our cache folder (note, each simulation cycle will save it's results there
-    # and we will aggregate those files back together at the end of the run)
+    # Clear our cache folder (left over files from older runs - results now go straight to the output dataset)
     purge_disk_cache(CACHE_FOLDER)
     
     # -----
     # Setup a task queue for all sim cycles (players) in simulation
-    empty_task_queue = mp.Queue()
-    full_task_queue = add_tasks(empty_task_queue, VARIANTS)
+    BUNDLES = load_bundles(VARIANTS)
+    
+    DONE_WORKERS, DONE_PLAYERS = set(), set()
+    
+    if SIMULATION_RESUME:
+        # Same seed as the interrupted run.  Workers that exited cleanly wrote complete part files - keep them and
+        # their players, remove the rest (those players run again, from their checkpoints)
+        MASTER_SEED = CHECKPOINTS.load_run(SIMULATION_CRN, BUNDLES)
+        DONE_WORKERS, DONE_PLAYERS = CHECKPOINTS.get_done()
+        
+        for worker_id in ResultWriter.get_part_ids(fn) - DONE_WORKERS:
+            ResultWriter.remove_part(fn, worker_id)
+        
+        log_to_file(f'Resuming {fn}: {len(DONE_PLAYERS)} players done, {len(CHECKPOINTS.get_saved())} players '
+                    f'continue from a checkpoint')
+    else:
+        MASTER_SEED = RandomSource.get_master_seed(SIMULATION_SEED)
+        
+        if CHECKPOINTS is not None:
+            CHECKPOINTS.save_run(MASTER_SEED, SIMULATION_CRN, BUNDLES)
+    
+    log_to_file(f'Master seed: {MASTER_SEED} (CRN: {SIMULATION_CRN})')
+    
+    SCHEDULER = TaskScheduler(worker, (BUNDLES, fn, SIMULATION_WIDE_OUTPUT, SIMULATION_RAW_OUTPUT, LOG_SINK.queue,
+                                       CHECKPOINTS, SIMULATION_CHECKPOINT_TIME),
+                              PROCESSORS,
+                              max_retries=SIMULATION_TASK_RETRIES,
+                              max_tasks=SIMULATION_WORKER_MAX_TASKS,
+                              max_chunk=SIMULATION_MAX_CHUNK,
+                              on_crash=lambda worker_id: ResultWriter.remove_part(fn, worker_id),
+                              on_exit=CHECKPOINTS.add_done if CHECKPOINTS is not None else None,
+                              first_worker=max(ResultWriter.get_part_ids(fn) | DONE_WORKERS, default=-1) + 1)
+    add_tasks(SCHEDULER, BUNDLES, MASTER_SEED, DONE_PLAYERS)
     
     # ---------------- RUN SIMULATION ----------------------------------
     start = time.time()
     
-    for n in range(PROCESSORS):
-        p = mp.Process(target=worker, args=(full_task_queue,))
-        processes.append(p)
-        p.start()
-    
-    for p in processes:
-        p.join()
+    SCHEDULER.run()
     
     flush_log()
     
     log_to_file('Simulation Complete')
     log_to_file(f'Time taken = {time.time() - start:.10f}')
     
+    if SCHEDULER.crashes > 0 or SCHEDULER.failed:
+        log_to_file(f'{SCHEDULER.crashes} worker(s) died, {len(SCHEDULER.failed)} player(s) failed every try: '
+                    f'{sorted(SCHEDULER.failed)}')
+    
+    # Every player is written - checkpoints are only kept if some failed (resume the run to try them again)
+    if CHECKPOINTS is not None and not SCHEDULER.failed:
+        CHECKPOINTS.remove()
+    
     # -----
-    # Save simulation results to CSV
+    # Workers wrote the Parquet dataset (one folder per variant) - only the summary metadata is left to write
     log_to_file('Collecting candy for analysis and saving copies')
-    Results_DF = pd.concat([pd.read_csv(f) for f in glob.glob('datasets/batch/*')], ignore_index=True)
+    rows = ResultWriter.merge(fn)
+    log_to_file(f'Dataset {os.path.join(fn, ResultWriter.SNAPSHOTS)}/: {rows} rows')
     
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-    fn = f'{OUTPUT_FOLDER}simulation_results_{ts}_{SIM_CYCLES}'
+    if SIMULATION_EXPORT_CSV and SIMULATION_RAW_OUTPUT:
+        ResultWriter.export_csv(os.path.join(fn, ResultWriter.SNAPSHOTS), fn + '.csv')
+        ResultWriter.export_csv(os.path.join(fn, ResultWriter.EVENTS), fn + '_events.csv')
     
-    Results_DF.to_csv(fn + '.csv')
+    # -----
+    # Per variant, per day KPI distributions across players (merged from the workers' summaries)
+    ResultWriter.read_kpis(fn).to_csv(fn + '_kpis.csv', index=False)
+    
+    # -----
+    # Phase timings of the variants that set sim_profile (merged from the workers' profiles)
+    PROFILE = ResultWriter.read_profile(fn)
+    if len(PROFILE) > 0:
+        PROFILE.save(fn + '_profile.json')
+        Profile_DF = PROFILE.to_df()
+        Profile_DF.to_csv(fn + '_profile.csv', index=False)
+        log_to_file(Profile_DF.to_string(index=False))
     
-    # This is a binary save format candy uses - it's way faster and smaller files sizes
-    Results_DF.to_parquet(fn + '.gzip', compression='gzip')
+    # -----
+    # KPI differences vs the first variant (paired by replication)
+    if len(VARIANTS) > 1:
+        Report_DF = compare_variants(ResultWriter.read_final(fn))
+        Report_DF.to_csv(fn + '_variants.csv', index=False)
+        log_to_file(Report_DF.to_string(index=False))
     
     log_to_file('Dataset saved to datasets/ folder')
     flush_log()
+    LOG_SINK.stop()
     # ----------------- ALL DONE -----------------------------
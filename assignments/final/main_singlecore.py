@@ -9,10 +9,16 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
 # Custom Classes
+from SimEngine.EconomyBundle import EconomyBundle
 from SimEngine.Game import Game
+from SimEngine.LogSink import LogSink
 from SimEngine.Player import Player
+from SimEngine.RandomSource import RandomSource
+from SimEngine.ResultWriter import ResultWriter
+from SimEngine.SheetSchema import convert_sheet, convert_variants
 from SimEngine.StringConstants import *
 from SimEngine.UtilityFunctions import *
+from SimEngine.VariantReport import compare_variants
 
 # --- make sure we have all necessary project folders ---
 folders = ['./logs',
@@ -31,17 +37,45 @@ for folder in folders:
 SIMULATION_GOOGLE_SHEET_ID = '<enter GoogleDoc ID here>'
 SIMULATION_VARIANTS_SHEET = 'variants!A1:G100'
 
+# Master random seed for the whole run (None = pick a new one).  It is logged and written to the output ('seed'
+# column) - re-run any single player with Game(seed=RandomSource.spawn(seed, variant, replication, SIMULATION_CRN))
+SIMULATION_SEED = None
+
+# Common random numbers: replication i of every variant shares its random streams (session schedule, reaction
+# times, egg draws, starting animal, ...) so variant differences need far fewer replications to show up
+SIMULATION_CRN = False
+
+# Also write the whole result dataset out as one CSV (streamed one player at a time - the Parquet dataset is the
+# primary output)
+SIMULATION_EXPORT_CSV = True
+
+# Snapshot table also holds the comma-joined actions_* and a_<Animal_ID> inventory columns (rebuilt from the event
+# log).  Off = narrow snapshot rows, the events table (events/ in the dataset) has the same information
+SIMULATION_WIDE_OUTPUT = True
+
+# Write every snapshot row and event to the dataset.  Off = only each player's final row and the per variant, per
+# day KPI summary (_kpis.csv - built as players finish, see KpiAggregator) for large sweeps
+SIMULATION_RAW_OUTPUT = True
+
+# Log file rotation (logs/sim_<timestamp>.log is written by a LogSink thread)
+SIMULATION_LOG_MAX_MB = 50
+SIMULATION_LOG_BACKUPS = 10
+SIMULATION_LOG_COMPRESS = True
+
 
 # ==================================================================================
-def worker(run_number, v_id, v_data):
+def worker(run_number, v_id, bundle, seed, writer):
     """
-    Worker process
+    Worker process (results are streamed to the dataset through writer)
     """
+    v_data = bundle.v_data
+    set_log_context(player=run_number, variant=v_id)
+    
     log_to_file(f'Simulation Start: ({run_number} | {v_id} | {v_data["sim_count"]} | {v_data["sim_length"]})')
     
     # Create a game
-    game = Game()
-    game.init_game(v_data)
+    game = Game(seed=seed)
+    game.init_game(bundle)
     
     # initialize virtual player
     player = Player()
@@ -52,38 +86,26 @@ def worker(run_number, v_id, v_data):
     
     game.set_player(player)
     game.start_sim(int(v_data['sim_length']) * int(v_data['sim_fps']))
-    flush_log()
     
-    # Save player simulation csv candy to folder
-    results_df = game.snapshot.results_df
-    results_df.fillna(0, inplace=True)
-    results_df = results_df.applymap(convert_numbers)
-
-    # Reorder Animal and Candy Columns to End of DataFrame
-    cols = results_df.columns
-    candy_cols = sorted([c_col for c_col in cols if c_col[:2] == 'c_'], key=lambda x: int(x[2:]))
-    animal_cols = sorted([a_col for a_col in cols if a_col[:2] == 'a_'], key=lambda x: int(x[2:]))
-    cols_c_a = candy_cols + animal_cols
-    other_cols = [o_col for o_col in cols if o_col not in cols_c_a]
-    
-    cols = other_cols + cols_c_a
-    results_df = results_df[cols]
-
-    results_df.to_csv(f'datasets/batch/{v_id}_{run_number}.csv', index=False)
+    # Stream player simulation results to the dataset
+    writer.write_player(v_id, game.snapshot)
     
     log_to_file(f'Simulation End: ({run_number} | {v_id} | {v_data["sim_count"]} | {v_data["sim_length"]})')
     flush_log()
+    set_log_context()
     
-    del game, player, run_number, v_id, v_data
+    del game, player, run_number, v_id, v_data, bundle
 
 
 # ==================================================================================
-def add_tasks(variants):
+def add_tasks(variants, master_seed, folder):
     """
     Method to populate list of initialization candy for every simulation run
     This method is run by the parent process so has access to globals
     """
     num = 0
+    bundles = {}
+    writer = ResultWriter(folder, 0, bundles, SIMULATION_WIDE_OUTPUT, SIMULATION_RAW_OUTPUT)
     
     for v_id in variants.keys():
         v_data = variants[v_id]
@@ -95,23 +117,23 @@ def add_tasks(variants):
         for d in data_sheets:
             # Load the variant candy fro the Google sheet
             # The "False" will force candy sheets to be reloaded every time to replace cache
-            if True and os.path.exists(f'datasets/cache/{d}.csv'):
-                v_data[d] = pd.read_csv(f'datasets/cache/{d}.csv')
-                v_data[d] = v_data[d].applymap(convert_numbers)
-                
-            else:
+            if not (True and os.path.exists(f'datasets/cache/{d}.csv')):
                 data = load_data(SIMULATION_GOOGLE_SHEET_ID, v_data[d])
-                v_data[d] = pd.DataFrame(data[1:], columns=data[0])
-                v_data[d] = v_data[d].applymap(convert_numbers)
-    
-                v_data[d].to_csv(f'datasets/cache/{d}.csv', index=False)
-                v_data[d] = pd.read_csv(f'datasets/cache/{d}.csv')
-                v_data[d] = v_data[d].applymap(convert_numbers)
+                pd.DataFrame(data[1:], columns=data[0]).to_csv(f'datasets/cache/{d}.csv', index=False)
+            
+            # Typed columns from the sheet schema (a bad cell raises a SchemaError naming the row and column)
+            v_data[d] = convert_sheet(pd.read_csv(f'datasets/cache/{d}.csv'), d)
 
+        # --- Compile the economy once and share it with every player of the variant
+        bundle = EconomyBundle(v_id, v_data)
+        bundles[v_id] = bundle
+        
         # --- Add parameters to sim queue
         for i in range(v_data['sim_count']):
-            worker(num, v_id, v_data)
+            worker(num, v_id, bundle, RandomSource.spawn(master_seed, v_id, i, SIMULATION_CRN), writer)
             num += 1
+    
+    writer.close()
 
 
 # ==================================================================================
@@ -154,14 +176,11 @@ if __name__ == "__main__":
     # ----
     # Load the variant candy fro the Google sheet
     # Note: The "False" forces us to always reload the variants tab and overwrite cache
-    if True and os.path.isfile('datasets/cache/data_variants.csv'):
-        variant_df = pd.read_csv('datasets/cache/data_variants.csv')
-        variant_df = variant_df.applymap(convert_numbers)
-    else:
+    if not (True and os.path.isfile('datasets/cache/data_variants.csv')):
         variant_data = load_data(SIMULATION_GOOGLE_SHEET_ID, SIMULATION_VARIANTS_SHEET)
-        variant_df = pd.DataFrame(variant_data[1:], columns=variant_data[0])
-        variant_df = variant_df.applymap(convert_numbers)
-        variant_df.to_csv('datasets/cache/data_variants.csv', index=False)
+        pd.DataFrame(variant_data[1:], columns=variant_data[0]).to_csv('datasets/cache/data_variants.csv', index=False)
+    
+    variant_df = convert_variants(pd.read_csv('datasets/cache/data_variants.csv'))
     
     # --- Build VARIANTS Dictionary
     VARIANTS = {}
@@ -182,8 +201,13 @@ if __name__ == "__main__":
     QUESTS_FOLDER = 'datasets/quests/*'
     OUTPUT_FOLDER = 'datasets/output/'
     
+    # Note log_ts was defined in UtilityFunctions
+    fn = f'{OUTPUT_FOLDER}simulation_results_{log_ts}_{SIM_CYCLES}'
+    
     # ==================================================================================
     reset_log()
+    LOG_SINK = LogSink(log_path, SIMULATION_LOG_MAX_MB * 2 ** 20, SIMULATION_LOG_BACKUPS, SIMULATION_LOG_COMPRESS)
+    attach_log_sink(LOG_SINK.queue, 'main')
     log_to_file(f'Running {SIM_CYCLES} players!')
 
     # -----
@@ -195,25 +219,46 @@ if __name__ == "__main__":
     # ---------------- RUN SIMULATION ----------------------------------
     start = time.time()
     
-    add_tasks(VARIANTS)
+    MASTER_SEED = RandomSource.get_master_seed(SIMULATION_SEED)
+    log_to_file(f'Master seed: {MASTER_SEED} (CRN: {SIMULATION_CRN})')
+    
+    add_tasks(VARIANTS, MASTER_SEED, fn)
     flush_log()
     
     print('Simulation Complete')
     print(f'Time taken = {time.time() - start:.10f}')
     
     # -----
-    # Save simulation results to CSV
+    # The Parquet dataset (one folder per variant) is written - only the summary metadata is left to write
     log_to_file('Collecting candy for analysis and saving copies')
-    Results_DF = pd.concat([pd.read_csv(f, low_memory=False) for f in glob.glob('datasets/batch/*')], sort=False, ignore_index=True)
-
-    # Note log_ts was defined in UtilityFunctions
-    fn = f'{OUTPUT_FOLDER}simulation_results_{log_ts}_{SIM_CYCLES}'
-
-    Results_DF.to_csv(fn + '.csv')
+    rows = ResultWriter.merge(fn)
+    log_to_file(f'Dataset {os.path.join(fn, ResultWriter.SNAPSHOTS)}/: {rows} rows')
+    
+    if SIMULATION_EXPORT_CSV and SIMULATION_RAW_OUTPUT:
+        ResultWriter.export_csv(os.path.join(fn, ResultWriter.SNAPSHOTS), fn + '.csv')
+        ResultWriter.export_csv(os.path.join(fn, ResultWriter.EVENTS), fn + '_events.csv')
+    
+    # -----
+    # Per variant, per day KPI distributions across players (merged from the workers' summaries)
+    ResultWriter.read_kpis(fn).to_csv(fn + '_kpis.csv', index=False)
+    
+    # -----
+    # Phase timings of the variants that set sim_profile (merged from the workers' profiles)
+    PROFILE = ResultWriter.read_profile(fn)
+    if len(PROFILE) > 0:
+        PROFILE.save(fn + '_profile.json')
+        Profile_DF = PROFILE.to_df()
+        Profile_DF.to_csv(fn + '_profile.csv', index=False)
+        log_to_file(Profile_DF.to_string(index=False))
+    
+    # -----
+    # KPI differences vs the first variant (paired by replication)
+    if len(VARIANTS) > 1:
+        Report_DF = compare_variants(ResultWriter.read_final(fn))
+        Report_DF.to_csv(fn + '_variants.csv', index=False)
+        log_to_file(Report_DF.to_string(index=False))
     
-    # This is a binary save format candy uses - it's way faster and smaller files sizes
-    # Results_DF.to_parquet(fn + '.gzip', compression='gzip')
-
     log_to_file('Dataset saved to datasets/ folder')
     flush_log()
+    LOG_SINK.stop()
     # ----------------- ALL DONE -----------------------------